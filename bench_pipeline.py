@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from module1_extract_text import extract_text_from_pdf
+from module2_extract_data import process_text_file, extract_skills_fast, save_json_output
+from module3_store_data import initialize_database, insert_resume_data
+from module4_feedback import provide_feedback_for_all_resumes
+from llm_stub_server import start_stub_server
+from synthetic_corpus import generate_corpus, load_ground_truth, KINDS, GROUND_TRUTH_FILENAME
+from text_preprocess import preprocess_text
+import instrumentation
+from instrumentation import current_rss_bytes
+
+# Results of every run are appended here unless --output says otherwise; the folder is git-ignored
+BENCH_OUTPUT_DIR = "bench_output"
+DEFAULT_RESULTS_FILE = os.path.join(BENCH_OUTPUT_DIR, "bench_pipeline_results.json")
+
+# How often the RSS sampler looks at the process
+RSS_SAMPLE_SECONDS = 0.01
+
+class RssSampler:
+    """Track the peak RSS while a stage runs by sampling on a background thread"""
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(RSS_SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def summarize(docs, elapsed, latencies, peak_rss):
+    return {
+        "docs": docs,
+        "seconds": round(elapsed, 4),
+        "docs_per_sec": round(docs / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "peak_rss_mb": round(peak_rss / (1024 * 1024), 1)
+    }
+
+def run_per_document(items, function):
+    """Call function on every item, timing each call"""
+    latencies = []
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        for item in items:
+            item_start = time.perf_counter()
+            function(item)
+            latencies.append(time.perf_counter() - item_start)
+        elapsed = time.perf_counter() - start
+    return summarize(len(items), elapsed, latencies, sampler.peak)
+
+def run_whole_corpus(docs, function):
+    """Time one call that processes the whole corpus; no per-document latencies"""
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+    return summarize(docs, elapsed, [], sampler.peak)
+
+def skill_recall(found, planted):
+    """Fraction of the planted skills that were found, case-insensitively"""
+    found_keys = {skill["name"].lower() for skill in found.get("skills", [])}
+    return sum(1 for skill in planted if skill.lower() in found_keys) / len(planted) if planted else 1.0
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+# Function to benchmark every pipeline stage over a synthetic corpus
+def run_benchmark(corpus_folder, work_folder, latency=0.05, job_keywords=None):
+    """
+    Run each stage over the corpus in order and return per-stage timings:
+    docs/sec, p50/p95 latency per document and peak RSS. LLM calls go to the
+    local stub endpoint with the given latency. The taxonomy fast path also
+    reports recall against the corpus ground truth.
+    """
+    ground_truth = load_ground_truth(corpus_folder)
+    pdf_files = sorted(ground_truth)
+    texts_dir = os.path.join(work_folder, "texts")
+    jsons_dir = os.path.join(work_folder, "jsons")
+    feedback_dir = os.path.join(work_folder, "feedback")
+    db_file = os.path.join(work_folder, "db", "resumes.db")
+    for folder in (texts_dir, jsons_dir, feedback_dir):
+        os.makedirs(folder, exist_ok=True)
+
+    stages = {}
+
+    def extract_text(pdf_file):
+        text = extract_text_from_pdf(os.path.join(corpus_folder, pdf_file))
+        with open(os.path.join(texts_dir, f"{os.path.splitext(pdf_file)[0]}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    stages["extract_text"] = run_per_document(pdf_files, extract_text)
+    for kind in KINDS:
+        kind_files = [pdf_file for pdf_file in pdf_files if ground_truth[pdf_file]["kind"] == kind]
+        if kind_files and len(kind_files) < len(pdf_files):
+            stages[f"extract_text_{kind}"] = run_per_document(kind_files, lambda pdf_file: extract_text_from_pdf(
+                os.path.join(corpus_folder, pdf_file)))
+
+    text_files = [f"{os.path.splitext(pdf_file)[0]}.txt" for pdf_file in pdf_files]
+    server, endpoint = start_stub_server(latency=latency)
+    try:
+        def extract_skills(text_file):
+            result = process_text_file(os.path.join(texts_dir, text_file), "bench-key", endpoint)
+            save_json_output(os.path.splitext(text_file)[0], result or {"skills": []}, jsons_dir)
+
+        stages["extract_skills_llm"] = run_per_document(text_files, extract_skills)
+        stages["extract_skills_llm"]["stub_latency_ms"] = latency * 1000
+    finally:
+        server.shutdown()
+
+    recalls = []
+
+    def extract_skills_no_llm(text_file):
+        with open(os.path.join(texts_dir, text_file), "r", encoding="utf-8") as f:
+            found = extract_skills_fast(preprocess_text(f.read())[0])
+        recalls.append(skill_recall(found, ground_truth[f"{os.path.splitext(text_file)[0]}.pdf"]["skills"]))
+
+    stages["extract_skills_fast"] = run_per_document(text_files, extract_skills_no_llm)
+    stages["extract_skills_fast"]["skill_recall"] = round(sum(recalls) / len(recalls), 4) if recalls else None
+
+    initialize_database(db_file)
+    stages["store"] = run_per_document(pdf_files, lambda pdf_file: insert_resume_data(
+        os.path.join(corpus_folder, pdf_file), jsons_dir, jsons_dir, db_file))
+
+    job_file = os.path.join(work_folder, "job_keywords.txt")
+    with open(job_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(job_keywords or ["python", "sql", "docker", "aws", "communication"]) + "\n")
+    stages["feedback"] = run_whole_corpus(len(pdf_files), lambda: provide_feedback_for_all_resumes(
+        job_file, feedback_dir, db_file))
+
+    return stages
+
+def append_results(results_file, run):
+    """Append one run to the results file, a JSON list kept across runs for regression tracking"""
+    runs = []
+    if os.path.exists(results_file):
+        with open(results_file, "r", encoding="utf-8") as f:
+            runs = json.load(f)
+    runs.append(run)
+    results_dir = os.path.dirname(results_file)
+    if results_dir:
+        os.makedirs(results_dir, exist_ok=True)
+    with open(results_file, "w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=2)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on a synthetic resume corpus")
+    parser.add_argument("--corpus", help="Existing corpus folder (with ground_truth.json); generated if omitted")
+    parser.add_argument("--count", type=int, default=50, help="Resumes to generate")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--lines", type=int, default=80, help="Body lines per generated resume")
+    parser.add_argument("--latency", type=float, default=0.05, help="Stub LLM latency in seconds")
+    parser.add_argument("--output", default=DEFAULT_RESULTS_FILE)
+    parser.add_argument("--keep", action="store_true", help="Keep the work folder for inspection")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", help="Also record detailed metrics to this file (.prom for Prometheus text, "
+                                          "otherwise JSONL)")
+    parser.add_argument("--profile", nargs="+", default=[], metavar="STAGE",
+                        help="cProfile these stages (extract_text, extract_skills, score) into bench_profiles/")
+    args = parser.parse_args()
+
+    if args.metrics:
+        instrumentation.enable()
+    if args.profile:
+        instrumentation.enable_profiling(args.profile)
+
+    work_folder = tempfile.mkdtemp(prefix="bench_pipeline_")
+    corpus_folder = args.corpus
+    if corpus_folder is None or not os.path.exists(os.path.join(corpus_folder, GROUND_TRUTH_FILENAME)):
+        corpus_folder = corpus_folder or os.path.join(work_folder, "corpus")
+        generate_corpus(corpus_folder, args.count, args.kinds, args.lines, seed=args.seed)
+
+    try:
+        stages = run_benchmark(corpus_folder, work_folder, args.latency)
+        if args.profile:
+            profile_dir = os.path.join(os.path.dirname(os.path.abspath(args.output)), "bench_profiles")
+            for path in instrumentation.write_profiles(profile_dir):
+                print(f"Profile written to {path}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": git_revision(),
+        "config": {"corpus": corpus_folder if args.corpus else None, "count": args.count, "kinds": args.kinds,
+                   "lines": args.lines, "stub_latency": args.latency},
+        "stages": stages
+    }
+    append_results(args.output, run)
+    if args.metrics:
+        if args.metrics.endswith(".prom"):
+            instrumentation.write_prometheus(args.metrics)
+        else:
+            instrumentation.write_jsonl(args.metrics)
+
+    print(f"{'stage':<22}{'docs':>6}{'docs/sec':>10}{'p50 ms':>9}{'p95 ms':>9}{'peak RSS MB':>13}")
+    for name, stage in stages.items():
+        p50 = "-" if stage["p50_ms"] is None else f"{stage['p50_ms']:.1f}"
+        p95 = "-" if stage["p95_ms"] is None else f"{stage['p95_ms']:.1f}"
+        print(f"{name:<22}{stage['docs']:>6}{stage['docs_per_sec'] or 0:>10.1f}{p50:>9}{p95:>9}"
+              f"{stage['peak_rss_mb']:>13.1f}")
+    print(f"Results appended to {args.output}")
@@ -0,0 +1,115 @@
+import re
+import time
+import random
+import argparse
+from skill_matcher import SkillMatcher, load_taxonomy, DEFAULT_TAXONOMY_PATH
+from synthetic_corpus import FILLER_WORDS, SECTION_TITLES
+
+# Building blocks of the made-up skills that pad the taxonomy for --taxonomy-size
+NAME_SYLLABLES = "ka ro mi zen tor vex lu na dra qui fel sor ix pa tek lon vi gra ster bel mo da".split()
+NAME_SUFFIXES = ["", "", "", " Cloud", " Studio", " DB", " Framework", " Analytics", " SDK", ".js"]
+
+# Line-by-line scan that extract_skills_from_content used before the compiled matcher, kept as the baseline
+def legacy_extract_skills_from_content(content):
+    skill_headers = [
+        "SKILLS", "Technical Skills", "Core Competencies",
+        "Technologies", "Technical Expertise", "Competencies",
+        "Programming", "Languages", "Tools", "Software"
+    ]
+
+    common_skills = [
+        "python", "java", "javascript", "html", "css", "sql",
+        "react", "angular", "node", "docker", "aws", "azure",
+        "git", "linux", "agile", "scrum", "ci/cd"
+    ]
+
+    skills = set()
+    lines = content.lower().split('\n')
+
+    in_skills_section = False
+    for line in lines:
+        line = line.strip()
+
+        if any(header.lower() in line.lower() for header in skill_headers):
+            in_skills_section = True
+            continue
+
+        if in_skills_section and line and line[0].isupper() and line.endswith(':'):
+            in_skills_section = False
+
+        if in_skills_section or any(skill in line.lower() for skill in common_skills):
+            found_skills = re.split(r'[,|•|\t|/|;|\s+]', line)
+            skills.update(skill.strip() for skill in found_skills if skill.strip() and len(skill.strip()) > 1)
+
+    return list(skills)
+
+def make_resume(rng, skill_names, lines=80):
+    """Synthetic resume: filler prose with taxonomy skills sprinkled in and a skills section"""
+    body = []
+    for i in range(lines):
+        if i % 16 == 0:
+            body.append(rng.choice(SECTION_TITLES))
+        words = rng.choices(FILLER_WORDS, k=12)
+        if rng.random() < 0.4:
+            words.insert(rng.randrange(len(words)), rng.choice(skill_names))
+        body.append(" ".join(words))
+    body.append("Technical Skills")
+    body.append(", ".join(rng.sample(skill_names, 15)))
+    return "\n".join(body)
+
+def synthetic_taxonomy(taxonomy, size, rng):
+    """
+    The taxonomy padded to `size` entries with made-up skills, about a third of them
+    with an alias, so the matcher can be measured at the scale of a full production
+    taxonomy rather than the reduced set shipped in skill_taxonomy.json.
+    """
+    taken = {entry["name"].lower() for entry in taxonomy}
+    taken.update(alias.lower() for entry in taxonomy for alias in entry.get("aliases", []))
+    padded = list(taxonomy)
+    while len(padded) < size:
+        stem = "".join(rng.choices(NAME_SYLLABLES, k=rng.randint(2, 4)))
+        name = stem.capitalize() + rng.choice(NAME_SUFFIXES)
+        if name.lower() in taken:
+            continue
+        taken.add(name.lower())
+        entry = {"name": name, "type": "technical", "aliases": []}
+        alias = stem[:4] + str(rng.randint(1, 9))
+        if rng.random() < 0.35 and alias not in taken:
+            taken.add(alias)
+            entry["aliases"].append(alias)
+        padded.append(entry)
+    return padded
+
+def bench(function, documents):
+    start = time.perf_counter()
+    for document in documents:
+        function(document)
+    elapsed = time.perf_counter() - start
+    return elapsed, len(documents) / elapsed * 60 if elapsed > 0 else 0.0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the compiled skill matcher against the legacy line scan")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--taxonomy", default=DEFAULT_TAXONOMY_PATH)
+    parser.add_argument("--taxonomy-size", type=int, default=0,
+                        help="pad the taxonomy with made-up skills to this many entries, e.g. 5000")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    taxonomy = synthetic_taxonomy(load_taxonomy(args.taxonomy), args.taxonomy_size, rng)
+    skill_names = [entry["name"] for entry in taxonomy]
+    documents = [make_resume(rng, skill_names) for _ in range(args.documents)]
+
+    start = time.perf_counter()
+    matcher = SkillMatcher(taxonomy)
+    build_time = time.perf_counter() - start
+
+    legacy_time, legacy_rate = bench(legacy_extract_skills_from_content, documents)
+    matcher_time, matcher_rate = bench(matcher.find_skills, documents)
+
+    aliases = sum(len(entry.get("aliases", [])) for entry in taxonomy)
+    print(f"Taxonomy entries: {len(taxonomy)}, {aliases} aliases (matcher compiled in {build_time * 1000:.1f} ms)")
+    print(f"Legacy line scan:  {legacy_time:.2f}s, {legacy_rate:,.0f} resumes/min")
+    print(f"Compiled matcher:  {matcher_time:.2f}s, {matcher_rate:,.0f} resumes/min")
+    print(f"Speedup: {legacy_time / matcher_time:.1f}x")
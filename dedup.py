@@ -0,0 +1,266 @@
+import os
+import re
+import zlib
+import random
+import sqlite3
+import logging
+from array import array
+import numpy as np
+from llm_cache import normalize_text, text_hash
+
+logger = logging.getLogger(__name__)
+
+# Sidecar database kept next to the skills JSON
+DEDUP_FILENAME = ".dedup.sqlite"
+
+# MinHash signature length, and how it is cut into LSH bands (NUM_PERM / LSH_BANDS rows each).
+# 16 bands of 8 rows make documents with Jaccard similarity above ~0.7 likely to share a bucket.
+NUM_PERM = 128
+LSH_BANDS = 16
+
+# Words per shingle
+SHINGLE_WORDS = 5
+
+# Estimated Jaccard similarity at or above which two resumes are treated as the same document
+NEAR_DUPLICATE_THRESHOLD = 0.85
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures must be comparable across runs
+_rng = random.Random(1)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+# The permutations as columns, split so every product fits in 64 bits: a = a_high * 2**32 + a_low
+_PERM_A_HIGH = np.array([a >> 32 for a, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_PERM_A_LOW = np.array([a & _MAX_HASH for a, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_PERM_B = np.array([b for a, b in _PERMUTATIONS], dtype=np.uint64)[:, None]
+_PRIME = np.uint64(_MERSENNE_PRIME)
+_LOW_29_BITS = np.uint64((1 << 29) - 1)
+_LOW_32_BITS = np.uint64(_MAX_HASH)
+
+def shingle_hashes(text, size=SHINGLE_WORDS):
+    """32-bit hashes of the overlapping word n-grams of the normalized, lowercased text"""
+    words = re.findall(r"\w+", normalize_text(text).lower())
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode("utf-8"))} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode("utf-8")) for i in range(len(words) - size + 1)}
+
+def _fold_mersenne(x):
+    """Reduce a uint64 array in place below 2**61 + 8, keeping it congruent mod 2**61 - 1 (as 2**61 = 1)"""
+    carry = x >> np.uint64(61)
+    x &= _PRIME
+    x += carry
+
+def minhash_signature(hashes):
+    """
+    MinHash signature: the minimum of each random linear permutation over the shingle hashes.
+    All permutations are applied at once in numpy; (a * h + b) mod 2**61 - 1 is computed
+    exactly in 64-bit pieces, so signatures match those already stored in an index.
+    """
+    if not hashes:
+        return [_MAX_HASH] * NUM_PERM
+    h = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+    permuted = _PERM_A_LOW * h
+    _fold_mersenne(permuted)
+    # a_high * h < 2**61; times 2**32 it wraps around the modulus at bit 29
+    high = _PERM_A_HIGH * h
+    wrapped = high & _LOW_29_BITS
+    wrapped <<= np.uint64(32)
+    high >>= np.uint64(29)
+    high += wrapped
+    # Each term is below 2**62, so the sum fits; one fold and one subtraction make it exact
+    permuted += high
+    permuted += _PERM_B
+    _fold_mersenne(permuted)
+    np.subtract(permuted, _PRIME, out=permuted, where=permuted >= _PRIME)
+    permuted &= _LOW_32_BITS
+    return permuted.min(axis=1).tolist()
+
+def estimate_similarity(signature, other):
+    """Fraction of agreeing signature slots, an estimate of the Jaccard similarity"""
+    return sum(1 for x, y in zip(signature, other) if x == y) / len(signature)
+
+def band_buckets(signature, bands=LSH_BANDS):
+    """One bucket hash per band; documents sharing any bucket are duplicate candidates"""
+    rows = len(signature) // bands
+    return [zlib.crc32(array("I", signature[band * rows:(band + 1) * rows]).tobytes()) for band in range(bands)]
+
+class DedupIndex:
+    """
+    Persistent index of canonical documents for duplicate detection.
+
+    Exact duplicates share the hash of their normalized text. Near-duplicates are
+    found through MinHash signatures bucketed with LSH, then confirmed by the
+    estimated similarity. Only canonical documents are indexed, so every duplicate
+    links straight to the record whose results it reuses; the links are kept so
+    duplicates can be re-checked when their canonical document changes or goes away.
+    """
+
+    def __init__(self, db_path, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS dedup_document (
+                                 source TEXT PRIMARY KEY,
+                                 text_hash TEXT NOT NULL,
+                                 signature BLOB NOT NULL
+                             )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_document_hash ON dedup_document(text_hash)")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS dedup_band (
+                                 band INTEGER NOT NULL,
+                                 bucket INTEGER NOT NULL,
+                                 source TEXT NOT NULL
+                             )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_band ON dedup_band(band, bucket)")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS dedup_link (
+                                 source TEXT PRIMARY KEY,
+                                 canonical TEXT NOT NULL
+                             )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dedup_link_canonical ON dedup_link(canonical)")
+        self.conn.commit()
+
+    def find_duplicate(self, text, exclude=None):
+        """
+        Return (canonical_source, similarity) if text duplicates an indexed document,
+        else None. exclude skips one source (a changed file's own previous entry).
+        """
+        return self._find_duplicate(text_hash(text), text, exclude)[0]
+
+    def _find_duplicate(self, digest, text, exclude):
+        """find_duplicate, also returning the signature if one was computed (exact copies need none)"""
+        row = self.conn.execute("SELECT source FROM dedup_document WHERE text_hash = ? AND source != ? LIMIT 1",
+                                (digest, exclude or "")).fetchone()
+        if row:
+            return (row[0], 1.0), None
+
+        signature = minhash_signature(shingle_hashes(text))
+        candidates = set()
+        for band, bucket in enumerate(band_buckets(signature)):
+            candidates.update(source for (source,) in self.conn.execute(
+                "SELECT source FROM dedup_band WHERE band = ? AND bucket = ?", (band, bucket)))
+        candidates.discard(exclude)
+
+        best = None
+        for source in sorted(candidates):
+            stored = self.conn.execute("SELECT signature FROM dedup_document WHERE source = ?", (source,)).fetchone()
+            if stored is None:
+                continue
+            similarity = estimate_similarity(signature, array("I", stored[0]))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (source, similarity)
+        return best, signature
+
+    def add(self, source, text, commit=True):
+        """Index a canonical document, replacing any earlier entry for the same source"""
+        self._add(source, text_hash(text), minhash_signature(shingle_hashes(text)), commit)
+
+    def _add(self, source, digest, signature, commit):
+        self.remove(source, commit=False)
+        self.conn.execute("INSERT INTO dedup_document (source, text_hash, signature) VALUES (?, ?, ?)",
+                          (source, digest, array("I", signature).tobytes()))
+        self.conn.executemany("INSERT INTO dedup_band (band, bucket, source) VALUES (?, ?, ?)",
+                              [(band, bucket, source) for band, bucket in enumerate(band_buckets(signature))])
+        if commit:
+            self.conn.commit()
+
+    def link(self, source, canonical, commit=True):
+        """Record that source duplicates the canonical document"""
+        self.remove(source, commit=False)
+        self.conn.execute("INSERT INTO dedup_link (source, canonical) VALUES (?, ?)", (source, canonical))
+        if commit:
+            self.conn.commit()
+
+    def check(self, source, text, exclude=None, commit=True):
+        """
+        Link source to the indexed document it duplicates, or index it as canonical.
+        Returns the match as find_duplicate does. The text is hashed and signed once;
+        pass commit=False and call commit() once for a whole batch.
+        """
+        digest = text_hash(text)
+        match, signature = self._find_duplicate(digest, text, exclude)
+        if match is None:
+            self._add(source, digest, signature, commit)
+        else:
+            self.link(source, match[0], commit)
+        return match
+
+    def commit(self):
+        self.conn.commit()
+
+    def remove(self, source, commit=True):
+        """
+        Forget a document, whether canonical or a duplicate. Returns the duplicates
+        that were linked to it, which now need checking again.
+        """
+        orphans = [row[0] for row in self.conn.execute("SELECT source FROM dedup_link WHERE canonical = ?",
+                                                       (source,))]
+        self.conn.execute("DELETE FROM dedup_document WHERE source = ?", (source,))
+        self.conn.execute("DELETE FROM dedup_band WHERE source = ?", (source,))
+        self.conn.execute("DELETE FROM dedup_link WHERE source = ? OR canonical = ?", (source, source))
+        if commit:
+            self.conn.commit()
+        return orphans
+
+    def prune(self, existing_sources):
+        """
+        Drop documents whose source file no longer exists. Returns the surviving
+        duplicates of dropped canonical documents.
+        """
+        existing_sources = set(existing_sources)
+        stale = [source for (source,) in self.conn.execute("SELECT source FROM dedup_document UNION "
+                                                           "SELECT source FROM dedup_link")
+                 if source not in existing_sources]
+        orphans = []
+        for source in stale:
+            orphans.extend(self.remove(source, commit=False))
+        self.conn.commit()
+        if stale:
+            logger.info("Dedup index: dropped %s deleted documents", len(stale))
+        return [source for source in orphans if source in existing_sources]
+
+    def close(self):
+        self.conn.close()
+
+# Function to split text files into unique documents and duplicates of earlier ones
+def split_duplicates(text_files, TEXTS_DIR, JSONS_DIR, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Check each text file against the dedup index (kept in JSONS_DIR) and the files
+    before it. Returns (unique_files, duplicates) where duplicates maps a text file
+    to (canonical_text_file, similarity). Unique files are added to the index.
+    Unchanged duplicates of a canonical document that changed or was deleted are
+    checked again too, so they are extracted or relinked rather than left dangling.
+    """
+    index = DedupIndex(os.path.join(JSONS_DIR, DEDUP_FILENAME), threshold)
+    pending = list(text_files)
+    queued = set(pending)
+    unique_files = []
+    duplicates = {}
+
+    def requeue(orphans):
+        for orphan in orphans:
+            if orphan not in queued:
+                queued.add(orphan)
+                pending.append(orphan)
+
+    try:
+        requeue(index.prune(f for f in os.listdir(TEXTS_DIR) if f.endswith(".txt")))
+        for text_file in pending:
+            with open(os.path.join(TEXTS_DIR, text_file), "r", encoding="utf-8") as f:
+                text_content = f.read()
+            # The file's previous version is forgotten before it is matched again
+            requeue(index.remove(text_file, commit=False))
+            match = index.check(text_file, text_content, commit=False)
+            if match is None:
+                unique_files.append(text_file)
+            else:
+                duplicates[text_file] = match
+                logger.debug("%s duplicates %s (similarity %.2f)", text_file, match[0], match[1])
+        index.commit()
+    finally:
+        index.close()
+
+    if len(pending) > len(text_files):
+        logger.info("Dedup: %s duplicates of changed or deleted files rechecked", len(pending) - len(text_files))
+    if duplicates:
+        logger.info("Dedup: %s of %s files are duplicates and skip extraction", len(duplicates), len(pending))
+    return unique_files, duplicates
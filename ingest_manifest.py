@@ -0,0 +1,123 @@
+import logging
+import os
+import json
+import sqlite3
+import hashlib
+
+logger = logging.getLogger(__name__)
+
+# Name of the sidecar manifest file kept in a stage's output folder
+MANIFEST_FILENAME = ".manifest.sqlite"
+
+# Function to open (and create if needed) a manifest database
+def open_manifest(manifest_path):
+    """
+    Open the ingest manifest. Each row records, per stage and source file,
+    the file's size, mtime and content hash plus the outputs it produced.
+    """
+    manifest_dir = os.path.dirname(manifest_path)
+    if manifest_dir and not os.path.exists(manifest_dir):
+        os.makedirs(manifest_dir)
+
+    conn = sqlite3.connect(manifest_path)
+    conn.execute('''CREATE TABLE IF NOT EXISTS ingest_manifest (
+                        stage TEXT NOT NULL,
+                        source TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        mtime_ns INTEGER NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        outputs TEXT NOT NULL,
+                        PRIMARY KEY (stage, source)
+                    )''')
+    conn.commit()
+    return conn
+
+def file_digest(path):
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(path):
+    """Return the (size, mtime_ns, content_hash) fingerprint recorded for a source"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, file_digest(path)
+
+def plan_stage(conn, stage, sources, output_exists=None):
+    """
+    Compare the current sources (dict of source key -> file path) with the manifest.
+
+    Returns (to_process, deleted):
+      to_process - list of (key, path, fingerprint) for new or changed sources
+      deleted    - list of (key, outputs) for sources that no longer exist
+
+    Size and mtime are checked first so unchanged files are never re-hashed.
+    A source whose recorded outputs are missing (per output_exists) is reprocessed.
+    """
+    known = {}
+    for source, size, mtime_ns, content_hash, outputs in conn.execute(
+            "SELECT source, size, mtime_ns, content_hash, outputs FROM ingest_manifest WHERE stage = ?", (stage,)):
+        known[source] = (size, mtime_ns, content_hash, json.loads(outputs))
+
+    to_process = []
+    for key, path in sources.items():
+        stat = os.stat(path)
+        entry = known.get(key)
+
+        if entry is not None:
+            size, mtime_ns, content_hash, outputs = entry
+            outputs_ok = output_exists is None or all(output_exists(output) for output in outputs)
+            if outputs_ok and size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                continue
+
+            digest = file_digest(path)
+            if outputs_ok and digest == content_hash:
+                # Touched but not modified: refresh the stat fields only
+                conn.execute("UPDATE ingest_manifest SET size = ?, mtime_ns = ? WHERE stage = ? AND source = ?",
+                             (stat.st_size, stat.st_mtime_ns, stage, key))
+                continue
+        else:
+            digest = file_digest(path)
+
+        to_process.append((key, path, (stat.st_size, stat.st_mtime_ns, digest)))
+
+    conn.commit()
+    deleted = [(key, entry[3]) for key, entry in known.items() if key not in sources]
+    return to_process, deleted
+
+def get_outputs(conn, stage, key):
+    """Return the outputs recorded for a source, or an empty list"""
+    row = conn.execute("SELECT outputs FROM ingest_manifest WHERE stage = ? AND source = ?", (stage, key)).fetchone()
+    return json.loads(row[0]) if row else []
+
+def find_by_hash(conn, stage, content_hash, exclude=None):
+    """Return (source, outputs) of another source with the same content hash, or None"""
+    row = conn.execute("SELECT source, outputs FROM ingest_manifest WHERE stage = ? AND content_hash = ? "
+                       "AND source != ? LIMIT 1", (stage, content_hash, exclude or "")).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+def record_source(conn, stage, key, fingerprint, outputs, commit=True):
+    """
+    Record that a source was processed into the given outputs.
+    Pass commit=False to make the entry part of the caller's open transaction.
+    """
+    size, mtime_ns, content_hash = fingerprint
+    conn.execute('''INSERT OR REPLACE INTO ingest_manifest (stage, source, size, mtime_ns, content_hash, outputs)
+                    VALUES (?, ?, ?, ?, ?, ?)''',
+                 (stage, key, size, mtime_ns, content_hash, json.dumps(outputs)))
+    if commit:
+        conn.commit()
+
+def forget_source(conn, stage, key):
+    """Remove a source from the manifest"""
+    conn.execute("DELETE FROM ingest_manifest WHERE stage = ? AND source = ?", (stage, key))
+    conn.commit()
+
+def remove_output_files(outputs):
+    """Delete output files left behind by a deleted source"""
+    for output_path in outputs:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+            logger.info("Removed stale output: %s", output_path)
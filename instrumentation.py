@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import bisect
+import logging
+import cProfile
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Histogram bucket upper bounds (seconds) for stage timings
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Histogram bucket upper bounds for token counts per request
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Log line format used by configure_logging; plain messages keep the console output as before
+LOG_FORMAT = "%(message)s"
+
+_enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_events_file = None
+
+_profile_stages = {}
+_profile_every = 1
+_profile_calls = {}
+
+def peak_rss_bytes():
+    """Lifetime peak resident set size of this process, or 0 where it cannot be read"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+def current_rss_bytes():
+    """Resident set size now (Linux /proc), or the lifetime peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss_bytes()
+
+def configure_logging(level=logging.INFO, log_format=LOG_FORMAT):
+    """Send pipeline log records to stderr at the given level (DEBUG shows per-resume detail)"""
+    logging.basicConfig(level=level, format=log_format)
+
+def enable(events_path=None):
+    """
+    Start recording metrics. With events_path, every per-document observation is
+    also appended to that file as one JSON line.
+    """
+    global _enabled, _events_file
+    with _lock:
+        if events_path and _events_file is None:
+            _events_file = open(events_path, "a", encoding="utf-8")
+        _enabled = True
+
+def disable():
+    """Stop recording; timers and counters become no-ops again"""
+    global _enabled, _events_file
+    with _lock:
+        _enabled = False
+        if _events_file is not None:
+            _events_file.close()
+            _events_file = None
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    """Drop all recorded counters and histograms"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+def inc(name, amount=1):
+    """Add to a counter"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def observe(name, value, document=None, buckets=LATENCY_BUCKETS):
+    """Record one value in a histogram, and as an event if an events file is open"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = {"buckets": buckets, "counts": [0] * (len(buckets) + 1),
+                                             "sum": 0.0, "count": 0}
+        histogram["counts"][bisect.bisect_left(histogram["buckets"], value)] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+        if _events_file is not None and document is not None:
+            _events_file.write(json.dumps({"ts": time.time(), "metric": name, "document": document,
+                                           "value": value}) + "\n")
+
+class _Timer:
+    __slots__ = ("name", "document", "start")
+
+    def __init__(self, name, document):
+        self.name = name
+        self.document = document
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start, self.document)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name, document=None):
+    """
+    Context manager timing a block into the `name` histogram (seconds).
+    While metrics are disabled this returns a shared no-op, so hooks cost one call.
+    """
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(name, document)
+
+def snapshot():
+    """Return a copy of all counters and histograms"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: {"buckets": list(h["buckets"]), "counts": list(h["counts"]),
+                                  "sum": h["sum"], "count": h["count"]} for name, h in _histograms.items()}
+        }
+
+def write_prometheus(path):
+    """Write all metrics in the Prometheus text exposition format (for node_exporter's textfile collector)"""
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data["counters"].items()):
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    for name, histogram in sorted(data["histograms"].items()):
+        lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in zip(histogram["buckets"], histogram["counts"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{name}_sum {histogram['sum']}")
+        lines.append(f"{name}_count {histogram['count']}")
+
+    # Write then rename so a scraper never reads a half-written file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+def write_jsonl(path):
+    """Append one JSON line per metric with the current values"""
+    data = snapshot()
+    now = time.time()
+    with open(path, "a", encoding="utf-8") as f:
+        for name, value in sorted(data["counters"].items()):
+            f.write(json.dumps({"ts": now, "metric": name, "type": "counter", "value": value}) + "\n")
+        for name, histogram in sorted(data["histograms"].items()):
+            f.write(json.dumps({"ts": now, "metric": name, "type": "histogram", **histogram}) + "\n")
+
+def enable_profiling(stages, every=1):
+    """
+    Profile calls to the named stages with cProfile, sampling one call in `every`
+    to keep the overhead low. Profiles accumulate until write_profiles().
+    cProfile only sees the calling thread, so profile stages run with one worker,
+    or use an external sampler such as py-spy (stage workers are named threads).
+    """
+    global _profile_every
+    with _lock:
+        _profile_every = max(1, every)
+        for stage in stages:
+            _profile_stages.setdefault(stage, cProfile.Profile())
+
+def disable_profiling():
+    with _lock:
+        _profile_stages.clear()
+        _profile_calls.clear()
+
+class _Profiled:
+    __slots__ = ("profiler", "active")
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.active = False
+
+    def __enter__(self):
+        try:
+            self.profiler.enable()
+            self.active = True
+        except ValueError:
+            pass  # Another profiler is already running in this thread; skip this sample
+        return self
+
+    def __exit__(self, *exc):
+        if self.active:
+            self.profiler.disable()
+
+def profile(stage):
+    """Context manager that profiles the block if profiling is on for this stage and this call is sampled"""
+    profiler = _profile_stages.get(stage)
+    if profiler is None:
+        return _NULL_TIMER
+    with _lock:
+        calls = _profile_calls[stage] = _profile_calls.get(stage, 0) + 1
+    if (calls - 1) % _profile_every:
+        return _NULL_TIMER
+    return _Profiled(profiler)
+
+def write_profiles(output_dir):
+    """Dump each profiled stage to <output_dir>/<stage>.prof (open with pstats or snakeviz)"""
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    paths = []
+    for stage, profiler in _profile_stages.items():
+        path = os.path.join(output_dir, f"{stage}.prof")
+        profiler.dump_stats(path)
+        paths.append(path)
+    return paths
@@ -0,0 +1,167 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+
+# Default size cap and entry lifetime for the on-disk response cache
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+# Cache hits whose last_access update is held in memory before being written in one transaction
+TOUCH_BATCH_SIZE = 100
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only differences share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+def text_hash(text):
+    """SHA-256 of the normalized text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+def prompt_version(prompt):
+    """Short hash identifying a prompt; changes whenever the prompt text changes"""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+
+class LLMResponseCache:
+    """
+    SQLite-backed cache of extraction results keyed by (model, prompt version, text hash).
+    Entries older than ttl_seconds are treated as misses, and the least recently
+    used entries are evicted once the stored responses exceed max_bytes.
+    Hits update last_access in batches of TOUCH_BATCH_SIZE (and on put and close),
+    so a run of cache hits does not commit once per lookup.
+    """
+
+    def __init__(self, db_path, max_bytes=DEFAULT_MAX_BYTES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+        self._touched = {}
+
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+                                model TEXT NOT NULL,
+                                prompt_version TEXT NOT NULL,
+                                text_hash TEXT NOT NULL,
+                                response TEXT NOT NULL,
+                                size INTEGER NOT NULL,
+                                created REAL NOT NULL,
+                                last_access REAL NOT NULL,
+                                PRIMARY KEY (model, prompt_version, text_hash)
+                            )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def get(self, model, version, text):
+        """
+        Return the cached result for this text, or None on a miss. version may be a
+        sequence of prompt versions, tried in order, counting as one lookup.
+        """
+        versions = [version] if isinstance(version, str) else list(version)
+        digest = text_hash(text)
+        rows = {row[0]: row[1:] for row in self.conn.execute(
+            f'''SELECT prompt_version, response, size, created FROM llm_cache
+                WHERE model = ? AND text_hash = ? AND prompt_version IN ({", ".join("?" * len(versions))})''',
+            [model, digest] + versions)}
+        now = time.time()
+
+        version = next((candidate for candidate in versions if candidate in rows), None)
+        if version is None:
+            self.stats["misses"] += 1
+            return None
+
+        key = (model, version, digest)
+        response, size, created = rows[version]
+        if self.ttl_seconds and now - created > self.ttl_seconds:
+            self.conn.execute("DELETE FROM llm_cache WHERE model = ? AND prompt_version = ? AND text_hash = ?", key)
+            self.conn.commit()
+            self.total_bytes -= size
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+
+        self._touched[key] = now
+        if len(self._touched) >= TOUCH_BATCH_SIZE:
+            self.flush_touches()
+        self.stats["hits"] += 1
+        return json.loads(response)
+
+    def flush_touches(self, commit=True):
+        """Write the buffered last_access updates of cache hits"""
+        if not self._touched:
+            return
+        self.conn.executemany('''UPDATE llm_cache SET last_access = ?
+                                 WHERE model = ? AND prompt_version = ? AND text_hash = ?''',
+                              [(accessed,) + key for key, accessed in self._touched.items()])
+        self._touched = {}
+        if commit:
+            self.conn.commit()
+
+    def put(self, model, version, text, result):
+        """Store a result, evicting least recently used entries if over the size cap"""
+        key = (model, version, text_hash(text))
+        response = json.dumps(result)
+        size = len(response.encode("utf-8"))
+        now = time.time()
+
+        old = self.conn.execute('''SELECT size FROM llm_cache
+                                   WHERE model = ? AND prompt_version = ? AND text_hash = ?''', key).fetchone()
+        if old:
+            self.total_bytes -= old[0]
+
+        self.conn.execute('''INSERT OR REPLACE INTO llm_cache
+                             (model, prompt_version, text_hash, response, size, created, last_access)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)''', key + (response, size, now, now))
+        self.total_bytes += size
+        self._touched.pop(key, None)
+        # Eviction goes by last_access, so pending hits are written first
+        self.flush_touches(commit=False)
+        self.evict()
+        self.conn.commit()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute('''SELECT model, prompt_version, text_hash, size FROM llm_cache
+                                        ORDER BY last_access LIMIT 100''').fetchall()
+            if not rows:
+                self.total_bytes = 0
+                break
+            for model, version, digest, size in rows:
+                self.conn.execute("DELETE FROM llm_cache WHERE model = ? AND prompt_version = ? AND text_hash = ?",
+                                  (model, version, digest))
+                self.total_bytes -= size
+                self.stats["evictions"] += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def invalidate(self, model=None, keep_prompt_versions=None):
+        """
+        Remove entries, e.g. after a prompt change. With keep_prompt_versions, only
+        entries from other prompt versions are removed; with model, only that model's.
+        Returns the number of entries removed.
+        """
+        query = "DELETE FROM llm_cache WHERE 1 = 1"
+        params = []
+        if model is not None:
+            query += " AND model = ?"
+            params.append(model)
+        if keep_prompt_versions:
+            keep_prompt_versions = list(keep_prompt_versions)
+            query += f" AND prompt_version NOT IN ({', '.join('?' * len(keep_prompt_versions))})"
+            params.extend(keep_prompt_versions)
+
+        removed = self.conn.execute(query, params).rowcount
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        return removed
+
+    def hit_rate(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        self.flush_touches()
+        self.conn.close()
@@ -0,0 +1,149 @@
+import math
+import logging
+import time
+import random
+import asyncio
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from instrumentation import timer
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Default Groq free-tier limits for llama3-8b-8192
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 30000
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate_per_minute, holding at most
+    one minute's worth of tokens. acquire() waits until enough tokens are available.
+    """
+
+    def __init__(self, rate_per_minute):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        # A single request larger than the bucket is let through once the bucket is full
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self._refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= amount
+
+class RateLimiter:
+    """Combined requests/min and tokens/min limiter"""
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, token_count):
+        if self.requests is not None:
+            await self.requests.acquire(1)
+        if self.tokens is not None:
+            await self.tokens.acquire(token_count)
+
+def create_session(pool_size=10):
+    """Create a requests session whose connection pool keeps pool_size connections alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def estimate_tokens(text):
+    """Rough token estimate (about 4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+def estimate_payload_tokens(payload):
+    """Estimate prompt plus completion tokens for a chat completion payload"""
+    prompt_tokens = sum(estimate_tokens(message["content"]) for message in payload["messages"])
+    return prompt_tokens + payload.get("max_tokens", 512)
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0, retry_after=None):
+    """
+    Exponential backoff with full jitter, honouring a Retry-After header if present.
+    A Retry-After longer than max_delay is capped, so a server cannot stall a worker;
+    one that is not a finite number of seconds falls back to the jittered backoff.
+    """
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            delay = None
+        if delay is not None and math.isfinite(delay):
+            return min(max(delay, 0.0), max_delay)
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class AsyncLLMClient:
+    """
+    Asyncio front end for a pooled requests session.
+    At most max_in_flight requests run at once; each one is rate limited and
+    retried with exponential backoff and jitter on 429/5xx and connection errors.
+    """
+
+    def __init__(self, endpoint, api_key, max_in_flight=8, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, max_retries=5, timeout=60):
+        self.endpoint = endpoint
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = create_session(max_in_flight)
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+
+    async def post(self, payload):
+        """Send one chat completion request. Returns the final response, or None on connection failure."""
+        token_count = estimate_payload_tokens(payload)
+        loop = asyncio.get_running_loop()
+
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.limiter.acquire(token_count)
+                self.stats["requests"] += 1
+                response = None
+                try:
+                    # Only the HTTP round trip; semaphore and rate limit waits are not request latency
+                    with timer("llm_request_seconds"):
+                        response = await loop.run_in_executor(
+                            self.executor,
+                            lambda: self.session.post(self.endpoint, headers=self.headers, json=payload,
+                                                      timeout=self.timeout))
+                except requests.RequestException as e:
+                    logger.warning("Request error: %s", e)
+
+                if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                    return response
+                if attempt == self.max_retries:
+                    break
+
+                self.stats["retries"] += 1
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                await asyncio.sleep(backoff_delay(attempt, retry_after=retry_after))
+
+        self.stats["failures"] += 1
+        return response
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -0,0 +1,221 @@
+import re
+import json
+import logging
+import threading
+from skill_matcher import get_default_matcher
+from instrumentation import inc
+
+logger = logging.getLogger(__name__)
+
+# Skill types the schema accepts, with the other spellings models use for them
+SKILL_TYPES = {
+    "technical": "technical",
+    "tech": "technical",
+    "hard": "technical",
+    "soft": "soft",
+    "interpersonal": "soft",
+}
+
+# A skill name is one short line with at least one word character and no JSON punctuation
+SKILL_NAME_PATTERN = re.compile(r"(?=[^\n]*\w)[^\n\r\t{}\[\]\"]{1,80}")
+
+# Contents of ``` / ```json fences; an unclosed fence runs to the end of the reply
+_FENCE_PATTERN = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)(?:```|\Z)", re.DOTALL)
+
+# Reply quality counters of the current run (see reset_parse_stats), updated from worker
+# threads under _stats_lock; they are also exported as llm_parse_*_total metrics
+_stats = dict.fromkeys(("replies", "failures", "repaired", "reasks", "skills_rejected"), 0)
+_stats_lock = threading.Lock()
+
+class ResponseParseError(ValueError):
+    """A reply held no usable JSON. truncated is True when the reply was cut off mid-object."""
+
+    def __init__(self, message, truncated=False):
+        super().__init__(message)
+        self.truncated = truncated
+
+def count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+    inc(f"llm_parse_{name}_total", amount)
+
+def parse_stats():
+    """Return a copy of this run's reply quality counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_parse_stats():
+    """Start counting a new run, so the counters do not grow across runs in one process"""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+def parse_failure_rate():
+    """Fraction of replies that could not be parsed at all"""
+    stats = parse_stats()
+    return stats["failures"] / stats["replies"] if stats["replies"] else 0.0
+
+def strip_code_fences(content):
+    """Return the text inside markdown code fences, or the content unchanged if it has none"""
+    if "```" not in content:
+        return content
+    return "\n".join(match.group(1) for match in _FENCE_PATTERN.finditer(content))
+
+def iter_json_objects(text):
+    """
+    Yield (candidate, complete) for every top-level {...} in text, with commas
+    before a closing bracket removed. An object still open at the end of the text
+    (a truncated reply) is yielded last with complete=False, cut after its last
+    finished nested value and closed, if it has one.
+    """
+    stack = []
+    out = []
+    in_string = escaped = False
+    last_cut = None  # (length of out, closing brackets) after the last finished nested value
+
+    for char in text:
+        if not stack:
+            if char == "{":
+                stack.append("}")
+                out = [char]
+                last_cut = None
+            continue
+
+        out.append(char)
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == "{" or char == "[":
+            stack.append("}" if char == "{" else "]")
+        elif char == "}" or char == "]":
+            # Drop a trailing comma: {"a": 1,} or [1, 2, ]
+            position = len(out) - 2
+            while position >= 0 and out[position].isspace():
+                position -= 1
+            if position >= 0 and out[position] == ",":
+                del out[position]
+            stack.pop()
+            if not stack:
+                yield "".join(out), True
+            else:
+                last_cut = (len(out), "".join(reversed(stack)))
+
+    if stack and last_cut is not None:
+        yield "".join(out[:last_cut[0]]) + last_cut[1], False
+
+def parse_json_objects(content):
+    """
+    Return (objects, truncated): every JSON object found in a model reply, in order.
+    The whole reply is tried with json.loads first, so well-formed replies never go
+    through the slower scanner. Raises ResponseParseError if nothing parses.
+    """
+    text = strip_code_fences(content).strip()
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return [parsed], False
+    except ValueError:
+        pass
+
+    objects = []
+    truncated = False
+    for candidate, complete in iter_json_objects(text):
+        truncated = not complete
+        try:
+            parsed = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            objects.append(parsed)
+
+    if not objects:
+        raise ResponseParseError("no JSON object in reply", truncated or text.count("{") > text.count("}"))
+    return objects, truncated
+
+def validate_skills(skills, matcher=None):
+    """
+    Check skills against the schema: {"type", "name"} objects with a known type and
+    a short single-line name. Names in the taxonomy take their canonical form
+    ("k8s" -> "Kubernetes"), and repeats are dropped. Returns (valid_skills, rejected).
+    """
+    matcher = matcher or get_default_matcher()
+    valid = []
+    seen = set()
+    rejected = 0
+    for skill in skills:
+        if not isinstance(skill, dict):
+            rejected += 1
+            continue
+        skill_type = SKILL_TYPES.get(str(skill.get("type", "")).strip().lower())
+        name = skill.get("name")
+        name = name.strip() if isinstance(name, str) else ""
+        if skill_type is None or not SKILL_NAME_PATTERN.fullmatch(name):
+            rejected += 1
+            continue
+        canonical = matcher.lookup.get(name.lower())
+        if canonical is not None:
+            name = canonical[0]
+        key = (skill_type, name.lower())
+        if key not in seen:
+            seen.add(key)
+            valid.append({"type": skill_type, "name": name})
+    if rejected:
+        count("skills_rejected", rejected)
+    return valid, rejected
+
+def parse_skills_reply(content):
+    """
+    Parse a single-resume reply into ({"skills": [...]}, truncated). Skills lists
+    from several objects are merged. Raises ResponseParseError if there is no
+    skills list, or if it had entries and none of them passed validation.
+    """
+    objects, truncated = parse_json_objects(content)
+    skills = []
+    found = False
+    for content_object in objects:
+        if isinstance(content_object.get("skills"), list):
+            found = True
+            skills.extend(content_object["skills"])
+    if not found:
+        raise ResponseParseError("reply has no skills list", truncated)
+
+    valid, rejected = validate_skills(skills)
+    if skills and not valid:
+        raise ResponseParseError(f"none of {rejected} skills matched the schema", truncated)
+    return {"skills": valid}, truncated
+
+def parse_batch_reply(content, batch_ids):
+    """
+    Parse a batched reply into {batch_id: {"skills": [...]}}, merging "results" lists
+    from several objects. An entry with an empty skills list is a result (a resume
+    with no skills); entries with unknown ids or only invalid skills are left out.
+    Raises ResponseParseError if the reply has no JSON at all.
+    """
+    objects = parse_json_objects(content)[0]
+    results = {}
+    for content_object in objects:
+        entries = content_object.get("results")
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict) or entry.get("id") not in batch_ids:
+                continue
+            skills = entry.get("skills")
+            valid, rejected = validate_skills(skills if isinstance(skills, list) else [])
+            if valid:
+                results[entry["id"]] = {"skills": valid}
+            elif skills == []:
+                # Never replaces skills found for the same id in another object
+                results.setdefault(entry["id"], {"skills": []})
+    return results
+
+def reply_content(response_data):
+    """Return the message text of a chat completion"""
+    try:
+        return response_data["choices"][0]["message"]["content"] or ""
+    except (KeyError, IndexError, TypeError) as e:
+        raise ResponseParseError(f"unexpected response shape: {e}")
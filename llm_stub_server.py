@@ -0,0 +1,101 @@
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Skills returned for every resume by the default completion
+CANNED_SKILLS = [
+    {"type": "technical", "name": "Python"},
+    {"type": "technical", "name": "SQL"},
+    {"type": "soft", "name": "Communication"}
+]
+
+def default_completion(request):
+    """
+    Reply in the format module2 asks for: a single skills object, or one entry
+    per "### RESUME <id>" delimiter for batched requests.
+    """
+    messages = request.get("messages", [])
+    user_content = messages[-1].get("content", "") if messages else ""
+    batch_ids = re.findall(r"^### RESUME (\S+)$", user_content, re.MULTILINE)
+    if batch_ids:
+        return json.dumps({"results": [{"id": batch_id, "skills": CANNED_SKILLS} for batch_id in batch_ids]})
+    return json.dumps({"skills": CANNED_SKILLS})
+
+DEFAULT_COMPLETION = default_completion
+
+def make_handler(latency=0.0, error_rate=0.0, completion=DEFAULT_COMPLETION):
+    """
+    Build a request handler that answers every POST with a canned chat completion.
+    Each request sleeps for `latency` seconds; a fraction `error_rate` of requests
+    fail with 429 or 500 so retry logic can be exercised.
+    """
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            time.sleep(latency)
+
+            if random.random() < error_rate:
+                status = random.choice([429, 500])
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0.1")
+                self.end_headers()
+                self.wfile.write(b'{"error": "stub error"}')
+                return
+
+            try:
+                request = json.loads(body)
+            except ValueError:
+                request = {}
+            content = completion(request) if callable(completion) else completion
+            prompt_chars = sum(len(m.get("content", "")) for m in request.get("messages", []))
+
+            reply = json.dumps({
+                "id": "stub-completion",
+                "object": "chat.completion",
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                          "total_tokens": (prompt_chars + len(content)) // 4}
+            }).encode("utf-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format, *args):
+            pass  # Keep test output quiet
+
+    return StubHandler
+
+def start_stub_server(host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, completion=DEFAULT_COMPLETION):
+    """
+    Start the stub server on a background thread.
+    Returns (server, endpoint_url); call server.shutdown() to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(latency, error_rate, completion))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    endpoint = f"http://{host}:{server.server_address[1]}/openai/v1/chat/completions"
+    return server, endpoint
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stub for the Groq chat completions endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before each reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/500")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency, args.error_rate))
+    print(f"Stub LLM endpoint at http://{args.host}:{args.port}/openai/v1/chat/completions")
+    server.serve_forever()
@@ -1,60 +1,539 @@
+import logging
 import os
+import time
+import hashlib
+import gc
 import fitz  # PyMuPDF for PDF text extraction
 from PIL import Image
 import pytesseract
 import io
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import timer, inc, profile, current_rss_bytes
+from ingest_manifest import (MANIFEST_FILENAME, open_manifest, plan_stage, record_source,
+                             forget_source, remove_output_files, find_by_hash, file_fingerprint)
+from work_queue import WorkQueue, WORK_QUEUE_FILENAME, PRIORITY_NORMAL
+
+logger = logging.getLogger(__name__)
 
 # Specify the path to the Tesseract executable (adjust this for your OS)
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"  # Adjust path as needed
 
-def extract_text_from_pdf(pdf_path):
+# Manifest stage name for PDF -> text extraction
+MANIFEST_STAGE = "extract_text"
+
+# Written after every page of extracted text
+PAGE_BREAK = "\f"
+
+# PDFs with more pages than this are split into page ranges in parallel mode
+PAGES_PER_TASK = 20
+
+# Selective OCR policy: pages whose text layer has at least this many characters are not OCR'd
+OCR_MIN_TEXT_CHARS = 100
+# Images smaller than this (in pixels, either side) are treated as icons and skipped
+OCR_MIN_IMAGE_SIDE = 64
+# Images covering less than this fraction of the page are treated as logos/headshots and skipped
+OCR_MIN_IMAGE_AREA_RATIO = 0.05
+
+# Embedded images are downscaled to this resolution (at their size on the page) before OCR;
+# tesseract gains nothing above ~300 DPI and a 600 DPI scan costs four times the memory
+OCR_TARGET_DPI = 300
+
+# Soft RSS cap per extraction process; above it, caches are released between pages
+MAX_EXTRACT_RSS_MB = 1536
+
+# Files submitted to the process pool per worker before the oldest is collected
+PENDING_FILES_PER_WORKER = 2
+
+# OCR counters, accumulated across calls (and merged back from pool workers)
+OCR_STATS = {"pages_ocr": 0, "pages_skipped": 0, "images_ocr": 0, "cache_hits": 0}
+
+# Peak resident memory seen during extraction (max over pool workers) and times the cap was hit
+MEMORY_STATS = {"peak_rss_bytes": 0, "rss_cap_hits": 0}
+
+# In-process OCR results keyed by the SHA-1 of the image bytes
+_ocr_cache = {}
+
+def new_ocr_stats():
+    """Return a zeroed OCR counter dict"""
+    return {key: 0 for key in OCR_STATS}
+
+def reset_ocr_stats():
+    """Zero the module-level OCR counters"""
+    OCR_STATS.update(new_ocr_stats())
+
+def page_needs_ocr(page_text):
+    """A page only needs OCR when it has no usable text layer"""
+    return len(page_text.strip()) < OCR_MIN_TEXT_CHARS
+
+def image_worth_ocr(page, xref, width, height):
+    """Skip icons and images that cover only a small part of the page"""
+    if min(width, height) < OCR_MIN_IMAGE_SIDE:
+        return False
+
+    page_area = page.rect.width * page.rect.height
+    if page_area <= 0:
+        return True
+    image_area = sum(rect.width * rect.height for rect in page.get_image_rects(xref))
+    return image_area / page_area >= OCR_MIN_IMAGE_AREA_RATIO
+
+def image_display_width(page, xref):
+    """Widest size (in points) at which an image is drawn on the page, or None if unknown"""
+    rects = page.get_image_rects(xref)
+    return max(rect.width for rect in rects) if rects else None
+
+def load_ocr_image(image_bytes, display_width=None, target_dpi=OCR_TARGET_DPI):
+    """
+    Decode an image for OCR as 8-bit grayscale, no larger than target_dpi at the
+    width it is drawn on the page. JPEGs are decoded directly at the reduced size
+    (PIL draft mode), so a high-DPI scan is never held in memory at full resolution.
+    """
+    max_width = None
+    with Image.open(io.BytesIO(image_bytes)) as image:  # Convert image bytes into a PIL Image object
+        if display_width and target_dpi:
+            max_width = max(1, int(display_width / 72 * target_dpi))
+            if image.width > max_width:
+                image.draft("L", (max_width, max(1, image.height * max_width // image.width)))
+        gray = image.convert("L")
+
+    if max_width and gray.width > max_width:
+        # Box-reduce by the whole factor first (fast), then resample only what is left
+        factor = gray.width // max_width
+        if factor >= 2:
+            reduced = gray.reduce(factor)
+            gray.close()
+            gray = reduced
+        if gray.width > max_width:
+            resized = gray.resize((max_width, max(1, gray.height * max_width // gray.width)), Image.LANCZOS)
+            gray.close()
+            gray = resized
+    return gray
+
+def ocr_image_bytes(image_bytes, stats, ocr_cache_dir=None, display_width=None):
+    """
+    OCR an image, reusing earlier results for identical image bytes.
+    Results are cached in memory and, if ocr_cache_dir is given, on disk so
+    they are shared between worker processes and runs.
+    """
+    digest = hashlib.sha1(image_bytes).hexdigest()
+    if digest in _ocr_cache:
+        stats["cache_hits"] += 1
+        return _ocr_cache[digest]
+
+    cache_path = os.path.join(ocr_cache_dir, f"{digest}.txt") if ocr_cache_dir else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as file:
+            text = file.read()
+        _ocr_cache[digest] = text
+        stats["cache_hits"] += 1
+        return text
+
+    with timer("ocr_image_seconds"):
+        with load_ocr_image(image_bytes, display_width) as image:
+            text = pytesseract.image_to_string(image)
+    stats["images_ocr"] += 1
+    inc("ocr_images_total")
+    _ocr_cache[digest] = text
+
+    if cache_path:
+        # Write to a temporary file first so concurrent workers never read a partial entry
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, cache_path)
+
+    return text
+
+def new_memory_stats():
+    """Return a zeroed memory stats dict"""
+    return {key: 0 for key in MEMORY_STATS}
+
+def check_memory(max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """
+    Track peak RSS and, above max_rss_mb, release what extraction can give back:
+    the in-process OCR cache, MuPDF's object store and unreachable Python objects.
+    """
+    rss = current_rss_bytes()
+    MEMORY_STATS["peak_rss_bytes"] = max(MEMORY_STATS["peak_rss_bytes"], rss)
+    if max_rss_mb and rss > max_rss_mb * 1024 * 1024:
+        MEMORY_STATS["rss_cap_hits"] += 1
+        _ocr_cache.clear()
+        fitz.TOOLS.store_shrink(100)
+        gc.collect()
+
+def extract_page_text(doc, page_num, stats, ocr_cache_dir=None):
+    """Extract one page's text, OCR'ing its images if it has no usable text layer"""
+    page = doc[page_num]
+    parts = []
+
+    # Extract text directly from the page
+    with timer("text_layer_seconds"):
+        page_text = page.get_text("text")  # "text" is the default method for extracting text
+    inc("pages_total")
+    parts.append(page_text)
+
+    if not page_needs_ocr(page_text):
+        stats["pages_skipped"] += 1
+    else:
+        stats["pages_ocr"] += 1
+
+        # Handle image-based pages via OCR
+        for img in page.get_images(full=True):  # Check for images on the page
+            xref, width, height = img[0], img[2], img[3]
+            if not image_worth_ocr(page, xref, width, height):
+                continue
+            image_bytes = doc.extract_image(xref)["image"]
+            parts.append(ocr_image_bytes(image_bytes, stats, ocr_cache_dir, image_display_width(page, xref)))
+            del image_bytes
+
+    # Mark the page boundary so later stages can find per-page headers and footers
+    parts.append(PAGE_BREAK)
+    return "".join(parts)
+
+def iter_page_texts(pdf_path, start_page=0, end_page=None, ocr_cache_dir=None, stats=None,
+                    max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """
+    Yield the text of pages [start_page, end_page) one page at a time.
+    Only one page's text and images are alive at once, and the document is
+    closed when the generator is exhausted or closed early.
+    """
+    if stats is None:
+        stats = OCR_STATS
+
+    with timer("pdf_open_seconds"):
+        doc = fitz.open(pdf_path)  # Open the PDF document
+    try:
+        if end_page is None or end_page > len(doc):
+            end_page = len(doc)
+
+        for page_num in range(start_page, end_page):  # Iterate through each page in the range
+            yield extract_page_text(doc, page_num, stats, ocr_cache_dir)
+            check_memory(max_rss_mb)
+    finally:
+        doc.close()
+
+def extract_text_from_page_range(pdf_path, start_page=0, end_page=None, ocr_cache_dir=None, stats=None,
+                                 max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """
+    Extract text from pages [start_page, end_page) of a PDF file.
+    Pages without a usable text layer are OCR'd, skipping small images.
+    """
+    # Page texts are gathered in a list and joined once instead of growing one string
+    return "".join(iter_page_texts(pdf_path, start_page, end_page, ocr_cache_dir, stats, max_rss_mb))
+
+def extract_text_from_pdf(pdf_path, ocr_cache_dir=None, max_rss_mb=MAX_EXTRACT_RSS_MB):
     """
     Extract text from a PDF file using PyMuPDF (fitz).
     Handles both textual and image-based PDFs by using OCR for images.
     """
-    doc = fitz.open(pdf_path)  # Open the PDF document
-    text = ""
-
-    for page_num in range(len(doc)):  # Iterate through each page
-        page = doc[page_num]
-        
-        # Extract text directly from the page
-        text += page.get_text("text")  # "text" is the default method for extracting text
-        
-        # Handle image-based PDFs via OCR
-        for img_index, img in enumerate(page.get_images(full=True)):  # Check for images on the page
-            xref = img[0]
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            image = Image.open(io.BytesIO(image_bytes))  # Convert image bytes into a PIL Image object
-            
-            # Use pytesseract to extract text from the image
-            text += pytesseract.image_to_string(image)
-    
-    return text
+    with timer("extract_text_seconds", os.path.basename(pdf_path)), profile("extract_text"):
+        return extract_text_from_page_range(pdf_path, ocr_cache_dir=ocr_cache_dir, max_rss_mb=max_rss_mb)
+
+def extract_page_range_task(pdf_path, start_page, end_page, ocr_cache_dir, max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """Pool worker: extract a page range and return its text with the OCR and memory counters"""
+    stats = new_ocr_stats()
+    text = extract_text_from_page_range(pdf_path, start_page, end_page, ocr_cache_dir, stats, max_rss_mb)
+    # The worker's peak carries over between tasks; cap hits are reported once
+    memory = dict(MEMORY_STATS)
+    MEMORY_STATS["rss_cap_hits"] = 0
+    return text, stats, memory
+
+def count_pdf_pages(pdf_path):
+    """Return the number of pages in a PDF file"""
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+def submit_pdf(executor, pdf_path, ocr_cache_dir, max_rss_mb):
+    """Submit one PDF to the pool, split into page ranges if it is large"""
+    page_count = count_pdf_pages(pdf_path)
+    if page_count <= PAGES_PER_TASK:
+        return [executor.submit(extract_page_range_task, pdf_path, 0, None, ocr_cache_dir, max_rss_mb)]
+    return [executor.submit(extract_page_range_task, pdf_path, start, start + PAGES_PER_TASK, ocr_cache_dir,
+                            max_rss_mb)
+            for start in range(0, page_count, PAGES_PER_TASK)]
+
+def collect_pdf(futures):
+    """Join a PDF's page ranges in order, merging worker counters into OCR_STATS and MEMORY_STATS"""
+    parts = []
+    for future in futures:
+        text, stats, memory = future.result()
+        parts.append(text)
+        for key, value in stats.items():
+            OCR_STATS[key] += value
+        MEMORY_STATS["peak_rss_bytes"] = max(MEMORY_STATS["peak_rss_bytes"], memory["peak_rss_bytes"])
+        MEMORY_STATS["rss_cap_hits"] += memory["rss_cap_hits"]
+    return "".join(parts)
+
+def iter_texts_parallel(pdf_paths, workers, ocr_cache_dir=None, max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """
+    Yield (pdf_path, text) in input order, extracting on a process pool.
+    Large PDFs are split into page ranges of PAGES_PER_TASK pages so their
+    pages are spread across workers too. Worker OCR counters are merged into OCR_STATS.
+    At most PENDING_FILES_PER_WORKER files per worker are in flight, so finished
+    texts never pile up in memory ahead of the consumer.
+    """
+    max_pending = workers * PENDING_FILES_PER_WORKER
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for pdf_path in pdf_paths:
+            pending.append((pdf_path, submit_pdf(executor, pdf_path, ocr_cache_dir, max_rss_mb)))
+            if len(pending) >= max_pending:
+                # Collect results file by file so output order matches the sequential mode
+                done_path, futures = pending.popleft()
+                yield done_path, collect_pdf(futures)
+
+        while pending:
+            done_path, futures = pending.popleft()
+            yield done_path, collect_pdf(futures)
+
+def split_identical_pdfs(manifest, pdf_paths, fingerprints, output_folder):
+    """
+    Match PDFs by content hash against earlier files in this run and, given a
+    manifest, files extracted in earlier runs. Returns (unique_paths, copies) where copies maps a PDF path to the
+    text file of its identical twin, which is copied instead of extracting again.
+    """
+    unique_paths = []
+    copies = {}
+    seen = {}
+    # Sources being re-extracted in this run no longer hold the text recorded for them
+    changed = {os.path.basename(pdf_path) for pdf_path in pdf_paths}
+    for pdf_path in pdf_paths:
+        digest = fingerprints[pdf_path][2]
+        filename = os.path.basename(pdf_path)
+        if digest in seen:
+            copies[pdf_path] = os.path.join(output_folder, f"{os.path.splitext(seen[digest])[0]}.txt")
+            continue
+        match = find_by_hash(manifest, MANIFEST_STAGE, digest, exclude=filename) if manifest is not None else None
+        if match is not None and match[0] not in changed and match[1] and os.path.exists(match[1][0]):
+            copies[pdf_path] = match[1][0]
+            continue
+        seen[digest] = filename
+        unique_paths.append(pdf_path)
+    return unique_paths, copies
+
+def plan_pdfs(manifest, pdf_paths, output_folder):
+    """
+    Compare the PDFs with the manifest, removing the text of deleted PDFs.
+    Returns (pdf_paths, fingerprints, copies): the new or changed PDFs to extract,
+    their fingerprints, and byte-identical copies (see split_identical_pdfs).
+    """
+    sources = {os.path.basename(pdf_path): pdf_path for pdf_path in pdf_paths}
+    to_process, deleted = plan_stage(manifest, MANIFEST_STAGE, sources, os.path.exists)
+
+    for key, outputs in deleted:
+        remove_output_files(outputs)
+        forget_source(manifest, MANIFEST_STAGE, key)
+
+    fingerprints = {pdf_path: fingerprint for key, pdf_path, fingerprint in to_process}
+    pdf_paths = [pdf_path for key, pdf_path, fingerprint in to_process]
+    logger.info("%s new or changed PDFs, %s unchanged, %s removed",
+                len(pdf_paths), len(sources) - len(pdf_paths), len(deleted))
+    pdf_paths, copies = split_identical_pdfs(manifest, pdf_paths, fingerprints, output_folder)
+    return pdf_paths, fingerprints, copies
+
+def save_text(pdf_path, text, output_folder, manifest=None, fingerprint=None):
+    """Save a PDF's text and record it in the manifest. Returns the text file name."""
+    filename = os.path.basename(pdf_path)
+    txt_filename = f"{os.path.splitext(filename)[0]}.txt"
+    output_path = os.path.join(output_folder, txt_filename)
+    with open(output_path, "w", encoding="utf-8") as file:
+        file.write(text)
+
+    if manifest is not None:
+        record_source(manifest, MANIFEST_STAGE, filename, fingerprint, [output_path])
+    logger.debug("Processed: %s, saved to %s", filename, output_path)
+    return txt_filename
+
+def copy_identical_text(pdf_path, canonical_path, output_folder, manifest=None, fingerprint=None):
+    """Reuse the text of a byte-identical PDF. Returns the text file name, or None if it cannot be copied."""
+    filename = os.path.basename(pdf_path)
+    txt_filename = f"{os.path.splitext(filename)[0]}.txt"
+    output_path = os.path.join(output_folder, txt_filename)
+    try:
+        shutil.copyfile(canonical_path, output_path)
+    except OSError as e:
+        # Left out of the manifest, so the next run extracts it
+        logger.warning("Could not reuse %s for %s: %s", canonical_path, filename, e)
+        return None
+    if manifest is not None:
+        record_source(manifest, MANIFEST_STAGE, filename, fingerprint, [output_path])
+    logger.debug("%s is identical to an extracted PDF, copied %s", filename, canonical_path)
+    return txt_filename
+
+def batch_process_pdfs(input_folder, output_folder, workers=1, ocr_cache_dir=None, incremental=True,
+                       max_rss_mb=MAX_EXTRACT_RSS_MB, use_queue=False, priority=PRIORITY_NORMAL):
+    """
+    Process PDFs to text and return list of generated text files.
+    With workers > 1, files and pages of large PDFs are extracted on a process pool.
+    OCR results are cached in ocr_cache_dir (default: <output_folder>/.ocr_cache).
+    With incremental=True, only new or changed PDFs are processed and text files
+    of deleted PDFs are removed, using a manifest kept in the output folder.
+    Byte-identical copies of a PDF are not extracted again; its text is copied.
+    Pages are streamed one at a time; above max_rss_mb per process, caches are
+    released between pages. The peak RSS is reported at the end.
+    With use_queue=True, the PDFs go through the durable work queue instead (see
+    enqueue_pdfs and work_pdf_queue), so failures are retried and a run that dies
+    resumes where it stopped. workers queue workers run as separate processes, and
+    more can join from elsewhere with work_pdf_queue. The queue is planned against
+    the manifest, so it needs incremental=True.
+    """
+    if use_queue and not incremental:
+        raise ValueError("use_queue needs incremental=True: queued PDFs are planned and recorded in the manifest")
 
-def batch_process_pdfs(input_folder, output_folder):
-    """Process PDFs to text and return list of generated text files"""
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
-    
+
+    if use_queue:
+        enqueue_pdfs(input_folder, output_folder, priority)
+        if workers <= 1:
+            return work_pdf_queue(output_folder, ocr_cache_dir, max_rss_mb=max_rss_mb)
+        # Each process is a queue worker of its own, leasing PDFs until none are left
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(work_pdf_queue, output_folder, ocr_cache_dir, None, max_rss_mb)
+                       for _ in range(workers)]
+            return [txt_filename for future in futures for txt_filename in future.result()]
+
+    if ocr_cache_dir is None:
+        ocr_cache_dir = os.path.join(output_folder, ".ocr_cache")
+    if not os.path.exists(ocr_cache_dir):
+        os.makedirs(ocr_cache_dir)
+
+    reset_ocr_stats()
+    MEMORY_STATS.update(new_memory_stats())
     processed_files = []
-    
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(input_folder, filename)
-            print(f"Processing: {filename}")
-            
-            # Extract text from PDF
-            text = extract_text_from_pdf(pdf_path)
-            
-            # Save text file
-            txt_filename = f"{os.path.splitext(filename)[0]}.txt"
-            output_path = os.path.join(output_folder, txt_filename)
-            with open(output_path, "w", encoding="utf-8") as file:
-                file.write(text)
-            
+    pdf_paths = [os.path.join(input_folder, filename)
+                 for filename in os.listdir(input_folder) if filename.endswith(".pdf")]
+    start_time = time.perf_counter()
+
+    manifest = None
+    fingerprints = {}
+    copies = {}
+    if incremental:
+        manifest = open_manifest(os.path.join(output_folder, MANIFEST_FILENAME))
+        pdf_paths, fingerprints, copies = plan_pdfs(manifest, pdf_paths, output_folder)
+    else:
+        # Copies within this run are still extracted only once
+        fingerprints = {pdf_path: file_fingerprint(pdf_path) for pdf_path in pdf_paths}
+        pdf_paths, copies = split_identical_pdfs(None, pdf_paths, fingerprints, output_folder)
+
+    if workers > 1:
+        results = iter_texts_parallel(pdf_paths, workers, ocr_cache_dir, max_rss_mb)
+    else:
+        results = ((pdf_path, extract_text_from_pdf(pdf_path, ocr_cache_dir, max_rss_mb)) for pdf_path in pdf_paths)
+
+    for pdf_path, text in results:
+        logger.debug("Processing: %s", os.path.basename(pdf_path))
+        processed_files.append(save_text(pdf_path, text, output_folder, manifest, fingerprints.get(pdf_path)))
+
+    for pdf_path, canonical_path in copies.items():
+        txt_filename = copy_identical_text(pdf_path, canonical_path, output_folder, manifest, fingerprints[pdf_path])
+        if txt_filename:
             processed_files.append(txt_filename)
-            print(f"Processed: {filename}, saved to {output_path}")
-    
-    return processed_files
\ No newline at end of file
+    if copies:
+        logger.info("Reused text for %s byte-identical PDFs", len(copies))
+
+    if manifest is not None:
+        manifest.close()
+
+    elapsed = time.perf_counter() - start_time
+    rate = len(processed_files) / elapsed if elapsed > 0 else 0.0
+    logger.info("Extracted %s files in %.2fs (%.2f files/sec)", len(processed_files), elapsed, rate)
+    logger.info("OCR: %s pages OCR'd, %s pages skipped, %s images OCR'd, %s cache hits",
+                OCR_STATS['pages_ocr'], OCR_STATS['pages_skipped'], OCR_STATS['images_ocr'], OCR_STATS['cache_hits'])
+    logger.info("Peak extraction RSS: %.0f MB per process (cap %s MB, reached %s times)",
+                MEMORY_STATS['peak_rss_bytes'] / (1024 * 1024), max_rss_mb, MEMORY_STATS['rss_cap_hits'])
+
+    return processed_files
+
+# Function to queue new or changed PDFs for extraction
+def enqueue_pdfs(input_folder, output_folder, priority=PRIORITY_NORMAL):
+    """
+    Plan the PDFs in input_folder against the manifest and add the new or changed
+    ones to the work queue kept in output_folder. Higher priorities are extracted
+    first. A byte-identical copy of an already extracted PDF gets its text right
+    away; a copy of a PDF that is itself queued waits for it. Returns the number queued.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    pdf_paths = [os.path.join(input_folder, filename)
+                 for filename in os.listdir(input_folder) if filename.endswith(".pdf")]
+    manifest = open_manifest(os.path.join(output_folder, MANIFEST_FILENAME))
+    queue = WorkQueue(os.path.join(output_folder, WORK_QUEUE_FILENAME), MANIFEST_STAGE)
+    try:
+        pdf_paths, fingerprints, copies = plan_pdfs(manifest, pdf_paths, output_folder)
+        queued_texts = {os.path.join(output_folder, f"{os.path.splitext(os.path.basename(pdf_path))[0]}.txt"):
+                        os.path.basename(pdf_path) for pdf_path in pdf_paths}
+
+        payloads = {os.path.basename(pdf_path): {"path": pdf_path, "fingerprint": fingerprints[pdf_path]}
+                    for pdf_path in pdf_paths}
+        for pdf_path, canonical_path in copies.items():
+            if canonical_path in queued_texts:
+                payloads[os.path.basename(pdf_path)] = {"path": pdf_path, "fingerprint": fingerprints[pdf_path],
+                                                        "copy_of": queued_texts[canonical_path],
+                                                        "text": canonical_path}
+            else:
+                copy_identical_text(pdf_path, canonical_path, output_folder, manifest, fingerprints[pdf_path])
+
+        queued = queue.enqueue({filename: payload["fingerprint"][2] for filename, payload in payloads.items()},
+                               priority, payloads)
+        logger.info("Queued %s PDFs for extraction at priority %s", queued, priority)
+        queue.log_summary()
+        return queued
+    finally:
+        queue.close()
+        manifest.close()
+
+# Function to extract queued PDFs until none are left
+def work_pdf_queue(output_folder, ocr_cache_dir=None, worker_id=None, max_rss_mb=MAX_EXTRACT_RSS_MB):
+    """
+    Lease PDFs from the work queue in output_folder and extract them, recording each
+    in the manifest before it is marked done. The lease is renewed while a PDF is
+    being extracted, however long its OCR takes. A failed PDF is retried after a delay
+    and moved to the dead-letter list after its last attempt; a PDF whose worker
+    died is picked up again once its lease runs out. Run this in several processes
+    to share the queue between workers. Returns the text files this worker wrote.
+    """
+    if ocr_cache_dir is None:
+        ocr_cache_dir = os.path.join(output_folder, ".ocr_cache")
+    if not os.path.exists(ocr_cache_dir):
+        os.makedirs(ocr_cache_dir)
+
+    processed_files = []
+    start_time = time.perf_counter()
+    manifest = open_manifest(os.path.join(output_folder, MANIFEST_FILENAME))
+    queue = WorkQueue(os.path.join(output_folder, WORK_QUEUE_FILENAME), MANIFEST_STAGE, worker_id)
+    try:
+        for filename, payload in queue.iter_leased():
+            pdf_path = payload["path"]
+            fingerprint = tuple(payload["fingerprint"])
+            twin = payload.get("copy_of")
+            try:
+                twin_state = queue.state(twin) if twin else None
+                if twin_state in ("pending", "leased"):
+                    # Its identical twin is not extracted yet
+                    queue.defer(filename)
+                    continue
+                txt_filename = None
+                if twin_state == "done":
+                    txt_filename = copy_identical_text(pdf_path, payload["text"], output_folder, manifest, fingerprint)
+                if txt_filename is None:
+                    with queue.heartbeat(filename):
+                        text = extract_text_from_pdf(pdf_path, ocr_cache_dir, max_rss_mb)
+                    txt_filename = save_text(pdf_path, text, output_folder, manifest, fingerprint)
+                processed_files.append(txt_filename)
+                queue.complete(filename)
+            except Exception as e:
+                logger.error("Error extracting %s: %s", filename, e)
+                queue.fail(filename, str(e))
+    finally:
+        # Leases still held (e.g. on Ctrl+C) go straight back to the queue
+        queue.release()
+        queue.log_summary()
+        queue.close()
+        manifest.close()
+
+    elapsed = time.perf_counter() - start_time
+    logger.info("Worker %s extracted %s files in %.2fs", queue.worker_id, len(processed_files), elapsed)
+    return processed_files
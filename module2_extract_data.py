@@ -1,52 +1,50 @@
+import logging
 import os
-import requests
+import time
 import json
 import re
 import sqlite3
+import asyncio
+from llm_client import (AsyncLLMClient, create_session, estimate_tokens, estimate_payload_tokens,
+                        DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE)
+from llm_cache import LLMResponseCache, prompt_version
+from skill_matcher import get_default_matcher
+from instrumentation import timer, inc, observe, profile, TOKEN_BUCKETS
+from dedup import split_duplicates
+from text_preprocess import (preprocess_text, split_into_chunks, merge_skill_results, preprocess_stats,
+                             reset_preprocess_stats)
+from llm_response import (parse_skills_reply, parse_batch_reply, reply_content, count, parse_failure_rate,
+                          ResponseParseError, parse_stats, reset_parse_stats)
+from ingest_manifest import (MANIFEST_FILENAME, open_manifest, plan_stage, record_source,
+                             forget_source, remove_output_files, file_fingerprint)
+from work_queue import WorkQueue, WORK_QUEUE_FILENAME, PRIORITY_NORMAL
+
+logger = logging.getLogger(__name__)
 
 API_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
+# Manifest stage name for text -> skills JSON extraction
+MANIFEST_STAGE = "extract_skills"
+# Separate stage for the no-LLM fast path so switching modes re-extracts everything
+FAST_MANIFEST_STAGE = "extract_skills_fast"
+
+# Default name of the LLM response cache kept in the JSON output folder
+LLM_CACHE_FILENAME = ".llm_cache.sqlite"
+
 # Function to extract skills from content
-def extract_skills_from_content(content):
-    """
-    Enhanced skill extraction from text content.
-    """
-    skill_headers = [
-        "SKILLS", "Technical Skills", "Core Competencies",
-        "Technologies", "Technical Expertise", "Competencies",
-        "Programming", "Languages", "Tools", "Software"
-    ]
-    
-    # Common technical skills to look for (add more as needed)
-    common_skills = [
-        "python", "java", "javascript", "html", "css", "sql",
-        "react", "angular", "node", "docker", "aws", "azure",
-        "git", "linux", "agile", "scrum", "ci/cd"
-    ]
-    
-    skills = set()
-    lines = content.lower().split('\n')
-    
-    in_skills_section = False
-    for line in lines:
-        line = line.strip()
-        
-        # Check for skill section headers
-        if any(header.lower() in line.lower() for header in skill_headers):
-            in_skills_section = True
-            continue
-            
-        # Exit skills section if new section found
-        if in_skills_section and line and line[0].isupper() and line.endswith(':'):
-            in_skills_section = False
-            
-        # Extract skills from lines
-        if in_skills_section or any(skill in line.lower() for skill in common_skills):
-            # Split on common separators
-            found_skills = re.split(r'[,|•|\t|/|;|\s+]', line)
-            skills.update(skill.strip() for skill in found_skills if skill.strip() and len(skill.strip()) > 1)
-    
-    return list(skills)
+def extract_skills_from_content(content, matcher=None):
+    """
+    Deterministic skill extraction from text content.
+    Uses the precompiled taxonomy matcher (see skill_matcher.py), which scans the
+    whole document in one pass and maps aliases to canonical names ("k8s" -> "Kubernetes").
+    """
+    matcher = matcher or get_default_matcher()
+    return [skill["name"] for skill in matcher.find_skills(content)]
+
+def extract_skills_fast(content, matcher=None):
+    """No-LLM fast path: skills in the same {"skills": [...]} format the API extraction produces"""
+    matcher = matcher or get_default_matcher()
+    return {"skills": matcher.find_skills(content)}
 
 def insert_resume_data(resume_file, structured_data, db_file):
     try:
@@ -70,11 +68,11 @@ def insert_resume_data(resume_file, structured_data, db_file):
                 """, (resume_id, skill["type"], skill["name"]))
         
         conn.commit()
-        print(f"Stored data for {resume_file}")
+        logger.debug("Stored data for %s", resume_file)
         return True
         
     except Exception as e:
-        print(f"Database error: {e}")
+        logger.error("Database error: %s", e)
         return False
     finally:
         conn.close()
@@ -92,22 +90,17 @@ def extract_skills_from_feedback(feedback_text):
             extracted_skills = [skill.strip().lstrip("+") for skill in skills_extracted.split(",") if skill.strip()]
             return extracted_skills
         else:
-            print("No skills extracted section found in feedback.")
+            logger.warning("No skills extracted section found in feedback.")
             return []
     except Exception as e:
-        print(f"Error extracting skills from feedback: {e}")
+        logger.error("Error extracting skills from feedback: %s", e)
         return []
 
-# Function to process a single text file and send it to the API
-def process_text_file(file_path, api_key):
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            text_content = f.read()
-
-        print(f"\nProcessing file: {file_path}")
+# Model and system prompt used for skill extraction
+MODEL_NAME = "llama3-8b-8192"
 
-        # Simplified prompt to avoid the text prefix in response
-        prompt = """Extract technical and soft skills from the resume. Return ONLY a JSON object with no additional text, exactly like this:
+# Simplified prompt to avoid the text prefix in response
+SKILLS_PROMPT = """Extract technical and soft skills from the resume. Return ONLY a JSON object with no additional text, exactly like this:
         {
             "skills": [
                 {"type": "technical", "name": "Python"},
@@ -116,83 +109,694 @@ def process_text_file(file_path, api_key):
             ]
         }"""
 
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "llama3-8b-8192",
-            "messages": [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": text_content}
-            ],
-            "temperature": 0.1
-        }
-
-        response = requests.post(API_ENDPOINT, headers=headers, json=payload)
-        
-        if response.status_code == 200:
-            response_data = response.json()
-            try:
-                message_content = response_data['choices'][0]['message']['content'].strip()
-                
-                # Remove any text before the first '{'
-                json_start = message_content.find('{')
-                if json_start != -1:
-                    message_content = message_content[json_start:]
-                
-                # Clean up any text after the last '}'
-                json_end = message_content.rfind('}')
-                if json_end != -1:
-                    message_content = message_content[:json_end + 1]
-                
-                print(f"Cleaned JSON content: {message_content}")
-                
-                # Parse the cleaned JSON
-                content = json.loads(message_content)
-                
-                if not content.get('skills'):
-                    print("Warning: No skills found in response")
-                    return {"skills": []}
-                
-                print(f"Extracted skills: {json.dumps(content, indent=2)}")
-                return content
+# Cache entries are keyed by this, so editing the prompt automatically misses old responses
+PROMPT_VERSION = prompt_version(SKILLS_PROMPT)
 
-            except Exception as e:
-                print(f"Error parsing API response: {str(e)}")
-                print(f"Raw content causing error: {message_content}")
-                return {"skills": []}
-        else:
-            print(f"API error {response.status_code}: {response.text}")
-            return None
+# Prompt for batched extraction: several resumes per request, each introduced by a delimiter line
+BATCH_PROMPT = """Extract technical and soft skills from each resume below. Each resume starts with a line "### RESUME <id>". Return ONLY a JSON object with no additional text, with one entry per resume id, exactly like this:
+        {
+            "results": [
+                {"id": "R1", "skills": [{"type": "technical", "name": "Python"}, {"type": "soft", "name": "Leadership"}]},
+                {"id": "R2", "skills": [{"type": "technical", "name": "JavaScript"}]}
+            ]
+        }"""
+
+# Batched replies are cached under this version, so editing BATCH_PROMPT misses them too
+BATCH_PROMPT_VERSION = prompt_version(BATCH_PROMPT)
+
+# Follow-up requests for one resume after a malformed or truncated reply
+MAX_REASKS = 1
+
+# Appended to the conversation for a targeted re-ask
+REASK_PROMPT = "Your previous reply {problem}. Return ONLY the complete JSON object in the format above, with no other text and each skill listed once."
+
+# Input tokens allowed per batched request; the rest of the 8192 context is left for the reply
+DEFAULT_BATCH_TOKEN_BUDGET = 4000
+MAX_BATCH_SIZE = 8
+
+# Shared session so sequential requests reuse pooled connections instead of a new TLS handshake each
+_session = None
+
+def get_session():
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+def build_payload(text_content):
+    """Build the chat completion payload for one resume"""
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": SKILLS_PROMPT},
+            {"role": "user", "content": text_content}
+        ],
+        "temperature": 0.1
+    }
+
+def build_reask_payload(text_content, problem, message_content=""):
+    """Payload asking again for one resume, showing the last reply and what was wrong with it"""
+    payload = build_payload(text_content)
+    payload["messages"].append({"role": "assistant", "content": message_content})
+    payload["messages"].append({"role": "user", "content": REASK_PROMPT.format(problem=problem)})
+    return payload
+
+def read_skills_reply(response_data, text_content):
+    """
+    Parse one reply for a resume (see llm_response.py). Returns (result, reask_payload):
+    a complete, valid reply gives (result, None), a truncated one its repaired skills
+    plus a re-ask, and a malformed one (None, re-ask).
+    """
+    count("replies")
+    message_content = ""
+    try:
+        message_content = reply_content(response_data)
+        result, truncated = parse_skills_reply(message_content)
+    except ResponseParseError as e:
+        count("failures")
+        logger.warning("Error parsing API response: %s", e)
+        logger.debug("Raw content causing error: %s", message_content)
+        return None, build_reask_payload(text_content, "was cut off" if e.truncated else "was not valid JSON",
+                                         message_content)
+
+    if truncated:
+        count("repaired")
+        logger.warning("API response was cut off, repaired to %s skills", len(result['skills']))
+        return result, build_reask_payload(text_content, "was cut off", message_content)
+
+    if not result["skills"]:
+        logger.warning("Warning: No skills found in response")
+    elif logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Extracted skills: %s", json.dumps(result, indent=2))
+    return result, None
+
+def lookup_cache(cache, text_content, version=PROMPT_VERSION):
+    """Cached skills for the text or None, counting the hit for every extraction mode"""
+    if cache is None:
+        return None
+    cached = cache.get(MODEL_NAME, version, text_content)
+    if cached is not None:
+        logger.debug("Using cached extraction")
+        inc("llm_cache_hits_total")
+    return cached
+
+def store_in_cache(cache, text_content, result, version=PROMPT_VERSION):
+    # Only cache real extractions; empty results may come from a malformed reply
+    if cache is not None and result and result.get("skills"):
+        cache.put(MODEL_NAME, version, text_content, result)
+
+def clean_resume_text(text_content):
+    """Normalize raw module1 text and drop headers/footers and OCR duplicates before sending it"""
+    clean_text, stats = preprocess_text(text_content)
+    logger.debug("Preprocessing removed ~%s of %s tokens", stats['tokens_removed'], stats['tokens_before'])
+    return clean_text
+
+def combine_chunk_results(results):
+    """Merge per-chunk results; the whole document fails if any chunk failed"""
+    if any(result is None for result in results):
+        return None
+    return results[0] if len(results) == 1 else merge_skill_results(results)
+
+def record_token_usage(response_data, payload):
+    """Count tokens per request from the API's usage block, estimating when it is absent"""
+    usage = response_data.get("usage") or {}
+    tokens = usage.get("total_tokens") or estimate_payload_tokens(payload)
+    inc("llm_requests_total")
+    inc("llm_tokens_total", tokens)
+    observe("llm_request_tokens", tokens, buckets=TOKEN_BUCKETS)
+
+def skills_exchange(text_content):
+    """
+    The request/re-ask exchange for one chunk of resume text, shared by the sync and
+    async paths: a generator that yields each payload to send, is sent the response
+    (None if the request failed) and returns the parsed skills.
+    A malformed or truncated reply is asked again up to MAX_REASKS times; after that
+    a repaired partial reply is kept, or None is returned so the document is retried.
+    """
+    payload = build_payload(text_content)
+    result = None
+    for attempt in range(MAX_REASKS + 1):
+        if attempt:
+            count("reasks")
+        response = yield payload
+
+        if response is None:
+            logger.error("Request failed")
+            return result
+        if response.status_code != 200:
+            logger.error("API error %s: %s", response.status_code, response.text)
+            return result
+        response_data = response.json()
+        record_token_usage(response_data, payload)
+        reply_result, payload = read_skills_reply(response_data, text_content)
+        result = reply_result or result
+        if payload is None:
+            return result
+
+    if result is None:
+        logger.error("No usable reply after %s attempts", MAX_REASKS + 1)
+    return result
+
+def request_skills(text_content, api_key, endpoint=API_ENDPOINT):
+    """Send one chunk of resume text to the API and return its parsed skills (see skills_exchange)"""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    exchange = skills_exchange(text_content)
+    try:
+        payload = next(exchange)
+        while True:
+            with timer("llm_request_seconds"):
+                response = get_session().post(endpoint, headers=headers, json=payload)
+            payload = exchange.send(response)
+    except StopIteration as finished:
+        return finished.value
+
+# Function to process a single text file and send it to the API
+def process_text_file(file_path, api_key, endpoint=API_ENDPOINT, cache=None):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            text_content = f.read()
+
+        logger.debug("Processing file: %s", file_path)
+        return extract_skills_from_text(text_content, api_key, endpoint, cache, os.path.basename(file_path))
 
     except Exception as e:
-        print(f"Error processing {file_path}: {str(e)}")
+        logger.error("Error processing %s: %s", file_path, e)
         return None
 
+def extract_skills_from_text(text_content, api_key, endpoint=API_ENDPOINT, cache=None, document=None):
+    """Preprocess raw module1 text and return its skills from the cache or the API, or None on failure"""
+    with timer("extract_skills_seconds", document), profile("extract_skills"):
+        return _extract_skills_from_text(text_content, api_key, endpoint, cache)
+
+def _extract_skills_from_text(text_content, api_key, endpoint, cache):
+    text_content = clean_resume_text(text_content)
+
+    cached = lookup_cache(cache, text_content)
+    if cached is not None:
+        return cached
+
+    # Oversized resumes are split into section-aware chunks whose skills are merged
+    chunks = split_into_chunks(text_content)
+    if len(chunks) > 1:
+        logger.info("Resume split into %s chunks", len(chunks))
+    result = combine_chunk_results([request_skills(chunk, api_key, endpoint) for chunk in chunks])
+    store_in_cache(cache, text_content, result)
+    return result
+
+# Async variant of process_text_file that goes through a shared AsyncLLMClient
+async def process_text_file_async(file_path, client, cache=None):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            text_content = f.read()
+        text_content = clean_resume_text(text_content)
+
+        cached = lookup_cache(cache, text_content)
+        if cached is not None:
+            return cached
+
+        return await extract_skills_async(text_content, client, cache)
+
+    except Exception as e:
+        logger.error("Error processing %s: %s", file_path, e)
+        return None
+
+async def extract_skills_async(text_content, client, cache=None):
+    """
+    Send one preprocessed resume to the API, in chunks if it is oversized,
+    and return its parsed skills, or None on failure.
+    """
+    chunks = split_into_chunks(text_content)
+    result = combine_chunk_results(await asyncio.gather(*(request_skills_async(chunk, client) for chunk in chunks)))
+    store_in_cache(cache, text_content, result)
+    return result
+
+async def request_skills_async(text_content, client):
+    """Send one chunk of resume text to the API and return its parsed skills (see skills_exchange)"""
+    exchange = skills_exchange(text_content)
+    try:
+        payload = next(exchange)
+        while True:
+            # AsyncLLMClient times the HTTP call itself, leaving out its queueing
+            response = await client.post(payload)
+            payload = exchange.send(response)
+    except StopIteration as finished:
+        return finished.value
+
+def new_batch_stats():
+    return {"batched_resumes": 0, "batch_requests": 0, "fallback_requests": 0,
+            "requests_saved": 0, "tokens_saved": 0}
+
+def pack_batches(items, token_budget=DEFAULT_BATCH_TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE):
+    """
+    Greedily pack (key, text) items into batches whose estimated input tokens stay
+    within token_budget. A resume too large for the budget gets a batch of its own.
+    """
+    prompt_tokens = estimate_tokens(BATCH_PROMPT)
+    batches = []
+    current, used = [], prompt_tokens
+
+    for key, text in items:
+        cost = estimate_tokens(text) + 8  # delimiter line
+        if current and (used + cost > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current, used = [], prompt_tokens
+        current.append((key, text))
+        used += cost
+
+    if current:
+        batches.append(current)
+    return batches
+
+def build_batch_payload(batch_texts):
+    """Build one payload for several resumes given as (batch_id, text) pairs"""
+    user_content = "\n\n".join(f"### RESUME {batch_id}\n{text}" for batch_id, text in batch_texts)
+    return {
+        "model": MODEL_NAME,
+        "messages": [
+            {"role": "system", "content": BATCH_PROMPT},
+            {"role": "user", "content": user_content}
+        ],
+        "temperature": 0.1
+    }
+
+def parse_batch_response(response_data, batch_ids):
+    """
+    Parse a batched reply into {batch_id: {"skills": [...]}}.
+    Entries that are missing or malformed are left out so the caller can retry them singly.
+    """
+    count("replies")
+    try:
+        return parse_batch_reply(reply_content(response_data), batch_ids)
+    except ResponseParseError as e:
+        count("failures")
+        logger.error("Error parsing batched API response: %s", e)
+        return {}
+
+async def process_batch_async(batch, client, cache, stats):
+    """
+    Extract skills for a batch of (key, text) items with one request.
+    Items missing from a malformed or partial reply fall back to single requests.
+    Returns a list of (key, result).
+    """
+    if len(batch) == 1:
+        key, text = batch[0]
+        return [(key, await extract_skills_async(text, client, cache))]
+
+    ids = {f"R{index + 1}": (key, text) for index, (key, text) in enumerate(batch)}
+    payload = build_batch_payload([(batch_id, text) for batch_id, (key, text) in ids.items()])
+    response = await client.post(payload)
+
+    parsed = {}
+    if response is not None and response.status_code == 200:
+        parsed = parse_batch_response(response.json(), set(ids))
+    elif response is not None:
+        logger.error("API error %s: %s", response.status_code, response.text)
+
+    stats["batched_resumes"] += len(batch)
+    stats["batch_requests"] += 1
+
+    results = []
+    fallback = []
+    for batch_id, (key, text) in ids.items():
+        if batch_id in parsed:
+            store_in_cache(cache, text, parsed[batch_id], BATCH_PROMPT_VERSION)
+            results.append((key, parsed[batch_id]))
+        else:
+            fallback.append((key, text))
+
+    if fallback:
+        logger.warning("Batched reply missing %s of %s resumes, retrying them singly", len(fallback), len(batch))
+        stats["fallback_requests"] += len(fallback)
+        fallback_results = await asyncio.gather(*(extract_skills_async(text, client, cache) for key, text in fallback))
+        results.extend((key, result) for (key, text), result in zip(fallback, fallback_results))
+
+    # Savings versus one request per resume: the system prompt is sent once instead of per resume
+    single_prompt_tokens = estimate_tokens(SKILLS_PROMPT)
+    stats["requests_saved"] += len(batch) - 1 - len(fallback)
+    stats["tokens_saved"] += (len(batch) * single_prompt_tokens - estimate_tokens(BATCH_PROMPT)
+                              - len(fallback) * single_prompt_tokens)
+    return results
+
 # Function to save JSON output
 def save_json_output(resume_name, data, JSONS_DIR):
     try:
         output_path = os.path.join(JSONS_DIR, f"{resume_name}.json")
         with open(output_path, "w", encoding="utf-8") as json_file:
             json.dump(data, json_file, indent=4)
-        print(f"Saved output to {output_path}")
+        logger.debug("Saved output to %s", output_path)
+        return output_path
     except Exception as e:
-        print(f"Error saving JSON output for {resume_name}: {str(e)}")
+        logger.error("Error saving JSON output for %s: %s", resume_name, e)
+        return None
+
+def plan_text_files(TEXTS_DIR, JSONS_DIR, incremental, stage=MANIFEST_STAGE):
+    """
+    List the text files to process. With incremental=True, returns only new or
+    changed files and purges JSON of deleted ones. Returns (text_files, manifest, fingerprints).
+    """
+    text_files = [f for f in os.listdir(TEXTS_DIR) if f.endswith(".txt")]
+    logger.info("Found %s text files to process", len(text_files))
+
+    if not incremental:
+        return text_files, None, {}
+
+    manifest = open_manifest(os.path.join(JSONS_DIR, MANIFEST_FILENAME))
+    sources = {text_file: os.path.join(TEXTS_DIR, text_file) for text_file in text_files}
+    to_process, deleted = plan_stage(manifest, stage, sources, os.path.exists)
+
+    for key, outputs in deleted:
+        remove_output_files(outputs)
+        forget_source(manifest, stage, key)
+
+    fingerprints = {key: fingerprint for key, path, fingerprint in to_process}
+    text_files = [key for key, path, fingerprint in to_process]
+    logger.info("%s new or changed, %s unchanged, %s removed",
+                len(text_files), len(sources) - len(text_files), len(deleted))
+    return text_files, manifest, fingerprints
+
+def open_cache(JSONS_DIR, use_cache, cache_path):
+    """Open the response cache, dropping entries made with an older single or batched prompt"""
+    if not use_cache:
+        return None
+    cache = LLMResponseCache(cache_path or os.path.join(JSONS_DIR, LLM_CACHE_FILENAME))
+    removed = cache.invalidate(keep_prompt_versions=(PROMPT_VERSION, BATCH_PROMPT_VERSION))
+    if removed:
+        logger.info("Invalidated %s cached responses from an older prompt", removed)
+    return cache
+
+def close_cache(cache):
+    if cache is None:
+        return
+    stats = cache.stats
+    logger.info("LLM cache: %s hits, %s misses (%.0f%% hit rate), %s expired, %s evicted",
+                stats['hits'], stats['misses'], cache.hit_rate() * 100, stats['expired'], stats['evictions'])
+    cache.close()
+
+def reset_run_stats():
+    """Start this run's preprocessing and reply counters from zero"""
+    reset_preprocess_stats()
+    reset_parse_stats()
+
+def print_preprocess_stats():
+    stats = preprocess_stats()
+    logger.info("Preprocessing: %s documents, ~%s of %s tokens removed, %s split into chunks",
+                stats['documents'], stats['tokens_removed'], stats['tokens_before'], stats['chunked_documents'])
+    replies = parse_stats()
+    if replies["replies"]:
+        logger.info("API replies: %s, %.1f%% unparseable, %s truncated and repaired, %s re-asked, "
+                    "%s skills rejected by the schema",
+                    replies['replies'], parse_failure_rate() * 100, replies['repaired'],
+                    replies['reasks'], replies['skills_rejected'])
+
+def save_result(text_file, processed_data, JSONS_DIR, manifest, fingerprints, stage=MANIFEST_STAGE):
+    """Save one extraction result and record it in the manifest"""
+    if not processed_data:
+        return
+    output_path = save_json_output(os.path.splitext(text_file)[0], processed_data, JSONS_DIR)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Saved skills data: %s", json.dumps(processed_data, indent=2))
+    # Failed files are left out of the manifest so the next run retries them
+    if manifest is not None and output_path:
+        record_source(manifest, stage, text_file, fingerprints[text_file], [output_path])
+
+def dedup_text_files(text_files, TEXTS_DIR, JSONS_DIR, manifest, fingerprints):
+    """
+    Split duplicates off the planned text files (see dedup.split_duplicates).
+    Unchanged files it rechecks were not planned, so they are fingerprinted here.
+    """
+    unique_files, duplicates = split_duplicates(text_files, TEXTS_DIR, JSONS_DIR)
+    if manifest is not None:
+        for text_file in unique_files + list(duplicates):
+            if text_file not in fingerprints:
+                fingerprints[text_file] = file_fingerprint(os.path.join(TEXTS_DIR, text_file))
+    return unique_files, duplicates
+
+def save_duplicate_results(duplicates, JSONS_DIR, manifest, fingerprints, stage=MANIFEST_STAGE):
+    """
+    Give each duplicate its canonical document's extracted skills, marked with
+    duplicate_of so module3 links it to the canonical resume instead of storing a copy.
+    """
+    for text_file, (canonical_file, similarity) in duplicates.items():
+        canonical_json = os.path.join(JSONS_DIR, f"{os.path.splitext(canonical_file)[0]}.json")
+        try:
+            with open(canonical_json, "r", encoding="utf-8") as f:
+                canonical_data = json.load(f)
+        except (OSError, ValueError) as e:
+            # Left out of the manifest, so the next run retries it
+            logger.warning("No extracted skills for %s to reuse for %s: %s", canonical_file, text_file, e)
+            continue
+        canonical_data["duplicate_of"] = os.path.splitext(canonical_file)[0]
+        canonical_data["similarity"] = round(similarity, 3)
+        save_result(text_file, canonical_data, JSONS_DIR, manifest, fingerprints, stage)
 
 # Main logic to process all text files
-def process_all_files(TEXTS_DIR, JSONS_DIR, api_key):  # Changed parameter from db_file to api_key
+def process_all_files(TEXTS_DIR, JSONS_DIR, api_key, incremental=True, max_in_flight=1,
+                      requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                      endpoint=API_ENDPOINT, use_cache=True, cache_path=None,
+                      batch_token_budget=None, no_llm=False, dedup=True, use_queue=False,
+                      priority=PRIORITY_NORMAL):  # Changed parameter from db_file to api_key
+    """
+    Extract skills for every text file in TEXTS_DIR into JSONS_DIR.
+    With incremental=True, only new or changed text files are sent to the API and
+    JSON files of deleted text files are removed, using a manifest kept in JSONS_DIR.
+    With max_in_flight > 1, requests are sent concurrently through process_all_files_async.
+    With use_cache=True, responses are cached on disk (default: <JSONS_DIR>/.llm_cache.sqlite)
+    and identical resume text never goes to the API twice.
+    With batch_token_budget set, several resumes are packed into each request (see pack_batches).
+    With no_llm=True, skills come from the local taxonomy matcher and the API is never called.
+    With dedup=True, exact and near-duplicate resumes (see dedup.split_duplicates) are not
+    sent to the API; they reuse the skills of the first copy and are marked duplicate_of it.
+    With use_queue=True, files go through the durable work queue in JSONS_DIR (see
+    enqueue_text_files and work_text_queue): failed requests are retried and then
+    dead-lettered instead of forgotten, and a run that dies resumes where it stopped.
+    The queue sends one request at a time per worker (start more work_text_queue
+    processes to go faster), so it cannot be combined with no_llm, max_in_flight > 1
+    or batch_token_budget.
+    """
+    if use_queue and (no_llm or max_in_flight > 1 or batch_token_budget):
+        raise ValueError("use_queue cannot be combined with no_llm, max_in_flight > 1 or batch_token_budget")
+    reset_run_stats()
+
+    if no_llm:
+        return process_all_files_fast(TEXTS_DIR, JSONS_DIR, incremental, dedup)
+
+    if use_queue:
+        enqueue_text_files(TEXTS_DIR, JSONS_DIR, priority, incremental, dedup)
+        return work_text_queue(TEXTS_DIR, JSONS_DIR, api_key, endpoint, use_cache, cache_path)
+
+    if max_in_flight > 1 or batch_token_budget:
+        return asyncio.run(process_all_files_async(TEXTS_DIR, JSONS_DIR, api_key, incremental, max_in_flight,
+                                                   requests_per_minute, tokens_per_minute, endpoint,
+                                                   use_cache, cache_path, batch_token_budget, dedup))
+
     if not os.path.exists(JSONS_DIR):
         os.makedirs(JSONS_DIR)
 
-    text_files = [f for f in os.listdir(TEXTS_DIR) if f.endswith(".txt")]
-    print(f"Found {len(text_files)} text files to process")
-    
+    text_files, manifest, fingerprints = plan_text_files(TEXTS_DIR, JSONS_DIR, incremental)
+    duplicates = {}
+    if dedup:
+        text_files, duplicates = dedup_text_files(text_files, TEXTS_DIR, JSONS_DIR, manifest, fingerprints)
+    cache = open_cache(JSONS_DIR, use_cache, cache_path)
+
     for text_file in text_files:
         file_path = os.path.join(TEXTS_DIR, text_file)
-        print(f"\nProcessing: {text_file}")
-        processed_data = process_text_file(file_path, api_key)  # Use api_key here
-        if processed_data:
-            save_json_output(os.path.splitext(text_file)[0], processed_data, JSONS_DIR)
-            print(f"Saved skills data: {json.dumps(processed_data, indent=2)}")
\ No newline at end of file
+        logger.debug("Processing: %s", text_file)
+        processed_data = process_text_file(file_path, api_key, endpoint, cache)  # Use api_key here
+        save_result(text_file, processed_data, JSONS_DIR, manifest, fingerprints)
+
+    save_duplicate_results(duplicates, JSONS_DIR, manifest, fingerprints)
+    close_cache(cache)
+    print_preprocess_stats()
+    if manifest is not None:
+        manifest.close()
+
+# Function to queue new or changed text files for skill extraction
+def enqueue_text_files(TEXTS_DIR, JSONS_DIR, priority=PRIORITY_NORMAL, incremental=True, dedup=True):
+    """
+    Plan the text files like process_all_files and add them to the work queue kept
+    in JSONS_DIR; higher priorities are extracted first. Duplicates are queued too,
+    and take their canonical document's skills once it is done. Returns the number queued.
+    """
+    if not os.path.exists(JSONS_DIR):
+        os.makedirs(JSONS_DIR)
+
+    text_files, manifest, fingerprints = plan_text_files(TEXTS_DIR, JSONS_DIR, incremental)
+    duplicates = {}
+    if dedup:
+        text_files, duplicates = dedup_text_files(text_files, TEXTS_DIR, JSONS_DIR, manifest, fingerprints)
+
+    payloads = {text_file: {"fingerprint": fingerprints.get(text_file)} for text_file in text_files}
+    for text_file, (canonical_file, similarity) in duplicates.items():
+        payloads[text_file] = {"fingerprint": fingerprints.get(text_file), "duplicate_of": canonical_file,
+                               "similarity": similarity}
+
+    queue = WorkQueue(os.path.join(JSONS_DIR, WORK_QUEUE_FILENAME), MANIFEST_STAGE)
+    try:
+        queued = queue.enqueue({text_file: payload["fingerprint"][2] if payload["fingerprint"] else None
+                                for text_file, payload in payloads.items()}, priority, payloads)
+        logger.info("Queued %s text files for skill extraction at priority %s", queued, priority)
+        queue.log_summary()
+    finally:
+        queue.close()
+        if manifest is not None:
+            manifest.close()
+    return queued
+
+# Function to extract skills for queued text files until none are left
+def work_text_queue(TEXTS_DIR, JSONS_DIR, api_key, endpoint=API_ENDPOINT, use_cache=True, cache_path=None,
+                    worker_id=None):
+    """
+    Lease text files from the work queue in JSONS_DIR and extract their skills, saving
+    and recording each result before the file is marked done. A file with no usable
+    reply (API outage, bad output) is retried after a delay and dead-lettered after
+    its last attempt. The lease is renewed while a file's requests are in flight. Run this in several processes to share the queue between workers.
+    """
+    reset_run_stats()
+    manifest = open_manifest(os.path.join(JSONS_DIR, MANIFEST_FILENAME))
+    cache = open_cache(JSONS_DIR, use_cache, cache_path)
+    queue = WorkQueue(os.path.join(JSONS_DIR, WORK_QUEUE_FILENAME), MANIFEST_STAGE, worker_id)
+    processed = 0
+    try:
+        for text_file, payload in queue.iter_leased():
+            # Files queued without incremental mode are not recorded in the manifest
+            fingerprints = {text_file: tuple(payload["fingerprint"])} if payload["fingerprint"] else {}
+            record_in = manifest if fingerprints else None
+            canonical_file = payload.get("duplicate_of")
+            try:
+                if canonical_file:
+                    canonical_state = queue.state(canonical_file)
+                    canonical_json = os.path.join(JSONS_DIR, f"{os.path.splitext(canonical_file)[0]}.json")
+                    if canonical_state in ("pending", "leased"):
+                        # Its canonical document is not extracted yet
+                        queue.defer(text_file)
+                        continue
+                    if canonical_state != "dead" and os.path.exists(canonical_json):
+                        save_duplicate_results({text_file: (canonical_file, payload["similarity"])}, JSONS_DIR,
+                                               record_in, fingerprints)
+                        queue.complete(text_file)
+                        processed += 1
+                        continue
+                    # The canonical document failed, so this copy is extracted on its own
+
+                with queue.heartbeat(text_file):
+                    processed_data = process_text_file(os.path.join(TEXTS_DIR, text_file), api_key, endpoint, cache)
+                if not processed_data:
+                    queue.fail(text_file, "no usable skills in the API reply")
+                    continue
+                save_result(text_file, processed_data, JSONS_DIR, record_in, fingerprints)
+                queue.complete(text_file)
+                processed += 1
+            except Exception as e:
+                logger.error("Error processing %s: %s", text_file, e)
+                queue.fail(text_file, str(e))
+    finally:
+        # Leases still held (e.g. on Ctrl+C) go straight back to the queue
+        queue.release()
+        queue.log_summary()
+        queue.close()
+        close_cache(cache)
+        manifest.close()
+
+    print_preprocess_stats()
+    logger.info("Worker %s extracted skills for %s files", queue.worker_id, processed)
+    return processed
+
+def process_all_files_fast(TEXTS_DIR, JSONS_DIR, incremental=True, dedup=True):
+    """No-LLM fast path: extract skills for every text file with the compiled taxonomy matcher"""
+    if not os.path.exists(JSONS_DIR):
+        os.makedirs(JSONS_DIR)
+
+    start_time = time.perf_counter()
+    text_files, manifest, fingerprints = plan_text_files(TEXTS_DIR, JSONS_DIR, incremental, FAST_MANIFEST_STAGE)
+    duplicates = {}
+    if dedup:
+        text_files, duplicates = dedup_text_files(text_files, TEXTS_DIR, JSONS_DIR, manifest, fingerprints)
+    matcher = get_default_matcher()
+
+    for text_file in text_files:
+        with open(os.path.join(TEXTS_DIR, text_file), "r", encoding="utf-8") as f:
+            text_content, stats = preprocess_text(f.read())
+        save_result(text_file, extract_skills_fast(text_content, matcher), JSONS_DIR, manifest, fingerprints,
+                    FAST_MANIFEST_STAGE)
+    save_duplicate_results(duplicates, JSONS_DIR, manifest, fingerprints, FAST_MANIFEST_STAGE)
+
+    if manifest is not None:
+        manifest.close()
+
+    # Planning and dedup are timed too, since on this path they cost as much as extraction
+    elapsed = time.perf_counter() - start_time
+    handled = len(text_files) + len(duplicates)
+    rate = handled / elapsed * 60 if elapsed > 0 else 0.0
+    logger.info("Fast path handled %s files (%s duplicates) in %.2fs (%.0f files/min)",
+                handled, len(duplicates), elapsed, rate)
+
+async def process_all_files_async(TEXTS_DIR, JSONS_DIR, api_key, incremental=True, max_in_flight=8,
+                                  requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                                  tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, endpoint=API_ENDPOINT,
+                                  use_cache=True, cache_path=None, batch_token_budget=None, dedup=True):
+    """
+    Concurrent version of process_all_files: up to max_in_flight requests share one
+    pooled HTTP client, limited to requests_per_minute and tokens_per_minute and
+    retried with exponential backoff on 429/5xx.
+    With batch_token_budget set, resumes not found in the cache are packed into
+    multi-resume requests of at most that many input tokens.
+    """
+    if not os.path.exists(JSONS_DIR):
+        os.makedirs(JSONS_DIR)
+
+    reset_run_stats()
+    text_files, manifest, fingerprints = plan_text_files(TEXTS_DIR, JSONS_DIR, incremental)
+    duplicates = {}
+    if dedup:
+        text_files, duplicates = dedup_text_files(text_files, TEXTS_DIR, JSONS_DIR, manifest, fingerprints)
+    cache = open_cache(JSONS_DIR, use_cache, cache_path)
+    client = AsyncLLMClient(endpoint, api_key, max_in_flight, requests_per_minute, tokens_per_minute)
+    start_time = time.perf_counter()
+
+    batch_stats = new_batch_stats()
+
+    async def handle(text_file):
+        processed_data = await process_text_file_async(os.path.join(TEXTS_DIR, text_file), client, cache)
+        save_result(text_file, processed_data, JSONS_DIR, manifest, fingerprints)
+
+    async def handle_batch(batch):
+        for text_file, processed_data in await process_batch_async(batch, client, cache, batch_stats):
+            save_result(text_file, processed_data, JSONS_DIR, manifest, fingerprints)
+
+    try:
+        if batch_token_budget:
+            pending = []
+            for text_file in text_files:
+                with open(os.path.join(TEXTS_DIR, text_file), "r", encoding="utf-8") as f:
+                    text_content = clean_resume_text(f.read())
+                # Resumes extracted singly before (e.g. a batch fallback) are reused too
+                cached = lookup_cache(cache, text_content, (BATCH_PROMPT_VERSION, PROMPT_VERSION))
+                if cached is not None:
+                    save_result(text_file, cached, JSONS_DIR, manifest, fingerprints)
+                else:
+                    pending.append((text_file, text_content))
+            batches = pack_batches(pending, batch_token_budget)
+            await asyncio.gather(*(handle_batch(batch) for batch in batches))
+        else:
+            await asyncio.gather(*(handle(text_file) for text_file in text_files))
+        save_duplicate_results(duplicates, JSONS_DIR, manifest, fingerprints)
+    finally:
+        client.close()
+        close_cache(cache)
+        if manifest is not None:
+            manifest.close()
+
+    elapsed = time.perf_counter() - start_time
+    print_preprocess_stats()
+    logger.info("Processed %s files in %.2fs (%s requests, %s retries, %s failures)",
+                len(text_files), elapsed, client.stats['requests'], client.stats['retries'], client.stats['failures'])
+    if batch_token_budget:
+        logger.info("Batching: %s resumes in %s batched requests, %s single-request fallbacks, "
+                    "%s requests saved, ~%s prompt tokens saved",
+                    batch_stats['batched_resumes'], batch_stats['batch_requests'], batch_stats['fallback_requests'],
+                    batch_stats['requests_saved'], batch_stats['tokens_saved'])
+    return batch_stats
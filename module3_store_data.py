@@ -1,11 +1,171 @@
+import logging
 import os
 import sqlite3
 import json
+from ingest_manifest import open_manifest, plan_stage, record_source, forget_source, get_outputs, file_fingerprint
+from skill_matcher import load_taxonomy
+from instrumentation import timer, inc
+
+logger = logging.getLogger(__name__)
+
+# Manifest stage name for skills JSON -> database rows
+MANIFEST_STAGE = "store_data"
+
+# Manifest stage name for skills JSON -> analytics store rows, tracked apart from
+# store_data so a failed sync is retried on the next run
+ANALYTICS_STAGE = "analytics"
+
+# Resumes written per transaction in bulk mode
+DEFAULT_BATCH_SIZE = 500
+
+# Bulk load tuning: WAL lets readers keep working during a load, and NORMAL
+# synchronous mode fsyncs at checkpoints instead of on every commit
+BULK_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",  # 64 MB page cache
+    "PRAGMA temp_store=MEMORY",
+]
+
+# Stored in PRAGMA user_version; version 2 is the normalized skill dictionary schema
+SCHEMA_VERSION = 2
+
+# Normalized skill storage: one 'skill' row per case-folded name, aliases pointing at
+# canonical skills, and a compact resume_skill join table indexed in both directions
+SKILL_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS skill (
+           id INTEGER PRIMARY KEY,
+           name TEXT NOT NULL,
+           name_key TEXT NOT NULL UNIQUE
+       )''',
+    '''CREATE TABLE IF NOT EXISTS skill_alias (
+           alias_key TEXT PRIMARY KEY,
+           skill_id INTEGER NOT NULL REFERENCES skill(id)
+       ) WITHOUT ROWID''',
+    '''CREATE TABLE IF NOT EXISTS resume_skill (
+           resume_id INTEGER NOT NULL REFERENCES resumes(id),
+           skill_id INTEGER NOT NULL REFERENCES skill(id),
+           type TEXT NOT NULL,
+           PRIMARY KEY (resume_id, skill_id, type)
+       ) WITHOUT ROWID''',
+    # The primary key covers resume -> skills; this covers skill -> resumes
+    "CREATE INDEX IF NOT EXISTS idx_resume_skill_skill ON resume_skill(skill_id, resume_id, type)",
+]
+
+# The old 'skills' table survives as a view so existing queries and inserts keep working
+SKILLS_VIEW = [
+    '''CREATE VIEW IF NOT EXISTS skills AS
+           SELECT rs.resume_id AS resume_id, rs.type AS skill_type, s.name AS skill_name
+           FROM resume_skill rs JOIN skill s ON s.id = rs.skill_id''',
+    '''CREATE TRIGGER IF NOT EXISTS skills_insert INSTEAD OF INSERT ON skills
+       BEGIN
+           INSERT OR IGNORE INTO skill (name, name_key)
+               SELECT trim(NEW.skill_name), lower(trim(NEW.skill_name))
+               WHERE NOT EXISTS (SELECT 1 FROM skill_alias WHERE alias_key = lower(trim(NEW.skill_name)));
+           INSERT OR IGNORE INTO resume_skill (resume_id, skill_id, type)
+               VALUES (NEW.resume_id,
+                       COALESCE((SELECT skill_id FROM skill_alias WHERE alias_key = lower(trim(NEW.skill_name))),
+                                (SELECT id FROM skill WHERE name_key = lower(trim(NEW.skill_name)))),
+                       NEW.skill_type);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS skills_delete INSTEAD OF DELETE ON skills
+       BEGIN
+           DELETE FROM resume_skill WHERE resume_id = OLD.resume_id;
+       END''',
+]
+
+def skill_key(skill_name):
+    """Case-folded lookup key for a skill name (matches lower(trim(...)) in SQL)"""
+    return str(skill_name).strip().lower()
+
+def seed_skill_dictionary(cursor, taxonomy):
+    """Add canonical skills and their aliases from a skill taxonomy (see skill_matcher.py)"""
+    for entry in taxonomy:
+        key = skill_key(entry["name"])
+        cursor.execute("INSERT OR IGNORE INTO skill (name, name_key) VALUES (?, ?)", (entry["name"].strip(), key))
+        skill_id = cursor.execute("SELECT id FROM skill WHERE name_key = ?", (key,)).fetchone()[0]
+        cursor.executemany("INSERT OR IGNORE INTO skill_alias (alias_key, skill_id) VALUES (?, ?)",
+                           [(skill_key(alias), skill_id) for alias in entry.get("aliases", [])
+                            if skill_key(alias) != key])
+
+def upgrade_skill_schema(conn):
+    """
+    Bring the database to SCHEMA_VERSION in one transaction. Free-text rows of an
+    old 'skills' table are moved into skill/resume_skill (aliases resolved to
+    canonical skills, duplicates per resume collapsed) and the table becomes a view.
+    """
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0]
+    row = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'skills'").fetchone()
+    legacy_table = row is not None and row[0] == "table"
+    if version >= SCHEMA_VERSION and not legacy_table:
+        return
+
+    if not conn.in_transaction:
+        cursor.execute("BEGIN")
+    for statement in SKILL_SCHEMA:
+        cursor.execute(statement)
+    seed_skill_dictionary(cursor, load_taxonomy())
+
+    if legacy_table:
+        logger.info("Migrating skills table to the skill dictionary schema...")
+        cursor.execute('''INSERT OR IGNORE INTO skill (name, name_key)
+                          SELECT trim(skill_name), lower(trim(skill_name)) FROM skills
+                          WHERE lower(trim(skill_name)) NOT IN (SELECT alias_key FROM skill_alias)
+                          ORDER BY id''')
+        cursor.execute('''INSERT OR IGNORE INTO resume_skill (resume_id, skill_id, type)
+                          SELECT s.resume_id,
+                                 COALESCE(a.skill_id, k.id),
+                                 s.skill_type
+                          FROM skills s
+                          LEFT JOIN skill_alias a ON a.alias_key = lower(trim(s.skill_name))
+                          LEFT JOIN skill k ON k.name_key = lower(trim(s.skill_name))''')
+        migrated = cursor.execute("SELECT COUNT(*) FROM resume_skill").fetchone()[0]
+        cursor.execute("DROP TABLE skills")
+        logger.info("Migrated %s resume skills", migrated)
+
+    for statement in SKILLS_VIEW:
+        cursor.execute(statement)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    conn.commit()
+
+def get_skill_id(cursor, skill_name, cache=None):
+    """Resolve a skill name (or alias) to its skill ID, adding it to the dictionary if new"""
+    key = skill_key(skill_name)
+    if cache is not None and key in cache:
+        return cache[key]
+
+    row = cursor.execute("SELECT skill_id FROM skill_alias WHERE alias_key = ?", (key,)).fetchone()
+    if row is None:
+        row = cursor.execute("SELECT id FROM skill WHERE name_key = ?", (key,)).fetchone()
+    if row is None:
+        cursor.execute("INSERT INTO skill (name, name_key) VALUES (?, ?)", (str(skill_name).strip(), key))
+        skill_id = cursor.lastrowid
+    else:
+        skill_id = row[0]
+
+    if cache is not None:
+        cache[key] = skill_id
+    return skill_id
+
+def insert_resume_skill(cursor, resume_id, skill_type, skill_name, cache=None):
+    cursor.execute('''INSERT OR IGNORE INTO resume_skill (resume_id, skill_id, type)
+                      VALUES (?, ?, ?)''', (resume_id, get_skill_id(cursor, skill_name, cache), skill_type))
+# Resumes that module2 found to duplicate another resume are linked to that
+# canonical resume instead of getting their own rows
+DUPLICATE_SCHEMA = '''CREATE TABLE IF NOT EXISTS resume_duplicate (
+                          resume_name TEXT PRIMARY KEY,
+                          canonical_name TEXT NOT NULL,
+                          similarity REAL
+                      )'''
+INSERT_DUPLICATE_LINK = '''INSERT OR REPLACE INTO resume_duplicate (resume_name, canonical_name, similarity)
+                           VALUES (?, ?, ?)'''
+
 
 # Function to initialize the database and create the required tables
 def initialize_database(db_file):
     try:
-        print("Initializing database...")
+        logger.debug("Initializing database...")
         # Ensure the directory for the database exists
         if not os.path.exists(os.path.dirname(db_file)):
             os.makedirs(os.path.dirname(db_file))
@@ -21,23 +181,22 @@ def initialize_database(db_file):
                             feedback TEXT NOT NULL
                         )''')
 
-        # Create the 'skills' table if it doesn't exist
-        cursor.execute('''CREATE TABLE IF NOT EXISTS skills (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            resume_id INTEGER NOT NULL,
-                            skill_type TEXT NOT NULL,
-                            skill_name TEXT NOT NULL,
-                            FOREIGN KEY(resume_id) REFERENCES resumes(id)
-                        )''')
+        # Create the skill dictionary and resume_skill tables, migrating an old 'skills' table
+        upgrade_skill_schema(conn)
+        cursor.execute(DUPLICATE_SCHEMA)
 
         conn.commit()
         conn.close()
-        print("Database initialized and tables created (if not already present).")
+        logger.debug("Database initialized and tables created (if not already present).")
     except Exception as e:
-        print(f"Error initializing database: {e}")
+        logger.error("Error initializing database: %s", e)
 
 # Function to insert resume data into the database
 def insert_resume_data(resume_file, structured_data_dir, feedback_dir, db_file):
+    """
+    Insert one resume and its skills. Returns the new resume ID, 0 if the resume is a
+    duplicate and was only linked to its canonical resume, or None if nothing was stored.
+    """
     try:
         resume_name = os.path.basename(resume_file)
         json_file_path = os.path.join(feedback_dir, f"{os.path.splitext(resume_name)[0]}.json")
@@ -48,59 +207,279 @@ def insert_resume_data(resume_file, structured_data_dir, feedback_dir, db_file):
                 structured_data = json.load(f)
                 
             # Debug print
-            print(f"\nProcessing resume: {resume_name}")
-            print(f"Structured data: {json.dumps(structured_data, indent=2)}")
-
-            conn = sqlite3.connect(db_file)
-            cursor = conn.cursor()
-
-            # Store the structured JSON data
-            cursor.execute('''INSERT INTO resumes (resume_name, structured_data, feedback)
-                            VALUES (?, ?, ?)''', 
-                            (resume_name, 
-                             json.dumps(structured_data),
-                             json.dumps({})))
+            logger.debug("Processing resume: %s", resume_name)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Structured data: %s", json.dumps(structured_data, indent=2))
+
+            if structured_data.get("duplicate_of"):
+                conn = sqlite3.connect(db_file)
+                conn.execute(INSERT_DUPLICATE_LINK, duplicate_link_row(resume_name, structured_data))
+                conn.commit()
+                conn.close()
+                logger.debug("%s duplicates %s, linked instead of stored", resume_name, structured_data['duplicate_of'])
+                return 0
+
+            with timer("db_write_seconds", resume_name):
+                conn = sqlite3.connect(db_file)
+                cursor = conn.cursor()
+                # The resume may have been linked as a duplicate before it changed
+                cursor.execute("DELETE FROM resume_duplicate WHERE resume_name = ?", (resume_name,))
+
+                # Store the structured JSON data
+                cursor.execute('''INSERT INTO resumes (resume_name, structured_data, feedback)
+                                VALUES (?, ?, ?)''', 
+                                (resume_name, 
+                                 json.dumps(structured_data),
+                                 json.dumps({})))
             
-            resume_id = cursor.lastrowid
+                resume_id = cursor.lastrowid
 
-            # Insert skills with better error handling
-            if 'skills' in structured_data and structured_data['skills']:
-                for skill in structured_data['skills']:
-                    try:
-                        if isinstance(skill, dict) and 'type' in skill and 'name' in skill:
-                            cursor.execute('''INSERT INTO skills (resume_id, skill_type, skill_name)
-                                           VALUES (?, ?, ?)''', 
-                                           (resume_id, 
-                                            skill['type'],
-                                            skill['name']))
-                        else:
-                            print(f"Skipping invalid skill format: {skill}")
-                    except Exception as e:
-                        print(f"Error inserting skill {skill}: {e}")
-
-            conn.commit()
-            conn.close()
-            print(f"Successfully processed and stored data for {resume_name}")
+                # Insert skills with better error handling
+                if 'skills' in structured_data and structured_data['skills']:
+                    for skill in structured_data['skills']:
+                        try:
+                            if isinstance(skill, dict) and 'type' in skill and 'name' in skill:
+                                insert_resume_skill(cursor, resume_id, skill['type'], skill['name'])
+                            else:
+                                logger.warning("Skipping invalid skill format: %s", skill)
+                        except Exception as e:
+                            logger.error("Error inserting skill %s: %s", skill, e)
+
+                conn.commit()
+                conn.close()
+            inc("resumes_stored_total")
+            logger.debug("Successfully processed and stored data for %s", resume_name)
+            return resume_id
         else:
-            print(f"Missing structured data file: {json_file_path}")
+            logger.warning("Missing structured data file: %s", json_file_path)
     except Exception as e:
-        print(f"Error processing {resume_name}: {e}")
+        logger.error("Error processing %s: %s", resume_name, e)
+    return None
+
+# Function to delete previously stored resumes and their skills
+def delete_resume_rows(db_file, resume_ids):
+    if not resume_ids:
+        return
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.executemany("DELETE FROM resume_skill WHERE resume_id = ?", [(resume_id,) for resume_id in resume_ids])
+        conn.executemany("DELETE FROM resumes WHERE id = ?", [(resume_id,) for resume_id in resume_ids])
+        conn.commit()
+    finally:
+        conn.close()
 
-# Function to insert skills into the 'skills' table
+# Function to delete the duplicate links of removed resumes
+def delete_duplicate_links(db_file, resume_names):
+    if not resume_names:
+        return
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.executemany("DELETE FROM resume_duplicate WHERE resume_name = ?",
+                         [(resume_name,) for resume_name in resume_names])
+        conn.commit()
+    finally:
+        conn.close()
+
+def duplicate_link_row(resume_name, structured_data):
+    """(resume_name, canonical_name, similarity) for a resume module2 marked as a duplicate"""
+    return resume_name, f"{structured_data['duplicate_of']}.pdf", structured_data.get("similarity")
+
+# Function to insert skills into the 'resume_skill' table
 def insert_skills(resume_id, skills, conn, cursor):
     try:
         for skill in skills:
             skill_type = skill.get("type", "Unknown")  # Adjust if structure is different
             skill_name = skill.get("name", "Unknown")
-            cursor.execute('''INSERT INTO skills (resume_id, skill_type, skill_name)
-                             VALUES (?, ?, ?)''', (resume_id, skill_type, skill_name))
+            insert_resume_skill(cursor, resume_id, skill_type, skill_name)
     except Exception as e:
-        print(f"Error inserting skills for resume ID {resume_id}: {e}")
+        logger.error("Error inserting skills for resume ID %s: %s", resume_id, e)
+
+# Function to open one connection for a bulk load
+def open_bulk_connection(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.isolation_level = None  # Transactions are managed explicitly with BEGIN/COMMIT
+    for pragma in BULK_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def load_structured_data(resume_file, feedback_dir):
+    """Load the skills JSON for a resume. Raises if it is missing or unreadable."""
+    resume_name = os.path.basename(resume_file)
+    json_file_path = os.path.join(feedback_dir, f"{os.path.splitext(resume_name)[0]}.json")
+    with open(json_file_path, 'r', encoding="utf-8") as f:
+        return resume_name, json.load(f)
+
+def valid_skill_rows(structured_data):
+    """Return (skill_type, skill_name) pairs for well-formed skills, skipping the rest"""
+    rows = []
+    for skill in structured_data.get('skills') or []:
+        if isinstance(skill, dict) and 'type' in skill and 'name' in skill:
+            rows.append((skill['type'], skill['name']))
+        else:
+            logger.warning("Skipping invalid skill format: %s", skill)
+    return rows
+
+def write_resume_batch(conn, batch, fingerprints=None, skill_ids=None, stage=MANIFEST_STAGE):
+    """
+    Write a batch of (resume_name, structured_data) inside the caller's transaction.
+    Resume IDs are allocated up front so resumes and skills both go in with executemany.
+    With fingerprints, rows from an earlier version of each resume are replaced and
+    the manifest entries under stage are updated in the same transaction. skill_ids
+    caches skill name -> ID lookups across batches. Resumes marked duplicate_of another are only linked to it.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'resumes'), 0), "
+                   "COALESCE((SELECT MAX(id) FROM resumes), 0))")
+    next_id = cursor.fetchone()[0] + 1
+
+    resume_rows = []
+    skill_rows = []
+    stale_ids = []
+    duplicate_rows = []
+    for resume_name, structured_data in batch:
+        if fingerprints is not None:
+            stale_ids.extend(get_outputs(conn, stage, resume_name))
+        if structured_data.get("duplicate_of"):
+            duplicate_rows.append(duplicate_link_row(resume_name, structured_data))
+            continue
+        resume_rows.append((next_id, resume_name, json.dumps(structured_data), json.dumps({})))
+        skill_rows.extend((next_id, get_skill_id(cursor, skill_name, skill_ids), skill_type)
+                          for skill_type, skill_name in valid_skill_rows(structured_data))
+        next_id += 1
+
+    with timer("db_batch_write_seconds"):
+        if stale_ids:
+            cursor.executemany("DELETE FROM resume_skill WHERE resume_id = ?", [(resume_id,) for resume_id in stale_ids])
+            cursor.executemany("DELETE FROM resumes WHERE id = ?", [(resume_id,) for resume_id in stale_ids])
+
+        cursor.executemany('''INSERT INTO resumes (id, resume_name, structured_data, feedback)
+                              VALUES (?, ?, ?, ?)''', resume_rows)
+        cursor.executemany('''INSERT OR IGNORE INTO resume_skill (resume_id, skill_id, type)
+                              VALUES (?, ?, ?)''', skill_rows)
+        cursor.executemany("DELETE FROM resume_duplicate WHERE resume_name = ?",
+                           [(resume_name,) for resume_id, resume_name, structured_json, feedback_json in resume_rows])
+        cursor.executemany(INSERT_DUPLICATE_LINK, duplicate_rows)
+    inc("resumes_stored_total", len(resume_rows))
+
+    if fingerprints is not None:
+        for resume_id, resume_name, structured_json, feedback_json in resume_rows:
+            record_source(conn, stage, resume_name, fingerprints[resume_name], [resume_id], commit=False)
+        for resume_name, canonical_name, similarity in duplicate_rows:
+            record_source(conn, stage, resume_name, fingerprints[resume_name], [], commit=False)
+
+# Function to bulk load many resumes over one connection
+def bulk_insert_resumes(resume_files, feedback_dir, db_file, batch_size=DEFAULT_BATCH_SIZE, fingerprints=None):
+    """
+    Load resumes in batch transactions of batch_size over a single connection.
+    If a batch fails, it is retried one resume at a time so one bad row does not
+    sink the rest. Returns (processed_count, error_count), counting every file.
+    """
+    processed_count = 0
+    error_count = 0
+    conn = open_bulk_connection(db_file)
+    skill_ids = {}
+
+    def commit_batch(batch):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            write_resume_batch(conn, batch, fingerprints, skill_ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            skill_ids.clear()  # Skills added by the rolled-back batch no longer exist
+            raise
+
+    try:
+        for start in range(0, len(resume_files), batch_size):
+            batch = []
+            for resume_file in resume_files[start:start + batch_size]:
+                try:
+                    batch.append(load_structured_data(resume_file, feedback_dir))
+                except Exception as e:
+                    logger.error("Error loading structured data for %s: %s", os.path.basename(resume_file), e)
+                    error_count += 1
+
+            if not batch:
+                continue
+            try:
+                commit_batch(batch)
+                processed_count += len(batch)
+            except sqlite3.Error as e:
+                logger.warning("Batch insert failed (%s), retrying %s resumes one by one", e, len(batch))
+                for item in batch:
+                    try:
+                        commit_batch([item])
+                        processed_count += 1
+                    except sqlite3.Error as e:
+                        logger.error("Error storing %s: %s", item[0], e)
+                        error_count += 1
+
+            logger.info("Stored %s resumes (%s errors)", processed_count, error_count)
+    finally:
+        conn.close()
+
+    return processed_count, error_count
+
+# Function to mirror the stored resumes into another resume store
+def sync_analytics_store(analytics_db, feedback_dir, db_file, resume_files, incremental=True):
+    """
+    Load the skills JSON of resume_files (PDF names) into the store at analytics_db
+    (a .duckdb file is a columnar store, see storage.py) and drop resumes whose PDF
+    is gone. Progress is kept under ANALYTICS_STAGE in db_file's manifest and only
+    recorded once the store has taken the changes, so a failed sync is retried.
+    With incremental=False every resume is reloaded.
+    Returns (loaded_count, error_count).
+    """
+    from storage import open_store  # duckdb is only needed for this path
+
+    sources = {}
+    for resume_file in resume_files:
+        json_path = os.path.join(feedback_dir, f"{os.path.splitext(resume_file)[0]}.json")
+        if os.path.exists(json_path):
+            sources[resume_file] = json_path
+
+    manifest = open_manifest(db_file)
+    try:
+        to_process, deleted = plan_stage(manifest, ANALYTICS_STAGE, sources)
+        # A PDF whose JSON is missing keeps what was loaded for it
+        present = set(resume_files)
+        deleted = [(key, outputs) for key, outputs in deleted if key not in present]
+        if not incremental:
+            to_process = [(key, path, file_fingerprint(path)) for key, path in sources.items()]
+
+        try:
+            with open_store(analytics_db) as store:
+                store.delete_resumes([key for key, outputs in deleted])
+                loaded = store.load_json_folder(feedback_dir, [key for key, path, fingerprint in to_process])
+        except Exception as e:
+            logger.error("Error updating analytics store %s: %s", analytics_db, e)
+            return 0, len(to_process) + len(deleted)
+
+        for key, outputs in deleted:
+            forget_source(manifest, ANALYTICS_STAGE, key)
+        for key, path, fingerprint in to_process:
+            record_source(manifest, ANALYTICS_STAGE, key, fingerprint, [], commit=False)
+        manifest.commit()
+    finally:
+        manifest.close()
+
+    logger.info("Analytics store: %s resumes loaded, %s removed", loaded, len(deleted))
+    return loaded, len(to_process) - loaded
 
 # Function to process all resumes in the resumes directory
-def process_resumes(resume_dir, structured_data_dir, feedback_dir, db_file):
-    """Process all resumes in the resumes directory"""
-    print("Processing resumes...")
+def process_resumes(resume_dir, structured_data_dir, feedback_dir, db_file, incremental=True,
+                    bulk=False, batch_size=DEFAULT_BATCH_SIZE, analytics_db=None):
+    """
+    Process all resumes in the resumes directory.
+    With incremental=True, only resumes whose JSON is new or changed are (re)inserted
+    and rows of deleted resumes are purged, using a manifest table in db_file.
+    With bulk=True, resumes are loaded over one connection in batch transactions
+    (see bulk_insert_resumes).
+    With analytics_db (e.g. resumes.duckdb), the stored resumes are then mirrored
+    into that columnar store, which serves corpus-wide skill counts and multi-job
+    ranking (see sync_analytics_store).
+    """
+    logger.info("Processing resumes...")
     
     # Initialize database if not exists
     initialize_database(db_file)
@@ -111,21 +490,78 @@ def process_resumes(resume_dir, structured_data_dir, feedback_dir, db_file):
     try:
         # Get all PDF files
         resume_files = [f for f in os.listdir(resume_dir) if f.endswith('.pdf')]
-        
+        all_resume_files = resume_files
+
+        manifest = None
+        fingerprints = {}
+        removed_files = []
+        if incremental:
+            manifest = open_manifest(db_file)
+            sources = {}
+            for resume_file in resume_files:
+                json_path = os.path.join(feedback_dir, f"{os.path.splitext(resume_file)[0]}.json")
+                if os.path.exists(json_path):
+                    sources[resume_file] = json_path
+                else:
+                    logger.warning("Missing structured data file: %s", json_path)
+                    error_count += 1
+            to_process, deleted = plan_stage(manifest, MANIFEST_STAGE, sources)
+            # A PDF whose JSON is missing (e.g. extraction failed this time) keeps its stored rows
+            present = set(resume_files)
+            deleted = [(key, resume_ids) for key, resume_ids in deleted if key not in present]
+
+            for key, resume_ids in deleted:
+                delete_resume_rows(db_file, resume_ids)
+                forget_source(manifest, MANIFEST_STAGE, key)
+            removed_files = [key for key, resume_ids in deleted]
+            delete_duplicate_links(db_file, removed_files)
+
+            fingerprints = {key: fingerprint for key, path, fingerprint in to_process}
+            resume_files = [key for key, path, fingerprint in to_process]
+            logger.info("%s new or changed, %s unchanged, %s removed",
+                        len(resume_files), len(sources) - len(resume_files), len(deleted))
+
+        if bulk:
+            stored, failed = bulk_insert_resumes(
+                [os.path.join(resume_dir, resume_file) for resume_file in resume_files],
+                feedback_dir, db_file, batch_size, fingerprints if manifest is not None else None)
+            processed_count += stored
+            error_count += failed
+            resume_files = []
+
         for resume_file in resume_files:
             resume_path = os.path.join(resume_dir, resume_file)
             try:
-                insert_resume_data(resume_path, structured_data_dir, feedback_dir, db_file)
+                if manifest is not None:
+                    # Replace the rows stored for the previous version of this resume
+                    delete_resume_rows(db_file, get_outputs(manifest, MANIFEST_STAGE, resume_file))
+                resume_id = insert_resume_data(resume_path, structured_data_dir, feedback_dir, db_file)
+                # insert_resume_data reports its own errors, so count by its result
+                if resume_id is None:
+                    error_count += 1
+                    continue
+                if manifest is not None:
+                    # A duplicate (resume_id 0) owns no rows of its own
+                    record_source(manifest, MANIFEST_STAGE, resume_file, fingerprints[resume_file],
+                                  [resume_id] if resume_id else [])
                 processed_count += 1
             except Exception as e:
-                print(f"Error processing {resume_file}: {e}")
+                logger.error("Error processing %s: %s", resume_file, e)
                 error_count += 1
+
+        if analytics_db:
+            # After the SQLite write, so the mirror never runs ahead of the main database
+            loaded, failed = sync_analytics_store(analytics_db, feedback_dir, db_file, all_resume_files, incremental)
+            error_count += failed
                 
-        print(f"\nProcessing complete:")
-        print(f"Successfully processed: {processed_count}")
-        print(f"Errors encountered: {error_count}")
+        logger.info("Processing complete:")
+        logger.info("Successfully processed: %s", processed_count)
+        logger.info("Errors encountered: %s", error_count)
+
+        if manifest is not None:
+            manifest.close()
         
     except Exception as e:
-        print(f"Error during resume processing: {e}")
+        logger.error("Error during resume processing: %s", e)
         
-    return processed_count, error_count
\ No newline at end of file
+    return processed_count, error_count
@@ -1,6 +1,23 @@
+import logging
 import sqlite3
 import json
 import os
+from instrumentation import timer, profile
+from report_writer import ReportWriter, render_feedback
+from resume_reader import get_read_connection, read_connection, fetch_resumes_with_skills, DEFAULT_CACHE_SIZE
+from storage import open_store, storage_backend
+
+logger = logging.getLogger(__name__)
+
+# Every resume with its skill names joined by commas, one row per resume
+RESUMES_SKILLS_SQL = """
+    SELECT r.id, r.resume_name, r.structured_data,
+           GROUP_CONCAT(s.name) as skills
+    FROM resumes r
+    LEFT JOIN resume_skill rs ON r.id = rs.resume_id
+    LEFT JOIN skill s ON s.id = rs.skill_id
+    GROUP BY r.id
+"""
 
 def load_job_description_keywords(job_description_file):
     """
@@ -11,66 +28,87 @@ def load_job_description_keywords(job_description_file):
             keywords = file.read().splitlines()  # One keyword per line
         return [keyword.strip().lower() for keyword in keywords if keyword.strip()]
     except FileNotFoundError:
-        print(f"Error: Job description file not found at {job_description_file}")
+        logger.error("Error: Job description file not found at %s", job_description_file)
         return []
 
 def fetch_all_resumes(DATABASE_PATH):
     """
     Fetch all resume IDs from the database.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
     try:
-        cursor.execute("SELECT id FROM resumes")
-        resumes = cursor.fetchall()
+        resumes = get_read_connection(DATABASE_PATH).conn.execute("SELECT id FROM resumes").fetchall()
     except sqlite3.Error as e:
-        print(f"Error fetching resumes: {e}")
+        logger.error("Error fetching resumes: %s", e)
         resumes = []
-    finally:
-        conn.close()
 
     return [resume[0] for resume in resumes]  # Extract IDs as a list
 
+def fetch_resume_data_many(resume_ids, DATABASE_PATH):
+    """
+    Fetch resumes with their skills grouped by type, as {resume_id: data}, in one
+    joined query over this thread's pooled read-only connection. Recently fetched
+    resumes come from an LRU cache that is dropped when the database changes.
+    Wrap a series of calls in resume_reader.read_connection(DATABASE_PATH) to close
+    the connection once they are done.
+    """
+    try:
+        return fetch_resumes_with_skills(DATABASE_PATH, resume_ids)
+    except sqlite3.Error as e:
+        logger.error("Error fetching data for %s resumes: %s", len(resume_ids), e)
+        return {}
+
 def fetch_resume_data(resume_id, DATABASE_PATH):
     """
     Fetch all relevant data for a resume from the database.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    return fetch_resume_data_many([resume_id], DATABASE_PATH).get(resume_id, {})
+
+def find_resumes_with_skill(skill_name, DATABASE_PATH):
+    """
+    Return the IDs of resumes listing a skill (or one of its aliases).
+    Resolved through the skill dictionary and idx_resume_skill_skill, so no table scan.
+    """
+    key = skill_name.strip().lower()
 
     try:
-        # Fetch basic resume details
-        cursor.execute("SELECT resume_name, structured_data FROM resumes WHERE id = ?", (resume_id,))
-        resume = cursor.fetchone()
-
-        # Fetch skills
-        cursor.execute("SELECT skill_type, skill_name FROM skills WHERE resume_id = ?", (resume_id,))
-        skills = cursor.fetchall()
-
-        # Organize data
-        skill_dict = {}
-        for skill_type, skill_name in skills:
-            if skill_type not in skill_dict:
-                skill_dict[skill_type] = []
-            skill_dict[skill_type].append(skill_name)
-
-        return {
-            "resume_name": resume[0],
-            "structured_data": resume[1],
-            "skills": skill_dict
-        }
+        cursor = get_read_connection(DATABASE_PATH).conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT rs.resume_id
+            FROM resume_skill rs
+            WHERE rs.skill_id = COALESCE(
+                (SELECT skill_id FROM skill_alias WHERE alias_key = ?),
+                (SELECT id FROM skill WHERE name_key = ?))
+        """, (key, key))
+        resumes = cursor.fetchall()
     except sqlite3.Error as e:
-        print(f"Error fetching data for Resume ID {resume_id}: {e}")
-        return {}
-    finally:
-        conn.close()
+        logger.error("Error fetching resumes with skill %s: %s", skill_name, e)
+        resumes = []
 
-def generate_feedback(resume_id, job_keywords, DATABASE_PATH):
+    return [resume[0] for resume in resumes]
+
+def generate_feedback(resume_id, job_keywords, DATABASE_PATH, keyword_skills=None):
     """
     Generate actionable feedback for improving the resume.
+    keyword_skills (see match_keywords_semantic) switches to semantic matching.
+    """
+    return feedback_from_resume_data(fetch_resume_data(resume_id, DATABASE_PATH), job_keywords, keyword_skills)
+
+def generate_feedback_many(resume_ids, job_keywords, DATABASE_PATH, keyword_skills=None):
     """
-    resume_data = fetch_resume_data(resume_id, DATABASE_PATH)
+    generate_feedback for many resumes, returning {resume_id: (feedback, ranking)}.
+    Resumes are fetched DEFAULT_CACHE_SIZE at a time with one query each, instead
+    of one query per resume.
+    """
+    results = {}
+    for start in range(0, len(resume_ids), DEFAULT_CACHE_SIZE):
+        chunk = resume_ids[start:start + DEFAULT_CACHE_SIZE]
+        resumes = fetch_resume_data_many(chunk, DATABASE_PATH)
+        for resume_id in chunk:
+            results[resume_id] = feedback_from_resume_data(resumes.get(resume_id, {}), job_keywords, keyword_skills)
+    return results
+
+def feedback_from_resume_data(resume_data, job_keywords, keyword_skills=None):
+    """Feedback and ranking for one resume's data as returned by fetch_resume_data"""
     if not resume_data:
         return ["Error fetching resume data."], 0
 
@@ -90,8 +128,11 @@ def generate_feedback(resume_id, job_keywords, DATABASE_PATH):
         feedback.append(f"Skills extracted: {', '.join(extracted_skills)}")
 
     # Match extracted skills to job keywords
-    matched_skills = [skill for skill in extracted_skills if skill.lower() in job_keywords]
-    missing_keywords = [keyword for keyword in job_keywords if keyword not in map(str.lower, extracted_skills)]
+    if keyword_skills is not None:
+        matched_skills, missing_keywords, _ = score_resume_skills(extracted_skills, job_keywords, keyword_skills)
+    else:
+        matched_skills = [skill for skill in extracted_skills if skill.lower() in job_keywords]
+        missing_keywords = [keyword for keyword in job_keywords if keyword not in map(str.lower, extracted_skills)]
 
     if matched_skills:
         feedback.append(f"Matched skills: {', '.join(matched_skills)}")
@@ -107,92 +148,249 @@ def generate_feedback(resume_id, job_keywords, DATABASE_PATH):
 
     return feedback, ranking
 
-def provide_feedback_for_all_resumes(job_desc_file, output_folder, database_path):
-    conn = sqlite3.connect(database_path)
-    cursor = conn.cursor()
+def score_resume_skills(skills, job_keywords, keyword_skills=None):
+    """
+    Match a resume's skills against job keywords (case-insensitive substring).
+    With keyword_skills ({keyword: set of lowercased skill names}, see
+    match_keywords_semantic), a skill matches a keyword when it is in the keyword's set.
+    Returns (matched_skills, missing_keywords, ranking).
+    """
+    if keyword_skills is not None:
+        resume_skills = {skill.lower() for skill in skills}
+        wanted = set().union(*keyword_skills.values()) if keyword_skills else set()
+        matched_skills = [skill for skill in skills if skill.lower() in wanted]
+        missing_skills = [k for k in job_keywords if not keyword_skills.get(k, set()) & resume_skills]
+        ranking = (len(matched_skills) / len(job_keywords)) * 100 if job_keywords else 0
+        return matched_skills, missing_skills, ranking
+
+    matched_skills = []
+    for skill in skills:
+        for keyword in job_keywords:
+            if keyword.lower() in skill.lower():
+                matched_skills.append(skill)
+                break
+    
+    missing_skills = [k for k in job_keywords 
+                    if not any(k.lower() in s.lower() for s in skills)]
     
+    # Calculate ranking
+    ranking = (len(matched_skills) / len(job_keywords)) * 100 if job_keywords else 0
+    return matched_skills, missing_skills, ranking
+
+def write_feedback_file(output_folder, base_name, skills, matched_skills, missing_skills, ranking):
+    """Write the per-resume feedback report (see report_writer.FEEDBACK_TEMPLATE for the layout)"""
+    feedback_path = os.path.join(output_folder, f"{base_name}_feedback.txt")
+    with open(feedback_path, 'w', encoding='utf-8') as f:
+        f.write(render_feedback(base_name, skills, matched_skills, missing_skills, ranking))
+
+def write_rankings_summary(output_folder, rankings):
+    """Write summary_rankings.txt from (name, ranking) pairs already sorted best first"""
+    with open(os.path.join(output_folder, 'summary_rankings.txt'), 'w', encoding='utf-8') as f:
+        f.write("Resume Rankings:\n")
+        f.write("-" * 50 + "\n")
+        for name, rank in rankings:
+            f.write(f"{name}: {rank:.2f}%\n")
+
+def rank_stored_resumes(job_keywords, database_path):
+    """
+    Score every stored resume against the job keywords without writing reports.
+    Returns (name, ranking) pairs sorted best first, as write_rankings_summary takes them.
+    """
+    rankings = []
+    with read_connection(database_path) as connection:
+        for resume_id, name, structured_data, skills_str in connection.conn.execute(RESUMES_SKILLS_SQL):
+            skills = [s.strip() for s in skills_str.split(',')] if skills_str else []
+            rankings.append((os.path.splitext(name)[0], score_resume_skills(skills, job_keywords)[2]))
+    return sorted(rankings, key=lambda x: x[1], reverse=True)
+
+def provide_feedback_for_all_resumes(job_desc_file, output_folder, database_path, vectorized=False, fuzzy_cutoff=None,
+                                     semantic=False, similarity=None, report_format="text"):
+    """
+    Write a feedback file per resume and a rankings summary for one job description.
+    With vectorized=True, all resumes are scored at once by the sparse-matrix
+    RankingEngine (requires numpy and scipy); fuzzy_cutoff additionally matches
+    keywords to similarly spelled skills.
+    With semantic=True, keywords match similar skills ("postgres" -> "PostgreSQL",
+    "ml" -> "Machine Learning") instead of substrings (see match_keywords_semantic).
+    Reports are written on a background thread; report_format "jsonl", "zip" or
+    "parquet" puts them all in one file instead of one text file per resume.
+    """
+    keyword_skills = None
+    if semantic:
+        keyword_skills = match_keywords_semantic(load_job_description_keywords(job_desc_file), database_path,
+                                                 similarity)
+
+    if vectorized:
+        return provide_feedback_vectorized(job_desc_file, output_folder, database_path, fuzzy_cutoff, keyword_skills,
+                                           report_format)
+
+    writer = None
     try:
-        # Get all resumes with their skills
-        cursor.execute("""
-            SELECT r.id, r.resume_name, r.structured_data,
-                   GROUP_CONCAT(s.skill_name) as skills
-            FROM resumes r
-            LEFT JOIN skills s ON r.id = s.resume_id
-            GROUP BY r.id
-        """)
+        writer = ReportWriter(output_folder, report_format)
+        with read_connection(database_path) as connection:
+            # Get all resumes with their skills
+            cursor = connection.conn.cursor()
+            cursor.execute(RESUMES_SKILLS_SQL)
         
-        resumes = cursor.fetchall()
-        job_keywords = load_job_description_keywords(job_desc_file)
-        rankings = []
+            job_keywords = load_job_description_keywords(job_desc_file)
+            rankings = []
         
-        for resume_id, name, structured_data, skills_str in resumes:
-            base_name = os.path.splitext(name)[0]
+            # Iterate the cursor rather than fetchall() so only one row is held at a time
+            for resume_id, name, structured_data, skills_str in cursor:
+                base_name = os.path.splitext(name)[0]
             
-            try:
-                # Parse skills from both structured data and skills table
-                skills = []
-                if skills_str:
-                    skills = [s.strip() for s in skills_str.split(',')]
-                
-                # Match skills with keywords (case-insensitive)
-                matched_skills = []
-                for skill in skills:
-                    for keyword in job_keywords:
-                        if keyword.lower() in skill.lower():
-                            matched_skills.append(skill)
-                            break
+                try:
+                    # Parse skills from both structured data and skills table
+                    skills = []
+                    if skills_str:
+                        skills = [s.strip() for s in skills_str.split(',')]
                 
-                missing_skills = [k for k in job_keywords 
-                                if not any(k.lower() in s.lower() for s in skills)]
+                    with timer("score_seconds", base_name), profile("score"):
+                        matched_skills, missing_skills, ranking = score_resume_skills(skills, job_keywords,
+                                                                                      keyword_skills)
                 
-                # Calculate ranking
-                ranking = (len(matched_skills) / len(job_keywords)) * 100 if job_keywords else 0
+                    # Queue the detailed feedback report for the writer thread
+                    writer.write(base_name, skills, matched_skills, missing_skills, ranking)
                 
-                # Generate detailed feedback file
-                feedback_path = os.path.join(output_folder, f"{base_name}_feedback.txt")
-                with open(feedback_path, 'w', encoding='utf-8') as f:
-                    f.write(f"Resume Feedback for {base_name}\n")
-                    f.write("=" * 50 + "\n\n")
-                    
-                    f.write("Skills Analysis\n")
-                    f.write("-" * 20 + "\n")
-                    f.write(f"Total skills found: {len(skills)}\n")
-                    f.write(f"Skills: {', '.join(skills)}\n\n")
-                    
-                    f.write("Job Match Analysis\n")
-                    f.write("-" * 20 + "\n")
-                    f.write(f"Matched job skills ({len(matched_skills)}):\n")
-                    f.write(f"{', '.join(matched_skills) if matched_skills else 'None'}\n\n")
-                    
-                    f.write("Missing Critical Skills:\n")
-                    f.write(f"{', '.join(missing_skills) if missing_skills else 'None'}\n\n")
-                    
-                    f.write("Recommendations:\n")
-                    f.write("-" * 20 + "\n")
-                    if missing_skills:
-                        f.write("1. Consider adding these relevant skills if you have experience with them:\n")
-                        f.write("   " + ", ".join(missing_skills) + "\n")
-                    f.write("2. Make sure your skills are clearly stated in your resume\n")
-                    f.write("3. Use industry-standard terminology for technical skills\n\n")
-                    
-                    f.write(f"Overall Match Score: {ranking:.2f}%\n")
+                    rankings.append((base_name, ranking))
+                    logger.debug("Generated feedback for %s", base_name)
                 
-                rankings.append((base_name, ranking))
-                print(f"Generated feedback for {base_name}")
-                
-            except Exception as e:
-                print(f"Error processing {name}: {e}")
-                rankings.append((base_name, 0))
+                except Exception as e:
+                    logger.error("Error processing %s: %s", name, e)
+                    rankings.append((base_name, 0))
         
-        # Write rankings summary
-        with open(os.path.join(output_folder, 'summary_rankings.txt'), 'w', encoding='utf-8') as f:
-            f.write("Resume Rankings:\n")
-            f.write("-" * 50 + "\n")
-            # Sort by ranking in descending order
-            for name, rank in sorted(rankings, key=lambda x: x[1], reverse=True):
-                f.write(f"{name}: {rank:.2f}%\n")
+            # Write rankings summary, sorted by ranking in descending order
+            write_rankings_summary(output_folder, sorted(rankings, key=lambda x: x[1], reverse=True))
         
     except Exception as e:
-        print(f"Error generating feedback: {e}")
+        logger.error("Error generating feedback: %s", e)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def provide_feedback_vectorized(job_desc_file, output_folder, database_path, fuzzy_cutoff=None, keyword_skills=None,
+                                report_format="text"):
+    """
+    Feedback like provide_feedback_for_all_resumes, but every resume is scored in one
+    sparse matrix product and keywords are expanded against the skill vocabulary once.
+    The reports are not byte-identical: each skill is listed once, in skill dictionary
+    order, while the row-by-row path lists skills in database order and repeats a skill
+    stored under two types (which also counts twice in its matched skills and ranking).
+    """
+    from ranking_engine import RankingEngine  # numpy/scipy are only needed for this path
+
+    writer = None
+    try:
+        writer = ReportWriter(output_folder, report_format)
+        engine = RankingEngine.from_database(database_path)
+        job_keywords = load_job_description_keywords(job_desc_file)
+        rankings, keyword_hits, skill_mask = engine.score(job_keywords, fuzzy_cutoff, keyword_skills)
+
+        for index, name in enumerate(engine.resume_names):
+            base_name = os.path.splitext(name)[0]
+            try:
+                skills, matched_skills, missing_skills = engine.resume_details(index, job_keywords, keyword_hits,
+                                                                               skill_mask)
+                writer.write(base_name, skills, matched_skills, missing_skills, float(rankings[index]))
+            except Exception as e:
+                logger.error("Error processing %s: %s", name, e)
+
+        order = sorted(range(len(rankings)), key=lambda i: rankings[i], reverse=True)
+        write_rankings_summary(output_folder, [(os.path.splitext(engine.resume_names[i])[0], float(rankings[i]))
+                                               for i in order])
+        logger.info("Generated feedback for %s resumes", len(engine.resume_names))
+
+    except Exception as e:
+        logger.error("Error generating feedback: %s", e)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def rank_top_candidates(job_desc_file, database_path, k=10, fuzzy_cutoff=None, engine=None):
+    """
+    Return the k best (resume_id, resume_name, ranking) for a job without writing reports.
+    Pass a prebuilt RankingEngine to rank several jobs against one loaded matrix.
+    """
+    if engine is None:
+        from ranking_engine import RankingEngine
+        engine = RankingEngine.from_database(database_path)
+    return engine.rank(load_job_description_keywords(job_desc_file), k, fuzzy_cutoff)
+
+def load_skill_vectors(database_path, cache_path=None):
+    """
+    Build the semantic index over every distinct skill in the database. Skill vectors
+    are cached on disk (default <database>_skill_vectors.sqlite), so each skill name
+    is embedded once across runs.
+    """
+    from skill_embeddings import SkillVectorIndex, EmbeddingCache  # numpy is only needed for this path
+
+    if cache_path is None:
+        cache_path = os.path.splitext(database_path)[0] + "_skill_vectors.sqlite"
+
+    conn = sqlite3.connect(database_path)
+    try:
+        skill_names = [row[0] for row in conn.execute("SELECT name FROM skill ORDER BY id")]
+    finally:
+        conn.close()
+
+    cache = EmbeddingCache(cache_path)
+    try:
+        return SkillVectorIndex(skill_names, cache)
     finally:
-        conn.close()
\ No newline at end of file
+        cache.close()
+
+def match_keywords_semantic(job_keywords, database_path, similarity=None, cache_path=None, index=None):
+    """
+    Map every job keyword to the similar skills in the database with one batched
+    nearest-neighbour query, so per-resume scoring is only set lookups.
+    Returns {keyword: set of lowercased skill names}. Pass a prebuilt index
+    (load_skill_vectors) to match several jobs against one vocabulary.
+    """
+    from skill_embeddings import DEFAULT_SIMILARITY
+
+    if index is None:
+        index = load_skill_vectors(database_path, cache_path)
+    matches = index.match(job_keywords, DEFAULT_SIMILARITY if similarity is None else similarity)
+    return {keyword: {name.lower() for name in names} for keyword, names in matches.items()}
+
+def load_skill_index(database_path, index_path=None):
+    """
+    Load the persisted skill index (building it on first use), bring it up to date
+    with resumes inserted or deleted since it was saved, and save it back if it changed.
+    """
+    from skill_index import SkillIndex
+
+    if index_path is None:
+        index_path = os.path.splitext(database_path)[0] + "_skill_index.json"
+
+    try:
+        index = SkillIndex.load(index_path)
+    except (FileNotFoundError, ValueError, KeyError, json.JSONDecodeError):
+        index = SkillIndex()
+
+    added, removed = index.update(database_path)
+    if added or removed or not os.path.exists(index_path):
+        index.save(index_path)
+        logger.info("Skill index updated: %s resumes added, %s removed", added, removed)
+    return index
+
+def rank_candidates(job_desc_files, database_path, k=10, index_path=None):
+    """
+    Rank the top k resumes for many job description files in one pass over the skill index.
+    Returns {job_desc_file: [(resume_id, resume_name, ranking)]}.
+    A columnar store (a .duckdb file, see storage.py) ranks every job in one SQL query instead.
+    """
+    jobs = {job_desc_file: load_job_description_keywords(job_desc_file) for job_desc_file in job_desc_files}
+    if storage_backend(database_path) != "sqlite":
+        with open_store(database_path) as store:
+            return store.rank_candidates(jobs, k)
+    index = load_skill_index(database_path, index_path)
+    return index.rank_candidates(jobs, k)
+
+def skill_frequencies(database_path, limit=None):
+    """
+    Return [(skill_name, resume_count)] across the corpus, most common first.
+    Works on either storage backend; on a columnar store it is one vectorized scan.
+    """
+    with open_store(database_path) as store:
+        return store.skill_frequencies(limit)
@@ -0,0 +1,459 @@
+import logging
+import os
+import time
+import queue
+import sqlite3
+import threading
+from module1_extract_text import extract_text_from_pdf
+from module2_extract_data import (extract_skills_from_text, extract_skills_fast, save_json_output,
+                                  open_cache, close_cache, API_ENDPOINT)
+from module3_store_data import (initialize_database, open_bulk_connection, write_resume_batch,
+                                delete_resume_rows, valid_skill_rows)
+from module4_feedback import (load_job_description_keywords, score_resume_skills, write_rankings_summary,
+                              rank_stored_resumes)
+from report_writer import ReportWriter
+from ingest_manifest import open_manifest, plan_stage, forget_source, file_fingerprint
+from dedup import DedupIndex
+from text_preprocess import preprocess_text
+from instrumentation import timer, profile
+
+logger = logging.getLogger(__name__)
+
+# Items buffered between two stages; a full queue blocks the stage feeding it
+DEFAULT_QUEUE_SIZE = 16
+
+# Most resumes the store stage commits in one transaction
+DEFAULT_STORE_BATCH_SIZE = 50
+
+# Most resumes the dedup stage indexes before committing
+DEFAULT_DEDUP_BATCH_SIZE = 50
+
+# Manifest stage for PDFs stored by the pipeline. Its fingerprints are of the PDFs,
+# not of module3's JSON files, so the two must not share entries
+PIPELINE_STAGE = "pipeline"
+
+# Dedup index of the pipeline's resumes, kept next to the database. Apart from
+# module2's index, since this one is keyed by PDF rather than by text file
+PIPELINE_DEDUP_FILENAME = ".pipeline_dedup.sqlite"
+
+# Marks the end of the stream on a stage's input queue
+_DONE = object()
+
+class Stage:
+    """
+    One step of the streaming pipeline. process() takes an item and returns a list
+    of items for the next stage (possibly empty); finish() runs once after the last
+    item and returns anything still buffered.
+    """
+
+    name = "stage"
+    workers = 1
+
+    def process(self, item):
+        return [item]
+
+    def finish(self):
+        return []
+
+    def close(self):
+        """Release what the stage holds; called on teardown whether or not the stream finished"""
+
+class ExtractTextStage(Stage):
+    """PDF path -> (resume_name, text), optionally keeping the .txt file"""
+
+    name = "extract_text"
+
+    def __init__(self, workers=1, texts_dir=None, ocr_cache_dir=None):
+        self.workers = workers
+        self.texts_dir = texts_dir
+        self.ocr_cache_dir = ocr_cache_dir
+
+    def process(self, pdf_path):
+        resume_name = os.path.basename(pdf_path)
+        text = extract_text_from_pdf(pdf_path, self.ocr_cache_dir)
+        if self.texts_dir:
+            text_path = os.path.join(self.texts_dir, f"{os.path.splitext(resume_name)[0]}.txt")
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return [(resume_name, text)]
+
+class DedupStage(Stage):
+    """
+    (resume_name, text) -> (resume_name, text, duplicate), where duplicate is
+    (canonical_name, similarity) for a copy or near-copy of an earlier resume (see
+    dedup.DedupIndex) and None otherwise. Always runs with a single worker, since
+    the index is one SQLite connection. Like the store stage, it commits when
+    batch_size resumes are indexed or its input queue runs dry.
+    """
+
+    name = "dedup"
+
+    def __init__(self, index_path, batch_size=DEFAULT_DEDUP_BATCH_SIZE):
+        self.index_path = index_path
+        self.batch_size = batch_size
+        self.inbox = None
+        self.index = None
+        self.uncommitted = 0
+
+    def process(self, item):
+        resume_name, text = item
+        if self.index is None:
+            # Opened in the worker thread that uses it
+            self.index = DedupIndex(self.index_path)
+        match = self.index.check(resume_name, text, exclude=resume_name, commit=False)
+        if match is not None:
+            logger.debug("%s duplicates %s (similarity %.2f)", resume_name, match[0], match[1])
+        self.uncommitted += 1
+        if self.uncommitted >= self.batch_size or (self.inbox is not None and self.inbox.empty()):
+            self.index.commit()
+            self.uncommitted = 0
+        return [(resume_name, text, match)]
+
+    def finish(self):
+        if self.index is not None:
+            self.index.commit()
+            self.index.close()
+            self.index = None
+        return []
+
+class ExtractSkillsStage(Stage):
+    """
+    (resume_name, text[, duplicate]) -> (resume_name, structured_data), optionally
+    keeping the .json file. A duplicate is not extracted; it is marked duplicate_of
+    its canonical resume, which the store stage links it to.
+    """
+
+    name = "extract_skills"
+
+    def __init__(self, api_key=None, workers=1, jsons_dir=None, endpoint=API_ENDPOINT, cache_path=None,
+                 no_llm=False):
+        self.api_key = api_key
+        self.workers = workers
+        self.jsons_dir = jsons_dir
+        self.endpoint = endpoint
+        self.cache_path = cache_path
+        self.no_llm = no_llm
+        # SQLite connections cannot be shared across threads, so each worker opens its own cache
+        self._local = threading.local()
+        self._caches = []
+        self._lock = threading.Lock()
+
+    def get_cache(self):
+        if self.cache_path is None:
+            return None
+        if not hasattr(self._local, "cache"):
+            self._local.cache = open_cache(None, True, self.cache_path)
+            with self._lock:
+                self._caches.append(self._local.cache)
+        return self._local.cache
+
+    def process(self, item):
+        resume_name, text = item[:2]
+        duplicate = item[2] if len(item) > 2 else None
+        if duplicate is not None:
+            canonical_name, similarity = duplicate
+            structured_data = {"skills": [], "duplicate_of": os.path.splitext(canonical_name)[0],
+                               "similarity": similarity}
+        elif self.no_llm:
+            structured_data = extract_skills_fast(preprocess_text(text)[0])
+        else:
+            structured_data = extract_skills_from_text(text, self.api_key, self.endpoint, self.get_cache(),
+                                                       resume_name)
+        if not structured_data:
+            raise ValueError("no skills extracted")
+        if self.jsons_dir:
+            save_json_output(os.path.splitext(resume_name)[0], structured_data, self.jsons_dir)
+        return [(resume_name, structured_data)]
+
+    def finish(self):
+        # Counters are per connection; each one reports and closes separately
+        for cache in self._caches:
+            close_cache(cache)
+        return []
+
+class StoreStage(Stage):
+    """
+    Insert resumes into the database in small transactions over one connection.
+    A batch is committed when it is full or when the input queue runs dry, so
+    rows land promptly under light load and in larger transactions under heavy load.
+    Always runs with a single worker, since SQLite has one writer.
+    """
+
+    name = "store"
+
+    def __init__(self, db_file, batch_size=DEFAULT_STORE_BATCH_SIZE, fingerprints=None):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.fingerprints = fingerprints
+        self.inbox = None
+        self.conn = None
+        self.skill_ids = {}
+        self.batch = []
+        self.errors = 0
+
+    def process(self, item):
+        if self.conn is None:
+            # Opened in the worker thread that uses it
+            self.conn = open_bulk_connection(self.db_file)
+        self.batch.append(item)
+        if len(self.batch) >= self.batch_size or (self.inbox is not None and self.inbox.empty()):
+            return self.flush()
+        return []
+
+    def commit_batch(self, batch):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            write_resume_batch(self.conn, batch, self.fingerprints, self.skill_ids, PIPELINE_STAGE)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            self.skill_ids.clear()  # Skills added by the rolled-back batch no longer exist
+            raise
+
+    def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return []
+        try:
+            self.commit_batch(batch)
+            return batch
+        except sqlite3.Error as e:
+            logger.warning("[%s] Batch insert failed (%s), retrying %s resumes one by one", self.name, e, len(batch))
+
+        stored = []
+        for item in batch:
+            try:
+                self.commit_batch([item])
+                stored.append(item)
+            except sqlite3.Error as e:
+                logger.error("[%s] Error storing %s: %s", self.name, item[0], e)
+                self.errors += 1
+        return stored
+
+    def finish(self):
+        try:
+            return self.flush()
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+
+class ScoreStage(Stage):
+    """(resume_name, structured_data) -> (name, ranking), queueing the feedback report for a writer thread"""
+
+    name = "score"
+
+    def __init__(self, job_desc_file, output_folder, workers=1, report_format="text"):
+        self.job_keywords = load_job_description_keywords(job_desc_file)
+        self.output_folder = output_folder
+        self.workers = workers
+        self.writer = ReportWriter(output_folder, report_format)
+
+    def process(self, item):
+        resume_name, structured_data = item
+        if structured_data.get("duplicate_of"):
+            # Like module4, only resumes stored in their own right get a report
+            return []
+        base_name = os.path.splitext(resume_name)[0]
+        skills = [skill_name for skill_type, skill_name in valid_skill_rows(structured_data)]
+        matched_skills, missing_skills, ranking = score_resume_skills(skills, self.job_keywords)
+        self.writer.write(base_name, skills, matched_skills, missing_skills, ranking)
+        return [(base_name, ranking)]
+
+    def finish(self):
+        self.writer.close()
+        return []
+
+    def close(self):
+        # Also reached when the stream aborts before finish() ran; closing twice is harmless
+        self.writer.close()
+
+def run_stage(stage, inbox, outbox, stats):
+    """Start a stage's worker threads; the last worker to finish passes end-of-stream on"""
+    remaining = [stage.workers]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                break
+            start = time.perf_counter()
+            try:
+                with timer(f"pipeline_{stage.name}_seconds", describe(item)), profile(stage.name):
+                    results = stage.process(item)
+            except Exception as e:
+                logger.error("[%s] Error processing %s: %s", stage.name, describe(item), e)
+                results = []
+                with lock:
+                    stats["errors"] += 1
+            with lock:
+                stats["processed"] += 1
+                stats["busy_seconds"] += time.perf_counter() - start
+            for result in results:
+                outbox.put(result)
+
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            try:
+                for result in stage.finish():
+                    outbox.put(result)
+            except Exception as e:
+                logger.error("[%s] Error finishing stage: %s", stage.name, e)
+                stats["errors"] += 1
+            outbox.put(_DONE)
+        else:
+            # Let the remaining workers of this stage see the end of the stream too
+            inbox.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"{stage.name}-{i}", daemon=True) for i in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def describe(item):
+    """Short label for an item in error messages"""
+    if isinstance(item, tuple):
+        return item[0]
+    return os.path.basename(str(item))
+
+def stream(sources, stages, queue_size=DEFAULT_QUEUE_SIZE):
+    """
+    Push sources through the stages, each running in its own worker threads and
+    connected by bounded queues, and yield the last stage's outputs as they arrive.
+    Memory stays proportional to queue_size, not to the number of sources.
+    Returns per-stage stats through the generator's return value.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    stats = {stage.name: {"processed": 0, "errors": 0, "busy_seconds": 0.0} for stage in stages}
+
+    for position, stage in enumerate(stages):
+        if isinstance(stage, (StoreStage, DedupStage)):
+            stage.inbox = queues[position]
+        run_stage(stage, queues[position], queues[position + 1], stats[stage.name])
+
+    def feed():
+        for source in sources:
+            queues[0].put(source)
+        queues[0].put(_DONE)
+
+    threading.Thread(target=feed, name="feed", daemon=True).start()
+
+    while True:
+        item = queues[-1].get()
+        if item is _DONE:
+            break
+        yield item
+    return stats
+
+def print_stage_stats(stats, elapsed):
+    for name, stage_stats in stats.items():
+        logger.info("  %s: %s items, %s errors, %.2fs busy",
+                    name, stage_stats['processed'], stage_stats['errors'], stage_stats['busy_seconds'])
+    logger.info("Pipeline finished in %.2fs", elapsed)
+
+def recheck_duplicates(index_path, sources, to_process):
+    """
+    Forget deleted and changed PDFs in the dedup index. Returns (key, path, fingerprint)
+    for unchanged PDFs linked to one of them as duplicates, which must be checked again.
+    """
+    index = DedupIndex(index_path)
+    try:
+        orphans = index.prune(sources)
+        for key, path, fingerprint in to_process:
+            orphans.extend(index.remove(key))
+    finally:
+        index.close()
+    planned = {key for key, path, fingerprint in to_process}
+    return [(key, sources[key], file_fingerprint(sources[key]))
+            for key in sorted(set(orphans) - planned) if key in sources]
+
+def iter_pdf_paths(input_folder):
+    """Yield PDF paths lazily so huge folders are never listed into memory at once"""
+    with os.scandir(input_folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                yield entry.path
+
+# Function to run PDF -> text -> skills -> database -> feedback as one stream
+def run_pipeline(input_folder, db_file, api_key=None, job_desc_file=None, feedback_folder=None,
+                 texts_dir=None, jsons_dir=None, extract_workers=1, skills_workers=4, score_workers=1,
+                 queue_size=DEFAULT_QUEUE_SIZE, store_batch_size=DEFAULT_STORE_BATCH_SIZE,
+                 endpoint=API_ENDPOINT, cache_path=None, no_llm=False, incremental=True, ocr_cache_dir=None,
+                 report_format="text", dedup=True):
+    """
+    Stream every PDF in input_folder through all four modules. A resume moves to
+    the next stage as soon as it is ready, instead of each stage waiting for the
+    whole folder, and the bounded queues between stages apply backpressure.
+
+    texts_dir / jsons_dir keep the intermediate .txt and .json files; leave them
+    as None to pass everything in memory. With job_desc_file and feedback_folder,
+    feedback reports are written as resumes are stored, and summary_rankings.txt
+    ranks every stored resume once the stream ends, unchanged ones included;
+    report_format chooses per-resume text files or one consolidated file (see report_writer).
+    With incremental=True, unchanged PDFs already stored are skipped (tracked by
+    manifest entries under PIPELINE_STAGE, keyed by PDF) and rows of deleted PDFs
+    are purged.
+    With dedup=True, exact and near-duplicate resumes (see dedup.DedupIndex) skip
+    skill extraction and are linked to the first copy instead of stored again.
+    """
+    start_time = time.perf_counter()
+    initialize_database(db_file)
+    for folder in (texts_dir, jsons_dir, feedback_folder):
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+    sources = iter_pdf_paths(input_folder)
+    fingerprints = None
+    dedup_path = os.path.join(os.path.dirname(db_file), PIPELINE_DEDUP_FILENAME)
+    if dedup and not incremental and os.path.exists(dedup_path):
+        # Every PDF is processed again, so the index is rebuilt from scratch
+        os.remove(dedup_path)
+    if incremental:
+        pdf_sources = {os.path.basename(path): path for path in iter_pdf_paths(input_folder)}
+        manifest = open_manifest(db_file)
+        try:
+            to_process, deleted = plan_stage(manifest, PIPELINE_STAGE, pdf_sources)
+            for key, resume_ids in deleted:
+                delete_resume_rows(db_file, resume_ids)
+                forget_source(manifest, PIPELINE_STAGE, key)
+        finally:
+            manifest.close()
+        if dedup:
+            rechecked = recheck_duplicates(dedup_path, pdf_sources, to_process)
+            if rechecked:
+                logger.info("%s duplicates of changed or deleted PDFs rechecked", len(rechecked))
+            to_process += rechecked
+        fingerprints = {key: fingerprint for key, path, fingerprint in to_process}
+        sources = (path for key, path, fingerprint in to_process)
+        logger.info("%s new or changed PDFs, %s removed", len(to_process), len(deleted))
+
+    store = StoreStage(db_file, store_batch_size, fingerprints)
+    stages = [ExtractTextStage(extract_workers, texts_dir, ocr_cache_dir)]
+    if dedup:
+        stages.append(DedupStage(dedup_path))
+    stages += [ExtractSkillsStage(api_key, skills_workers, jsons_dir, endpoint, cache_path, no_llm), store]
+    score = None
+    try:
+        if job_desc_file is not None and feedback_folder is not None:
+            score = ScoreStage(job_desc_file, feedback_folder, score_workers, report_format)
+            stages.append(score)
+
+        outputs = stream(sources, stages, queue_size)
+        while True:
+            next(outputs)
+    except StopIteration as finished:
+        stats = finished.value
+    finally:
+        for stage in stages:
+            stage.close()
+
+    stats[StoreStage.name]["errors"] += store.errors
+
+    if score is not None:
+        # Only new or changed resumes went through the stream, so the summary is ranked from the store
+        write_rankings_summary(feedback_folder, rank_stored_resumes(score.job_keywords, db_file))
+
+    print_stage_stats(stats, time.perf_counter() - start_time)
+    return stats
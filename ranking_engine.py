@@ -0,0 +1,129 @@
+import sqlite3
+import difflib
+import numpy as np
+from scipy import sparse
+
+def _positions(sorted_ids, values):
+    """Positions of values in sorted_ids, plus a mask of which values were found"""
+    if len(sorted_ids) == 0:
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(sorted_ids, values), len(sorted_ids) - 1)
+    return positions, sorted_ids[positions] == values
+
+class RankingEngine:
+    """
+    Vectorized resume ranking over a sparse resume x skill incidence matrix.
+
+    The matrix is built from the database once. A job's keywords are expanded
+    against the skill vocabulary once (substring and optional fuzzy matches),
+    so scoring every resume is a single sparse matrix product.
+    """
+
+    def __init__(self, resume_ids, resume_names, skill_names, matrix):
+        self.resume_ids = np.asarray(resume_ids)
+        self.resume_names = list(resume_names)
+        self.skill_names = list(skill_names)
+        self.skill_names_lower = np.array([name.lower() for name in skill_names], dtype=str)
+        self.matrix = matrix.tocsr()
+
+    @classmethod
+    def from_database(cls, database_path):
+        """Load resumes, the skill vocabulary and the resume_skill incidence matrix"""
+        conn = sqlite3.connect(database_path)
+        try:
+            cursor = conn.cursor()
+            resumes = cursor.execute("SELECT id, resume_name FROM resumes ORDER BY id").fetchall()
+            skills = cursor.execute("SELECT id, name FROM skill ORDER BY id").fetchall()
+
+            resume_ids = np.fromiter((row[0] for row in resumes), dtype=np.int64, count=len(resumes))
+            skill_ids = np.fromiter((row[0] for row in skills), dtype=np.int64, count=len(skills))
+
+            # One entry per (resume, skill), regardless of how many types it was listed under
+            pairs = np.array(cursor.execute("SELECT DISTINCT resume_id, skill_id FROM resume_skill").fetchall(),
+                             dtype=np.int64).reshape(-1, 2)
+        finally:
+            conn.close()
+
+        rows, rows_found = _positions(resume_ids, pairs[:, 0])
+        cols, cols_found = _positions(skill_ids, pairs[:, 1])
+        # Drop pairs whose resume or skill no longer exists
+        valid = rows_found & cols_found
+        rows, cols = rows[valid], cols[valid]
+
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                   shape=(len(resume_ids), len(skill_ids)))
+        return cls(resume_ids, [row[1] for row in resumes], [row[1] for row in skills], matrix)
+
+    def expand_keywords(self, job_keywords, fuzzy_cutoff=None, keyword_skills=None):
+        """
+        Map job keywords to skill columns. Returns a (skills x keywords) 0/1 matrix.
+        A skill matches a keyword when the keyword is a substring of the skill name
+        (the rule provide_feedback_for_all_resumes has always used) or, with
+        fuzzy_cutoff, when difflib rates the names at least that similar.
+        keyword_skills ({keyword: set of lowercased skill names}, from semantic
+        matching) replaces the substring rule.
+        """
+        rows = []
+        cols = []
+        vocabulary = self.skill_names_lower.tolist() if fuzzy_cutoff is not None else None
+        for k, keyword in enumerate(job_keywords):
+            if keyword_skills is not None:
+                matches = np.flatnonzero(np.isin(self.skill_names_lower, list(keyword_skills.get(keyword, ()))))
+            else:
+                matches = np.flatnonzero(np.char.find(self.skill_names_lower, keyword.lower()) >= 0)
+            keyword = keyword.lower()
+            if fuzzy_cutoff is not None:
+                close = difflib.get_close_matches(keyword, vocabulary, n=10, cutoff=fuzzy_cutoff)
+                close_indexes = np.flatnonzero(np.isin(self.skill_names_lower, close))
+                matches = np.union1d(matches, close_indexes)
+            rows.append(matches)
+            cols.append(np.full(len(matches), k))
+
+        rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+        return sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)),
+                                 shape=(len(self.skill_names), len(job_keywords)))
+
+    def score(self, job_keywords, fuzzy_cutoff=None, keyword_skills=None):
+        """
+        Score every resume against the job keywords in one matrix product.
+        Returns (rankings, keyword_hits, skill_mask):
+          rankings     - percentage per resume: matched skills / number of keywords * 100
+          keyword_hits - sparse (resumes x keywords) matrix, nonzero where a keyword is covered
+          skill_mask   - boolean per skill, True if it matches any keyword
+        """
+        if not job_keywords:
+            return np.zeros(len(self.resume_ids), dtype=np.float32), None, np.zeros(len(self.skill_names), dtype=bool)
+
+        keyword_matrix = self.expand_keywords(job_keywords, fuzzy_cutoff, keyword_skills)
+        skill_mask = np.asarray(keyword_matrix.sum(axis=1)).ravel() > 0
+        matched_counts = self.matrix @ skill_mask.astype(np.float32)
+        keyword_hits = self.matrix @ keyword_matrix
+        rankings = matched_counts / len(job_keywords) * 100
+        return rankings, keyword_hits, skill_mask
+
+    def top_k(self, rankings, k=10):
+        """Return [(resume_id, resume_name, ranking)] for the k best resumes without a full sort"""
+        k = min(k, len(rankings))
+        if k <= 0:
+            return []
+        best = np.argpartition(-rankings, k - 1)[:k]
+        best = best[np.argsort(-rankings[best], kind="stable")]
+        return [(int(self.resume_ids[i]), self.resume_names[i], float(rankings[i])) for i in best]
+
+    def rank(self, job_keywords, k=10, fuzzy_cutoff=None, keyword_skills=None):
+        """Score all resumes against a job and return the top k"""
+        rankings, keyword_hits, skill_mask = self.score(job_keywords, fuzzy_cutoff, keyword_skills)
+        return self.top_k(rankings, k)
+
+    def resume_details(self, index, job_keywords, keyword_hits, skill_mask):
+        """Skills, matched skills and missing keywords of one resume (row index), for feedback text"""
+        start, end = self.matrix.indptr[index], self.matrix.indptr[index + 1]
+        columns = self.matrix.indices[start:end]
+        skills = [self.skill_names[c] for c in columns]
+        matched = [self.skill_names[c] for c in columns if skill_mask[c]]
+        if keyword_hits is None:
+            return skills, matched, list(job_keywords)
+        covered = set(keyword_hits.indices[keyword_hits.indptr[index]:keyword_hits.indptr[index + 1]].tolist())
+        missing = [keyword for k, keyword in enumerate(job_keywords) if k not in covered]
+        return skills, matched, missing
@@ -0,0 +1,181 @@
+import os
+import json
+import queue
+import logging
+import zipfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Output formats: one text file per resume (the original layout), or all feedback in one file
+REPORT_FORMATS = ("text", "jsonl", "zip", "parquet")
+
+# File names of the consolidated formats, inside the output folder
+CONSOLIDATED_FILENAMES = {"jsonl": "feedback.jsonl", "zip": "feedback.zip", "parquet": "feedback.parquet"}
+
+# Reports buffered between the scorer and the writer thread; a full queue makes the scorer wait
+DEFAULT_QUEUE_SIZE = 1024
+
+# Write buffer of the consolidated files
+WRITE_BUFFER_BYTES = 1024 * 1024
+
+# Reports per Parquet row group
+PARQUET_ROW_GROUP = 10000
+
+# Per-resume report layout, formatted in one call per resume
+FEEDBACK_TEMPLATE = (
+    "Resume Feedback for {base_name}\n"
+    + "=" * 50 + "\n\n"
+    "Skills Analysis\n"
+    + "-" * 20 + "\n"
+    "Total skills found: {skill_count}\n"
+    "Skills: {skills}\n\n"
+    "Job Match Analysis\n"
+    + "-" * 20 + "\n"
+    "Matched job skills ({matched_count}):\n"
+    "{matched}\n\n"
+    "Missing Critical Skills:\n"
+    "{missing}\n\n"
+    "Recommendations:\n"
+    + "-" * 20 + "\n"
+    "{missing_recommendation}"
+    "2. Make sure your skills are clearly stated in your resume\n"
+    "3. Use industry-standard terminology for technical skills\n\n"
+    "Overall Match Score: {ranking:.2f}%\n"
+)
+
+# Marks the end of the queue for the writer thread
+_DONE = object()
+
+def render_feedback(base_name, skills, matched_skills, missing_skills, ranking):
+    """Render the per-resume feedback report as one string"""
+    missing_recommendation = ""
+    if missing_skills:
+        missing_recommendation = ("1. Consider adding these relevant skills if you have experience with them:\n"
+                                  "   " + ", ".join(missing_skills) + "\n")
+    return FEEDBACK_TEMPLATE.format(
+        base_name=base_name,
+        skill_count=len(skills),
+        skills=", ".join(skills),
+        matched_count=len(matched_skills),
+        matched=", ".join(matched_skills) if matched_skills else "None",
+        missing=", ".join(missing_skills) if missing_skills else "None",
+        missing_recommendation=missing_recommendation,
+        ranking=ranking
+    )
+
+def feedback_record(base_name, skills, matched_skills, missing_skills, ranking):
+    return {"resume": base_name, "skills": list(skills), "matched_skills": list(matched_skills),
+            "missing_skills": list(missing_skills), "ranking": float(ranking)}
+
+class ReportWriter:
+    """
+    Write feedback reports on a background thread, so scoring never waits on file I/O.
+
+    report_format "text" writes <base_name>_feedback.txt per resume as before;
+    "jsonl", "zip" and "parquet" (requires pyarrow) put every report in one file in
+    the output folder, avoiding one file create per resume. write() may be called from
+    several threads; close() waits for the queue to drain and returns the reports written.
+    """
+
+    def __init__(self, output_folder, report_format="text", queue_size=DEFAULT_QUEUE_SIZE):
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format {report_format!r}, expected one of {', '.join(REPORT_FORMATS)}")
+        self.output_folder = output_folder
+        self.report_format = report_format
+        self.written = 0
+        self.errors = 0
+        self._closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._open_output()
+        self._thread = threading.Thread(target=self._run, name="report-writer", daemon=True)
+        self._thread.start()
+
+    def _open_output(self):
+        self._file = None
+        self._zip = None
+        self._parquet = None
+        if self.report_format == "text":
+            return
+        path = os.path.join(self.output_folder, CONSOLIDATED_FILENAMES[self.report_format])
+        if self.report_format == "jsonl":
+            self._file = open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES)
+        elif self.report_format == "zip":
+            self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            import pyarrow  # Only needed for Parquet output
+            import pyarrow.parquet
+            self._pyarrow = pyarrow
+            self._parquet_schema = pyarrow.schema([
+                ("resume", pyarrow.string()),
+                ("skills", pyarrow.list_(pyarrow.string())),
+                ("matched_skills", pyarrow.list_(pyarrow.string())),
+                ("missing_skills", pyarrow.list_(pyarrow.string())),
+                ("ranking", pyarrow.float64()),
+            ])
+            self._parquet = pyarrow.parquet.ParquetWriter(path, self._parquet_schema)
+            self._rows = []
+
+    def write(self, base_name, skills, matched_skills, missing_skills, ranking):
+        """Queue one resume's report"""
+        self._queue.put((base_name, skills, matched_skills, missing_skills, ranking))
+
+    def _run(self):
+        while True:
+            report = self._queue.get()
+            if report is _DONE:
+                break
+            try:
+                self._write(*report)
+                self.written += 1
+            except Exception as e:
+                logger.error("Error writing feedback for %s: %s", report[0], e)
+                self.errors += 1
+
+    def _write(self, base_name, skills, matched_skills, missing_skills, ranking):
+        if self.report_format == "text":
+            feedback_path = os.path.join(self.output_folder, f"{base_name}_feedback.txt")
+            with open(feedback_path, "w", encoding="utf-8") as f:
+                f.write(render_feedback(base_name, skills, matched_skills, missing_skills, ranking))
+        elif self.report_format == "jsonl":
+            self._file.write(json.dumps(feedback_record(base_name, skills, matched_skills, missing_skills,
+                                                        ranking)) + "\n")
+        elif self.report_format == "zip":
+            # Same text the per-file layout writes, newline-translated the same way
+            text = render_feedback(base_name, skills, matched_skills, missing_skills, ranking)
+            self._zip.writestr(f"{base_name}_feedback.txt", text.replace("\n", os.linesep))
+        else:
+            self._rows.append(feedback_record(base_name, skills, matched_skills, missing_skills, ranking))
+            if len(self._rows) >= PARQUET_ROW_GROUP:
+                self._flush_parquet()
+
+    def _flush_parquet(self):
+        if self._rows:
+            self._parquet.write_table(self._pyarrow.Table.from_pylist(self._rows, schema=self._parquet_schema))
+            self._rows = []
+
+    def close(self):
+        """Finish writing every queued report and close the output file. Safe to call twice."""
+        if self._closed:
+            return self.written
+        self._closed = True
+        self._queue.put(_DONE)
+        self._thread.join()
+        try:
+            if self._file is not None:
+                self._file.close()
+            if self._zip is not None:
+                self._zip.close()
+            if self._parquet is not None:
+                self._flush_parquet()
+                self._parquet.close()
+        except Exception as e:
+            logger.error("Error closing feedback output: %s", e)
+            self.errors += 1
+        return self.written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
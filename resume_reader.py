@@ -0,0 +1,154 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.request import pathname2url
+from instrumentation import inc
+
+logger = logging.getLogger(__name__)
+
+# Resumes whose data each connection keeps in its LRU cache
+DEFAULT_CACHE_SIZE = 4096
+
+# Prepared statements kept per connection; the read queries below use fixed SQL text so they are reused
+CACHED_STATEMENTS = 64
+
+# Resumes and their skills in one join. The IDs arrive as one JSON array parameter,
+# so the statement text is the same for any number of IDs and stays prepared.
+RESUMES_WITH_SKILLS_SQL = """
+    SELECT r.id, r.resume_name, r.structured_data, rs.type, s.name
+    FROM resumes r
+    LEFT JOIN resume_skill rs ON rs.resume_id = r.id
+    LEFT JOIN skill s ON s.id = rs.skill_id
+    WHERE r.id IN (SELECT value FROM json_each(?))
+    ORDER BY r.id, rs.skill_id, rs.type
+"""
+
+_local = threading.local()
+
+class ReadConnection:
+    """
+    A thread's read-only connection to one database, with an LRU cache of resume data.
+
+    The cache is dropped whenever PRAGMA data_version shows that another connection
+    (module3 inserting or deleting resumes, in this process or another) has committed
+    since it was filled.
+    """
+
+    def __init__(self, database_path, cache_size=DEFAULT_CACHE_SIZE):
+        uri = f"file:{pathname2url(os.path.abspath(database_path))}?mode=ro"
+        self.conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.data_version = self._data_version()
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def validate_cache(self):
+        """Clear the cache if the database changed since the last check"""
+        version = self._data_version()
+        if version != self.data_version:
+            self.data_version = version
+            if self.cache:
+                self.cache.clear()
+                inc("resume_cache_invalidations_total")
+
+    def cache_get(self, resume_id):
+        data = self.cache.get(resume_id)
+        if data is not None:
+            self.cache.move_to_end(resume_id)
+        return data
+
+    def cache_put(self, resume_id, data):
+        self.cache[resume_id] = data
+        self.cache.move_to_end(resume_id)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def close(self):
+        self.conn.close()
+
+def get_read_connection(database_path, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Return this thread's read-only connection to database_path, opening it on first use.
+    It stays open for later calls until close_read_connections (see read_connections).
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    key = os.path.abspath(database_path)
+    connection = connections.get(key)
+    if connection is None:
+        connection = connections[key] = ReadConnection(database_path, cache_size)
+    return connection
+
+def close_read_connection(database_path):
+    """Close this thread's read connection to database_path, if it has one"""
+    connection = getattr(_local, "connections", {}).pop(os.path.abspath(database_path), None)
+    if connection is not None:
+        connection.close()
+
+def close_read_connections():
+    """Close this thread's read connections (their caches go with them)"""
+    for connection in getattr(_local, "connections", {}).values():
+        connection.close()
+    _local.connections = {}
+
+@contextmanager
+def read_connection(database_path, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    This thread's read connection to database_path for the block. A connection opened
+    here is closed at the end; one the caller already had stays open with its cache.
+    """
+    opened = os.path.abspath(database_path) not in getattr(_local, "connections", {})
+    try:
+        yield get_read_connection(database_path, cache_size)
+    finally:
+        if opened:
+            close_read_connection(database_path)
+
+@contextmanager
+def read_connections():
+    """Reuse this thread's read connections for every call in the block, closing them at the end"""
+    try:
+        yield
+    finally:
+        close_read_connections()
+
+def fetch_resumes_with_skills(database_path, resume_ids):
+    """
+    Return {resume_id: {"resume_name", "structured_data", "skills": {type: [names]}}}
+    for the given IDs, from the cache where possible and otherwise with one query.
+    IDs with no resume are left out. The returned dicts are shared with the cache.
+    """
+    connection = get_read_connection(database_path)
+    connection.validate_cache()
+
+    results = {}
+    missing = []
+    for resume_id in resume_ids:
+        data = connection.cache_get(resume_id)
+        if data is None:
+            missing.append(resume_id)
+        else:
+            results[resume_id] = data
+    inc("resume_cache_hits_total", len(results))
+
+    if missing:
+        fetched = {}
+        for resume_id, resume_name, structured_data, skill_type, skill_name in connection.conn.execute(
+                RESUMES_WITH_SKILLS_SQL, (json.dumps(missing),)):
+            data = fetched.get(resume_id)
+            if data is None:
+                data = fetched[resume_id] = {"resume_name": resume_name, "structured_data": structured_data,
+                                             "skills": {}}
+            if skill_name is not None:
+                data["skills"].setdefault(skill_type, []).append(skill_name)
+        for resume_id, data in fetched.items():
+            connection.cache_put(resume_id, data)
+        results.update(fetched)
+    return results
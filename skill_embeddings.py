@@ -0,0 +1,155 @@
+import re
+import zlib
+import sqlite3
+import logging
+import numpy as np
+from skill_matcher import get_default_matcher
+
+logger = logging.getLogger(__name__)
+
+# Hashed feature vector size; 256 float32 values keep 100k skills under 100 MB
+EMBEDDING_DIM = 256
+
+# Stored with each cached vector, so changing the features or size re-embeds everything
+EMBEDDER_VERSION = f"hashed-ngram-v1-{EMBEDDING_DIM}"
+
+# Cosine similarity at or above which a job keyword matches a skill.
+# "python" ~ "python 3" (0.84) clears it; "java" ~ "javascript" (0.40) and
+# "project management" ~ "product management" (0.78) do not.
+DEFAULT_SIMILARITY = 0.8
+
+# Characters per n-gram
+NGRAM_SIZE = 3
+
+def normalize_skill_name(name):
+    """Lowercase, turn separators into spaces and collapse whitespace; keeps "c++", "c#", ".net", "node.js" intact"""
+    return " ".join(re.sub(r"[^\w+#.]+", " ", name.lower()).split())
+
+def skill_key(name, matcher=None):
+    """Normalized name, mapped through the taxonomy so aliases share one vector ("postgres" -> "postgresql")"""
+    key = normalize_skill_name(name)
+    canonical = (matcher or get_default_matcher()).lookup.get(key)
+    return normalize_skill_name(canonical[0]) if canonical else key
+
+def acronym(key):
+    """Initials of a multi-word name ("machine learning" -> "ml"), or None"""
+    words = [word for word in key.split() if word[0].isalpha()]
+    return "".join(word[0] for word in words) if len(words) >= 2 else None
+
+def embed(key):
+    """
+    Unit vector for a normalized skill name: character n-grams of the padded name
+    plus its whole words, hashed into EMBEDDING_DIM signed buckets.
+    """
+    padded = f" {key} "
+    features = [padded[i:i + NGRAM_SIZE] for i in range(max(1, len(padded) - NGRAM_SIZE + 1))]
+    features.extend(f"w:{word}" for word in key.split())
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for feature in features:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        vector[digest % EMBEDDING_DIM] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class EmbeddingCache:
+    """On-disk cache of skill vectors keyed by normalized skill name"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS skill_vector (
+                                 name_key TEXT PRIMARY KEY,
+                                 version TEXT NOT NULL,
+                                 vector BLOB NOT NULL
+                             )''')
+        self.conn.commit()
+
+    def get_many(self, keys):
+        """Return {key: vector} for the cached keys made by the current embedder"""
+        found = {}
+        keys = list(keys)
+        # Stay under SQLite's limit on query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self.conn.execute(f"SELECT name_key, vector FROM skill_vector WHERE version = ? AND name_key IN "
+                                     f"({','.join('?' * len(chunk))})", [EMBEDDER_VERSION] + chunk)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, vectors):
+        self.conn.executemany("INSERT OR REPLACE INTO skill_vector (name_key, version, vector) VALUES (?, ?, ?)",
+                              [(key, EMBEDDER_VERSION, vector.astype(np.float32).tobytes())
+                               for key, vector in vectors.items()])
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def embed_keys(keys, cache=None):
+    """Vectors for normalized names, embedding each distinct name once and only if it is not cached"""
+    keys = set(keys)
+    vectors = cache.get_many(keys) if cache is not None else {}
+    missing = {key: embed(key) for key in keys if key not in vectors}
+    if missing and cache is not None:
+        cache.put_many(missing)
+    vectors.update(missing)
+    return vectors
+
+class SkillVectorIndex:
+    """
+    Brute-force nearest-neighbour index over a skill vocabulary. Each skill has a row
+    for its name and, for multi-word names, one for its acronym, so "ML" finds
+    "Machine Learning". All job keywords are matched in one matrix product.
+    """
+
+    def __init__(self, skill_names, cache=None):
+        matcher = get_default_matcher()
+        self.skill_names = list(skill_names)
+        keys = [skill_key(name, matcher) for name in self.skill_names]
+
+        row_keys = []
+        row_skills = []
+        self.name_rows = []
+        for position, key in enumerate(keys):
+            self.name_rows.append(len(row_keys))
+            row_keys.append(key)
+            row_skills.append(position)
+            short = acronym(key)
+            if short:
+                row_keys.append(short)
+                row_skills.append(position)
+
+        vectors = embed_keys(row_keys, cache)
+        self.row_skills = np.array(row_skills, dtype=np.int64)
+        self.vectors = (np.stack([vectors[key] for key in row_keys]) if row_keys
+                        else np.zeros((0, EMBEDDING_DIM), dtype=np.float32))
+
+    def similarities(self, keywords):
+        """(keywords x skills) best cosine similarity between each keyword and each skill"""
+        matcher = get_default_matcher()
+        keys = [skill_key(keyword, matcher) for keyword in keywords]
+        short_keys = [acronym(key) for key in keys]
+        vectors = embed_keys(keys + [short for short in short_keys if short])
+        query = np.stack([vectors[key] for key in keys])
+
+        # Keyword name vs every skill row (names and acronyms), reduced to the best row per skill
+        row_scores = query @ self.vectors.T
+        scores = np.full((len(keys), len(self.skill_names)), -1.0, dtype=np.float32)
+        np.maximum.at(scores.T, self.row_skills, row_scores.T)
+
+        # Keyword acronym vs skill names only; acronym vs acronym would pair "project management"
+        # with "product management"
+        names = self.vectors[self.name_rows]
+        for position, short in enumerate(short_keys):
+            if short:
+                scores[position] = np.maximum(scores[position], names @ vectors[short])
+        return scores
+
+    def match(self, keywords, threshold=DEFAULT_SIMILARITY):
+        """Return {keyword: [skill names with similarity >= threshold]}"""
+        if not keywords or not self.skill_names:
+            return {keyword: [] for keyword in keywords}
+        scores = self.similarities(keywords)
+        return {keyword: [self.skill_names[i] for i in np.flatnonzero(scores[position] >= threshold)]
+                for position, keyword in enumerate(keywords)}
@@ -0,0 +1,180 @@
+import os
+import json
+import heapq
+import sqlite3
+from bisect import bisect_left
+
+# Bump when the on-disk layout of the index changes
+INDEX_VERSION = 1
+
+def _contains(posting, resume_id):
+    """Membership test on a sorted posting list"""
+    position = bisect_left(posting, resume_id)
+    return position < len(posting) and posting[position] == resume_id
+
+class SkillIndex:
+    """
+    In-memory inverted index: skill name -> sorted posting list of resume IDs.
+
+    Built from the resume_skill/skill tables, saved to and reloaded from a JSON
+    file, and kept current with update(), which only reads resumes added since
+    the last build (resume IDs are AUTOINCREMENT, so they only grow).
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.resume_names = {}
+        self.last_resume_id = 0
+        self._skills_lower = None
+
+    @classmethod
+    def build(cls, database_path):
+        """Build a fresh index from the database"""
+        index = cls()
+        index.update(database_path)
+        return index
+
+    @classmethod
+    def load(cls, index_path):
+        """Load an index saved with save()"""
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported skill index version: {data.get('version')}")
+
+        index = cls()
+        index.postings = data["postings"]
+        index.resume_names = {int(resume_id): name for resume_id, name in data["resumes"].items()}
+        index.last_resume_id = data["last_resume_id"]
+        return index
+
+    def save(self, index_path):
+        """Write the index to a JSON file (atomically, via a temp file)"""
+        temp_path = index_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "last_resume_id": self.last_resume_id,
+                "resumes": self.resume_names,
+                "postings": self.postings
+            }, f)
+        os.replace(temp_path, index_path)
+
+    def add_resume(self, resume_id, resume_name, skills):
+        """Index one resume. IDs must be added in increasing order to keep postings sorted."""
+        self.resume_names[resume_id] = resume_name
+        for skill in set(skills):
+            if skill not in self.postings:
+                self.postings[skill] = []
+                self._skills_lower = None
+            self.postings[skill].append(resume_id)
+        self.last_resume_id = max(self.last_resume_id, resume_id)
+
+    def remove_resumes(self, resume_ids):
+        """Drop resumes (e.g. rows purged by an incremental reload) from every posting list"""
+        resume_ids = set(resume_ids)
+        if not resume_ids:
+            return
+        for skill in list(self.postings):
+            posting = [resume_id for resume_id in self.postings[skill] if resume_id not in resume_ids]
+            if posting:
+                self.postings[skill] = posting
+            else:
+                del self.postings[skill]
+                self._skills_lower = None
+        for resume_id in resume_ids:
+            self.resume_names.pop(resume_id, None)
+
+    def update(self, database_path):
+        """
+        Bring the index up to date with the database: index resumes inserted since
+        the last update and drop resumes that were deleted. Returns (added, removed).
+        """
+        conn = sqlite3.connect(database_path)
+        cursor = conn.cursor()
+        try:
+            current_ids = {row[0] for row in cursor.execute("SELECT id FROM resumes")}
+            new_resumes = cursor.execute("SELECT id, resume_name FROM resumes WHERE id > ? ORDER BY id",
+                                         (self.last_resume_id,)).fetchall()
+            skills = {}
+            for resume_id, skill_name in cursor.execute("""
+                    SELECT DISTINCT rs.resume_id, s.name
+                    FROM resume_skill rs
+                    JOIN skill s ON s.id = rs.skill_id
+                    WHERE rs.resume_id > ?""", (self.last_resume_id,)):
+                skills.setdefault(resume_id, []).append(skill_name)
+        finally:
+            conn.close()
+
+        removed = [resume_id for resume_id in self.resume_names if resume_id not in current_ids]
+        self.remove_resumes(removed)
+        for resume_id, resume_name in new_resumes:
+            self.add_resume(resume_id, resume_name, skills.get(resume_id, []))
+        return len(new_resumes), len(removed)
+
+    def expand_keyword(self, keyword):
+        """Skills matching a job keyword: the keyword is a substring of the skill name"""
+        if self._skills_lower is None:
+            self._skills_lower = [(skill.lower(), skill) for skill in self.postings]
+        keyword = keyword.lower()
+        return [skill for skill_lower, skill in self._skills_lower if keyword in skill_lower]
+
+    def top_k(self, matched_skills, k):
+        """
+        Return the k best (resume_id, matched_count), best first, ties by resume ID.
+
+        Posting lists are walked shortest first, accumulating a count per resume.
+        Once the k-th best count exceeds the number of lists left, a resume not yet
+        seen can no longer make the top k, so the remaining (longest) lists are only
+        probed for the existing candidates instead of being walked.
+        """
+        postings = sorted((self.postings[skill] for skill in matched_skills), key=len)
+        counts = {}
+        remaining = len(postings)
+
+        for position, posting in enumerate(postings):
+            remaining -= 1
+            for resume_id in posting:
+                counts[resume_id] = counts.get(resume_id, 0) + 1
+
+            if len(counts) >= k and remaining:
+                threshold = heapq.nlargest(k, counts.values())[-1]
+                if threshold > remaining:
+                    # Early termination: probe the remaining lists for surviving candidates only
+                    candidates = [resume_id for resume_id, count in counts.items()
+                                  if count + remaining >= threshold]
+                    for probe in postings[position + 1:]:
+                        for resume_id in candidates:
+                            if _contains(probe, resume_id):
+                                counts[resume_id] += 1
+                    counts = {resume_id: counts[resume_id] for resume_id in candidates}
+                    break
+
+        return heapq.nsmallest(k, counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def rank_candidates(self, jobs, k=10):
+        """
+        Rank resumes for many jobs in one pass over the in-memory index.
+
+        jobs maps a job name to its keyword list. Returns {job: [(resume_id,
+        resume_name, ranking)]} with ranking = matched skills / keywords * 100,
+        the score provide_feedback_for_all_resumes writes; resumes matching no
+        keyword are left out. Keyword expansions are shared across jobs, since
+        open reqs repeat most of their keywords.
+        """
+        expansions = {}
+        results = {}
+        for job, keywords in jobs.items():
+            matched = set()
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword not in expansions:
+                    expansions[keyword] = self.expand_keyword(keyword)
+                matched.update(expansions[keyword])
+
+            if not keywords or not matched or k <= 0:
+                results[job] = []
+                continue
+            results[job] = [(resume_id, self.resume_names[resume_id], count / len(keywords) * 100)
+                            for resume_id, count in self.top_k(matched, k)]
+        return results
@@ -0,0 +1,101 @@
+import os
+import re
+import json
+
+# Skill taxonomy shipped with the repo: canonical names, skill types and aliases. It is a reduced,
+# hand-checked set of common skills; a production taxonomy of thousands of entries can be passed instead
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "skill_taxonomy.json")
+
+# A match must not be glued to surrounding word characters ("java" in "javascript", "go" in "google").
+# "+" and "#" count as word characters so "c" never matches inside "c++" or "c#".
+_BOUNDARY_BEFORE = r"(?<![\w+#])"
+_BOUNDARY_AFTER = r"(?![\w+#])"
+
+def load_taxonomy(path=DEFAULT_TAXONOMY_PATH):
+    """
+    Load a skill taxonomy: a JSON list of {"name", "type", "aliases", "match_case"} entries.
+    match_case marks names that are also ordinary English words ("Go", "Spring", "Excel");
+    those names only match with the same capitalisation, while their aliases match in any case.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _trie_regex(words):
+    """
+    Build one regex alternation from a trie of the words. A trie-shaped pattern lets
+    the regex engine test thousands of alternatives at a position in a single walk,
+    and greedy optional suffixes make the longest entry win ("javascript" over "java").
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        alternatives = []
+        optional = False
+        for char in sorted(node):
+            if char == "":
+                optional = True
+            else:
+                alternatives.append(re.escape(char) + build(node[char]))
+        if not alternatives:
+            return ""
+        pattern = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        return "(?:" + pattern + ")?" if optional else pattern
+
+    return build(trie)
+
+class SkillMatcher:
+    """
+    Compiled multi-pattern skill matcher. All taxonomy names and aliases are folded
+    into one trie-shaped regex, built once, and a lowercased document is scanned
+    in a single pass.
+    """
+
+    def __init__(self, taxonomy):
+        self.lookup = {}        # lowercased name/alias -> (canonical name, type)
+        self.case_names = {}    # lowercased match_case name -> exact-case name
+
+        for entry in taxonomy:
+            canonical = (entry["name"], entry.get("type", "technical"))
+            for alias in entry.get("aliases", []):
+                self.lookup.setdefault(alias.lower(), canonical)
+            if entry.get("match_case"):
+                self.case_names[entry["name"].lower()] = entry["name"]
+            self.lookup[entry["name"].lower()] = canonical
+
+        self.pattern = re.compile(_BOUNDARY_BEFORE + "(" + _trie_regex(self.lookup) + ")" + _BOUNDARY_AFTER)
+
+    def _iter_matches(self, text):
+        lowered = text.lower()
+        # Case checks compare against the original text, which needs lower() to keep offsets
+        same_offsets = len(lowered) == len(text)
+        for match in self.pattern.finditer(lowered):
+            key = match.group(1)
+            exact_name = self.case_names.get(key)
+            if exact_name is not None and same_offsets and text[match.start(1):match.end(1)] != exact_name:
+                continue  # "go" or "excel" used as an ordinary word
+            yield self.lookup[key]
+
+    def find_skills(self, text):
+        """Return [{"type", "name"}] for every taxonomy skill in the text, in first-occurrence order"""
+        found = {}
+        for name, skill_type in self._iter_matches(text):
+            found.setdefault(name, skill_type)
+        return [{"type": skill_type, "name": name} for name, skill_type in found.items()]
+
+    def has_skills(self, text):
+        """True if the text mentions at least one taxonomy skill (cheap pre-filter)"""
+        return next(self._iter_matches(text), None) is not None
+
+_default_matcher = None
+
+def get_default_matcher():
+    """Matcher for the bundled taxonomy, compiled on first use and then reused"""
+    global _default_matcher
+    if _default_matcher is None:
+        _default_matcher = SkillMatcher(load_taxonomy())
+    return _default_matcher
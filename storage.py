@@ -0,0 +1,356 @@
+import os
+import json
+import logging
+from abc import ABC, abstractmethod
+from skill_matcher import load_taxonomy
+from instrumentation import timer, inc
+from module3_store_data import (DEFAULT_BATCH_SIZE, initialize_database, open_bulk_connection, load_structured_data,
+                                write_resume_batch, skill_key)
+
+logger = logging.getLogger(__name__)
+
+# Storage backends: the row-oriented SQLite database module3 has always written, and an
+# embedded DuckDB file holding the same resumes column by column for corpus-wide queries
+STORAGE_BACKENDS = ("sqlite", "duckdb")
+
+# File extensions open_store treats as a DuckDB store; anything else is SQLite
+COLUMNAR_EXTENSIONS = (".duckdb",)
+
+# Columnar schema. Each resume's skills are unnested into resume_skill at load time, so
+# aggregations and ranking scan plain columns instead of parsing structured_data again
+DUCKDB_SCHEMA = [
+    "CREATE SEQUENCE IF NOT EXISTS resume_id_seq START 1",
+    '''CREATE TABLE IF NOT EXISTS resumes (
+           id BIGINT NOT NULL DEFAULT nextval('resume_id_seq'),
+           resume_name VARCHAR NOT NULL,
+           structured_data JSON NOT NULL
+       )''',
+    '''CREATE TABLE IF NOT EXISTS resume_skill (
+           resume_id BIGINT NOT NULL,
+           skill VARCHAR NOT NULL,
+           skill_key VARCHAR NOT NULL,
+           type VARCHAR NOT NULL
+       )''',
+    # Taxonomy names and aliases -> canonical name, the mapping module3's skill_alias table applies
+    '''CREATE TABLE IF NOT EXISTS skill_alias (
+           alias_key VARCHAR NOT NULL,
+           name VARCHAR NOT NULL
+       )''',
+]
+
+# Skills JSON files -> staged (resume_name, structured_data). Files that are not valid JSON are
+# skipped, like bulk_insert_resumes skips files it cannot load
+STAGE_JSON_FILES_SQL = '''
+    CREATE OR REPLACE TEMP TABLE staged AS
+    SELECT regexp_extract(filename, '([^/\\\\]+)\\.json$', 1) || '.pdf' AS resume_name,
+           content::JSON AS structured_data
+    FROM read_text(?)
+    WHERE json_valid(content)
+'''
+
+# In-memory batch (one JSON array parameter) -> staged
+STAGE_BATCH_SQL = '''
+    CREATE OR REPLACE TEMP TABLE staged AS
+    SELECT unnest(from_json(?::JSON, '[{"resume_name": "VARCHAR", "structured_data": "JSON"}]'), recursive := true)
+'''
+
+# Staged resumes replace any stored under the same name. Duplicates of another resume
+# (module2's duplicate_of) get no rows, as in the SQLite schema.
+LOAD_STAGED_SQL = [
+    '''DELETE FROM resume_skill WHERE resume_id IN
+           (SELECT id FROM resumes WHERE resume_name IN (SELECT resume_name FROM staged))''',
+    "DELETE FROM resumes WHERE resume_name IN (SELECT resume_name FROM staged)",
+    '''INSERT INTO resumes (resume_name, structured_data)
+       SELECT resume_name, structured_data FROM staged
+       WHERE coalesce(structured_data->>'duplicate_of', '') = ''
+       ORDER BY resume_name''',
+    '''INSERT INTO resume_skill
+       SELECT DISTINCT resume_id, coalesce(a.name, skill), lower(coalesce(a.name, skill)), type
+       FROM (SELECT r.id AS resume_id, trim(entry->>'name') AS skill, entry->>'type' AS type
+             FROM (SELECT resume_name,
+                          unnest(from_json(structured_data->'skills', '["JSON"]')) AS entry
+                   FROM staged
+                   WHERE json_type(structured_data->'skills') = 'ARRAY') e
+             JOIN resumes r ON r.resume_name = e.resume_name) s
+       LEFT JOIN skill_alias a ON a.alias_key = lower(s.skill)
+       WHERE skill IS NOT NULL AND skill != '' AND type IS NOT NULL''',
+]
+
+# Top k resumes for every job in one query. Distinct keywords are matched against the
+# distinct skills once (keyword is a substring of the skill name, as in SkillIndex), and
+# ranking = matched skills / job keywords * 100, ties broken by resume ID.
+RANK_CANDIDATES_SQL = '''
+    WITH job AS (
+        SELECT unnest(from_json(?::JSON, '[{"job": "VARCHAR", "keywords": ["VARCHAR"]}]'), recursive := true)
+    ),
+    job_keyword AS (SELECT DISTINCT job, lower(unnest(keywords)) AS keyword FROM job),
+    keyword_skill AS (
+        SELECT k.keyword, v.skill_key
+        FROM (SELECT DISTINCT keyword FROM job_keyword) k
+        JOIN (SELECT DISTINCT skill_key FROM resume_skill) v ON contains(v.skill_key, k.keyword)
+    ),
+    job_skill AS (
+        SELECT DISTINCT jk.job, ks.skill_key
+        FROM job_keyword jk JOIN keyword_skill ks ON ks.keyword = jk.keyword
+    ),
+    matched AS (
+        SELECT js.job, rs.resume_id, count(DISTINCT rs.skill_key) AS matched_count
+        FROM job_skill js JOIN resume_skill rs ON rs.skill_key = js.skill_key
+        GROUP BY js.job, rs.resume_id
+        QUALIFY row_number() OVER (PARTITION BY js.job ORDER BY count(DISTINCT rs.skill_key) DESC,
+                                   rs.resume_id) <= ?
+    )
+    SELECT m.job, m.resume_id, r.resume_name, m.matched_count * 100.0 / len(j.keywords) AS ranking
+    FROM matched m
+    JOIN job j ON j.job = m.job
+    JOIN resumes r ON r.id = m.resume_id
+    ORDER BY m.job, m.matched_count DESC, m.resume_id
+'''
+
+def storage_backend(path):
+    """The backend open_store uses for a database path"""
+    return "duckdb" if path.lower().endswith(COLUMNAR_EXTENSIONS) else "sqlite"
+
+def open_store(path, backend=None):
+    """Open a resume store, choosing the backend from the file extension unless given"""
+    backend = backend or storage_backend(path)
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend {backend!r}, expected one of {', '.join(STORAGE_BACKENDS)}")
+    if backend == "duckdb":
+        return DuckDBStore(path)
+    return SQLiteStore(path)
+
+def json_paths(feedback_dir, resume_names=None):
+    """Skills JSON paths for the given resume names (.pdf), or every JSON file in feedback_dir"""
+    if resume_names is None:
+        return sorted(os.path.join(feedback_dir, f) for f in os.listdir(feedback_dir) if f.endswith(".json"))
+    return [os.path.join(feedback_dir, f"{os.path.splitext(os.path.basename(name))[0]}.json")
+            for name in resume_names]
+
+class ResumeStore(ABC):
+    """
+    Where resumes and their skills are kept. Resumes are identified by resume_name
+    (the PDF file name); writing a resume replaces what was stored under its name.
+    A backend must implement every abstract method, or it cannot be created.
+    """
+
+    backend = None
+
+    @abstractmethod
+    def write_resumes(self, batch):
+        """Store a batch of (resume_name, structured_data) in one transaction"""
+
+    def load_json_folder(self, feedback_dir, resume_names=None):
+        """
+        Store the skills JSON of the given resumes (default: every file in feedback_dir).
+        Files that are missing or unreadable are logged and skipped. Returns the resumes loaded.
+        """
+        loaded = 0
+        paths = json_paths(feedback_dir, resume_names)
+        for start in range(0, len(paths), DEFAULT_BATCH_SIZE):
+            batch = []
+            for path in paths[start:start + DEFAULT_BATCH_SIZE]:
+                try:
+                    resume_name, structured_data = load_structured_data(path, feedback_dir)
+                    batch.append((f"{os.path.splitext(resume_name)[0]}.pdf", structured_data))
+                except Exception as e:
+                    logger.error("Error loading structured data from %s: %s", path, e)
+            if batch:
+                self.write_resumes(batch)
+                loaded += len(batch)
+        return loaded
+
+    @abstractmethod
+    def delete_resumes(self, resume_names):
+        """Remove the named resumes and their skills"""
+
+    @abstractmethod
+    def resume_count(self):
+        """Return the number of stored resumes"""
+
+    @abstractmethod
+    def skill_frequencies(self, limit=None):
+        """Return [(skill_name, resume_count)], most common first"""
+
+    @abstractmethod
+    def rank_candidates(self, jobs, k=10):
+        """
+        jobs maps a job name to its keyword list. Returns {job: [(resume_id,
+        resume_name, ranking)]}, the k best resumes per job with ranking = matched
+        skills / keywords * 100; resumes matching no keyword are left out.
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class SQLiteStore(ResumeStore):
+    """The normalized SQLite schema of module3, written over one bulk-load connection"""
+
+    backend = "sqlite"
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        initialize_database(db_file)
+        self.conn = open_bulk_connection(db_file)
+        # Writes replace resumes by name
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_resumes_name ON resumes(resume_name)")
+        self.skill_ids = {}
+
+    def _delete(self, resume_names):
+        names = [(resume_name,) for resume_name in resume_names]
+        self.conn.executemany('''DELETE FROM resume_skill WHERE resume_id IN
+                                     (SELECT id FROM resumes WHERE resume_name = ?)''', names)
+        self.conn.executemany("DELETE FROM resumes WHERE resume_name = ?", names)
+        self.conn.executemany("DELETE FROM resume_duplicate WHERE resume_name = ?", names)
+
+    def _transaction(self, work):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            work()
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            self.skill_ids.clear()  # Skills added by the rolled-back batch no longer exist
+            raise
+
+    def write_resumes(self, batch):
+        def work():
+            self._delete([resume_name for resume_name, structured_data in batch])
+            write_resume_batch(self.conn, batch, skill_ids=self.skill_ids)
+        self._transaction(work)
+
+    def delete_resumes(self, resume_names):
+        if resume_names:
+            self._transaction(lambda: self._delete(resume_names))
+
+    def resume_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def skill_frequencies(self, limit=None):
+        return self.conn.execute('''SELECT s.name, COUNT(DISTINCT rs.resume_id) AS resumes
+                                    FROM resume_skill rs JOIN skill s ON s.id = rs.skill_id
+                                    GROUP BY rs.skill_id
+                                    ORDER BY resumes DESC, s.name_key
+                                    LIMIT ?''', (-1 if limit is None else limit,)).fetchall()
+
+    def rank_candidates(self, jobs, k=10):
+        from skill_index import SkillIndex
+        return SkillIndex.build(self.db_file).rank_candidates(jobs, k)
+
+    def close(self):
+        self.conn.close()
+
+class DuckDBStore(ResumeStore):
+    """
+    Columnar store in an embedded DuckDB file (requires duckdb). Loads, aggregations
+    and ranking are single vectorized SQL statements over the whole corpus, and
+    load_json_folder reads the skills JSON files inside DuckDB instead of in Python.
+    """
+
+    backend = "duckdb"
+
+    def __init__(self, path):
+        import duckdb  # Only needed for the columnar store
+
+        self.path = path
+        self.conn = duckdb.connect(path)
+        for statement in DUCKDB_SCHEMA:
+            self.conn.execute(statement)
+        self._seed_aliases()
+
+    def _seed_aliases(self):
+        aliases = []
+        for entry in load_taxonomy():
+            name = entry["name"].strip()
+            aliases.append({"alias_key": skill_key(name), "name": name})
+            aliases.extend({"alias_key": skill_key(alias), "name": name} for alias in entry.get("aliases", []))
+        self.conn.execute("BEGIN TRANSACTION")
+        self.conn.execute("DELETE FROM skill_alias")
+        self.conn.execute('''INSERT INTO skill_alias
+                             SELECT unnest(from_json(?::JSON, '[{"alias_key": "VARCHAR", "name": "VARCHAR"}]'),
+                                           recursive := true)''', (json.dumps(aliases),))
+        self.conn.execute("COMMIT")
+
+    def _load_staged(self, stage_sql, parameter):
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            self.conn.execute(stage_sql, (parameter,))
+            staged = self.conn.execute("SELECT COUNT(*) FROM staged").fetchone()[0]
+            with timer("columnar_load_seconds"):
+                for statement in LOAD_STAGED_SQL:
+                    self.conn.execute(statement)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        inc("resumes_stored_total", staged)
+        return staged
+
+    def write_resumes(self, batch):
+        self._load_staged(STAGE_BATCH_SQL, json.dumps([{"resume_name": resume_name, "structured_data": structured_data}
+                                                       for resume_name, structured_data in batch]))
+
+    def load_json_folder(self, feedback_dir, resume_names=None):
+        paths = [path for path in json_paths(feedback_dir, resume_names) if os.path.exists(path)]
+        if resume_names is not None and len(paths) < len(resume_names):
+            logger.warning("%s structured data files are missing", len(resume_names) - len(paths))
+        if not paths:
+            return 0
+        # DuckDB expands a glob much faster than it opens a long list of paths
+        source = os.path.join(feedback_dir, "*.json") if resume_names is None else paths
+        loaded = self._load_staged(STAGE_JSON_FILES_SQL, source)
+        if loaded < len(paths):
+            logger.warning("Skipped %s structured data files that are not valid JSON", len(paths) - loaded)
+        return loaded
+
+    def delete_resumes(self, resume_names):
+        if not resume_names:
+            return
+        names = json.dumps(list(resume_names))
+        self.conn.execute("BEGIN TRANSACTION")
+        self.conn.execute('''DELETE FROM resume_skill WHERE resume_id IN
+                                 (SELECT id FROM resumes WHERE resume_name IN (SELECT unnest(from_json(?::JSON,
+                                                                                                 '["VARCHAR"]'))))''',
+                          (names,))
+        self.conn.execute("DELETE FROM resumes WHERE resume_name IN (SELECT unnest(from_json(?::JSON, '[\"VARCHAR\"]')))",
+                          (names,))
+        self.conn.execute("COMMIT")
+
+    def resume_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM resumes").fetchone()[0]
+
+    def skill_frequencies(self, limit=None):
+        query = '''SELECT min(skill) AS skill, COUNT(DISTINCT resume_id) AS resumes
+                   FROM resume_skill
+                   GROUP BY skill_key
+                   ORDER BY resumes DESC, skill_key'''
+        if limit is not None:
+            return self.conn.execute(query + " LIMIT ?", (limit,)).fetchall()
+        return self.conn.execute(query).fetchall()
+
+    def rank_candidates(self, jobs, k=10):
+        results = {job: [] for job in jobs}
+        if k <= 0:
+            return results
+        rows = self.conn.execute(RANK_CANDIDATES_SQL, (json.dumps([{"job": job, "keywords": keywords}
+                                                                   for job, keywords in jobs.items()]), k))
+        for job, resume_id, resume_name, ranking in rows.fetchall():
+            results[job].append((resume_id, resume_name, ranking))
+        return results
+
+    def export_parquet(self, output_folder):
+        """Write resumes.parquet and resume_skill.parquet, a Parquet copy of the store"""
+        os.makedirs(output_folder, exist_ok=True)
+        for table in ("resumes", "resume_skill"):
+            path = os.path.join(output_folder, f"{table}.parquet").replace("'", "''")
+            self.conn.execute(f"COPY (SELECT * FROM {table} ORDER BY {'id' if table == 'resumes' else 'resume_id'}) "
+                              f"TO '{path}' (FORMAT parquet)")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,116 @@
+import os
+import json
+import random
+import argparse
+import fitz  # PyMuPDF
+from skill_matcher import load_taxonomy, DEFAULT_TAXONOMY_PATH
+
+# File listing each generated PDF's kind and the skills planted in it
+GROUND_TRUTH_FILENAME = "ground_truth.json"
+
+# Kinds of PDF the generator can write
+KINDS = ("text", "scanned", "mixed")
+
+# Words the synthetic resume prose is drawn from, and the section headings between its paragraphs
+FILLER_WORDS = ("designed built led delivered improved team project customer platform service data "
+                "reduced latency by percent across multiple regions owned roadmap for the and with of").split()
+SECTION_TITLES = ["Summary:", "Experience:", "Education:", "Projects:", "Certifications:"]
+
+LINES_PER_PAGE = 50
+PAGE_RECT = fitz.Rect(0, 0, 612, 792)  # US Letter, in points
+TEXT_RECT = fitz.Rect(54, 54, 558, 738)
+FONT_SIZE = 9
+
+def make_resume_lines(rng, skill_names, lines=80, skills_per_resume=12):
+    """
+    Synthetic resume: filler prose with planted skills plus a skills section.
+    Returns (lines, planted_skills); the planted skills are the ground truth.
+    """
+    planted = rng.sample(skill_names, min(skills_per_resume, len(skill_names)))
+    prose_skills = planted[:len(planted) // 2]
+    section_skills = planted[len(planted) // 2:]
+
+    body = ["Jane Doe", "jane.doe@example.com | +1 555 0100"]
+    for i in range(lines):
+        if i % 16 == 0:
+            body.append(rng.choice(SECTION_TITLES))
+        words = rng.choices(FILLER_WORDS, k=12)
+        if prose_skills and rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), prose_skills.pop())
+        body.append(" ".join(words))
+    body.append("Technical Skills")
+    # Skills not placed in the prose go into the skills section, so every planted skill appears
+    body.append(", ".join(section_skills + prose_skills))
+    return body, planted
+
+def write_text_page(doc, lines):
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    page.insert_textbox(TEXT_RECT, "\n".join(lines), fontsize=FONT_SIZE)
+    return page
+
+def write_scanned_page(doc, lines, dpi):
+    """Render the lines to an image and place it on a page with no text layer, like a scan"""
+    scratch = fitz.open()
+    pixmap = write_text_page(scratch, lines).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    scratch.close()
+    page = doc.new_page(width=PAGE_RECT.width, height=PAGE_RECT.height)
+    # PNG keeps the file close to a real scan's size; a raw pixmap would be stored uncompressed
+    page.insert_image(PAGE_RECT, stream=pixmap.tobytes("png"))
+
+def write_resume_pdf(pdf_path, lines, kind, dpi=150):
+    """Write resume lines as a PDF: all text-layer pages, all scanned pages, or alternating (mixed)"""
+    doc = fitz.open()
+    pages = [lines[i:i + LINES_PER_PAGE] for i in range(0, len(lines), LINES_PER_PAGE)]
+    for page_num, page_lines in enumerate(pages):
+        scanned = kind == "scanned" or (kind == "mixed" and page_num % 2 == 1)
+        if scanned:
+            write_scanned_page(doc, page_lines, dpi)
+        else:
+            write_text_page(doc, page_lines)
+    doc.save(pdf_path, deflate=True)
+    doc.close()
+
+# Function to generate a corpus of synthetic resume PDFs with known skills
+def generate_corpus(output_folder, count=100, kinds=KINDS, lines=80, skills_per_resume=12, seed=0,
+                    taxonomy_path=DEFAULT_TAXONOMY_PATH, dpi=150):
+    """
+    Write `count` resume PDFs to output_folder, cycling through `kinds`, plus
+    ground_truth.json mapping each file to its kind and planted skills.
+    Returns the ground truth dict.
+    """
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    rng = random.Random(seed)
+    skill_names = [entry["name"] for entry in load_taxonomy(taxonomy_path)]
+    ground_truth = {}
+
+    for i in range(count):
+        kind = kinds[i % len(kinds)]
+        filename = f"synthetic_{i:05d}_{kind}.pdf"
+        resume_lines, planted = make_resume_lines(rng, skill_names, lines, skills_per_resume)
+        write_resume_pdf(os.path.join(output_folder, filename), resume_lines, kind, dpi)
+        ground_truth[filename] = {"kind": kind, "skills": planted}
+
+    with open(os.path.join(output_folder, GROUND_TRUTH_FILENAME), "w", encoding="utf-8") as f:
+        json.dump(ground_truth, f, indent=2)
+
+    print(f"Generated {count} synthetic resumes in {output_folder}")
+    return ground_truth
+
+def load_ground_truth(corpus_folder):
+    with open(os.path.join(corpus_folder, GROUND_TRUTH_FILENAME), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic resume PDFs with ground-truth skills")
+    parser.add_argument("output_folder")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--lines", type=int, default=80, help="Body lines per resume (about 50 per page)")
+    parser.add_argument("--skills", type=int, default=12, help="Skills planted per resume")
+    parser.add_argument("--dpi", type=int, default=150, help="Resolution of scanned pages")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generate_corpus(args.output_folder, args.count, args.kinds, args.lines, args.skills, args.seed, dpi=args.dpi)
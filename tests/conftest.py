@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_stub_server import start_stub_server, default_completion
+
+@pytest.fixture
+def stub():
+    """Start a stub endpoint whose completion is set per test; requests it received are recorded"""
+    state = {"completion": default_completion, "requests": []}
+
+    def completion(request):
+        state["requests"].append(request)
+        return state["completion"](request)
+
+    server, endpoint = start_stub_server(completion=completion)
+    state["endpoint"] = endpoint
+    yield state
+    server.shutdown()
+    server.server_close()
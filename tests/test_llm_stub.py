@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+import module2_extract_data
+from llm_client import AsyncLLMClient, backoff_delay
+from llm_stub_server import start_stub_server, CANNED_SKILLS
+from module2_extract_data import request_skills, request_skills_async, REASK_PROMPT
+
+RESUME_TEXT = "Jane Doe\nData engineer\nSkills: Python, SQL, communication\n"
+
+def replies(*contents):
+    """A completion answering with each of contents in turn"""
+    remaining = list(contents)
+    return lambda request: remaining.pop(0)
+
+def test_request_skills_returns_the_stub_skills(stub):
+    result = request_skills(RESUME_TEXT, "test-key", stub["endpoint"])
+
+    assert result == {"skills": CANNED_SKILLS}
+    [request] = stub["requests"]
+    assert request["messages"][-1] == {"role": "user", "content": RESUME_TEXT}
+
+def test_malformed_reply_is_asked_again_with_the_reply_shown(stub):
+    stub["completion"] = replies("Sure! Here are the skills:", json.dumps({"skills": CANNED_SKILLS}))
+
+    assert request_skills(RESUME_TEXT, "test-key", stub["endpoint"]) == {"skills": CANNED_SKILLS}
+    first, reask = stub["requests"]
+    assert reask["messages"][:2] == first["messages"]
+    assert reask["messages"][2] == {"role": "assistant", "content": "Sure! Here are the skills:"}
+    assert reask["messages"][3] == {"role": "user",
+                                    "content": REASK_PROMPT.format(problem="was not valid JSON")}
+
+def test_reply_still_malformed_after_reasking_gives_none(stub):
+    stub["completion"] = lambda request: "not json"
+
+    assert request_skills(RESUME_TEXT, "test-key", stub["endpoint"]) is None
+    assert len(stub["requests"]) == module2_extract_data.MAX_REASKS + 1
+
+def test_async_path_reasks_like_the_sync_path(stub):
+    stub["completion"] = replies("not json", json.dumps({"skills": CANNED_SKILLS}))
+
+    async def run():
+        client = AsyncLLMClient(stub["endpoint"], "test-key", max_in_flight=2, requests_per_minute=None,
+                                tokens_per_minute=None)
+        try:
+            return await request_skills_async(RESUME_TEXT, client)
+        finally:
+            client.close()
+
+    assert asyncio.run(run()) == {"skills": CANNED_SKILLS}
+    assert stub["requests"][1]["messages"][2] == {"role": "assistant", "content": "not json"}
+
+def test_async_client_gives_up_on_a_failing_endpoint():
+    server, endpoint = start_stub_server(error_rate=1.0)
+
+    async def run():
+        client = AsyncLLMClient(endpoint, "test-key", requests_per_minute=None, tokens_per_minute=None,
+                                max_retries=1)
+        try:
+            return await request_skills_async(RESUME_TEXT, client), client.stats
+        finally:
+            client.close()
+
+    try:
+        result, stats = asyncio.run(run())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert result is None
+    assert stats == {"requests": 2, "retries": 1, "failures": 1}
+
+@pytest.mark.parametrize("retry_after, expected", [("2.5", 2.5), ("86400", 30.0), ("-5", 0.0)])
+def test_backoff_honours_retry_after_up_to_max_delay(retry_after, expected):
+    assert backoff_delay(0, max_delay=30.0, retry_after=retry_after) == expected
+
+@pytest.mark.parametrize("retry_after", ["Wed, 21 Oct 2015 07:28:00 GMT", "inf", "nan"])
+def test_backoff_falls_back_to_jitter_for_unusable_retry_after(retry_after):
+    assert 0 <= backoff_delay(2, base_delay=1.0, max_delay=30.0, retry_after=retry_after) <= 4.0
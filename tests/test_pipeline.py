@@ -0,0 +1,46 @@
+import os
+import random
+
+import pytest
+
+from pipeline import run_pipeline
+from skill_matcher import load_taxonomy
+from synthetic_corpus import generate_corpus, make_resume_lines, write_resume_pdf
+
+RESUME_COUNT = 4
+
+@pytest.fixture
+def corpus(tmp_path):
+    pdf_folder = tmp_path / "pdfs"
+    ground_truth = generate_corpus(str(pdf_folder), RESUME_COUNT, kinds=("text",), lines=40, seed=1)
+    job_file = tmp_path / "job.txt"
+    # Skills of the first resume, so the rankings differ
+    first = ground_truth[sorted(ground_truth)[0]]["skills"]
+    job_file.write_text("\n".join(skill.lower() for skill in first[:3] + ["Cobol"]), encoding="utf-8")
+    return {"pdfs": str(pdf_folder), "job": str(job_file), "db": str(tmp_path / "db" / "resumes.db"),
+            "feedback": str(tmp_path / "feedback"), "ground_truth": ground_truth}
+
+def run(corpus):
+    run_pipeline(corpus["pdfs"], corpus["db"], job_desc_file=corpus["job"], feedback_folder=corpus["feedback"],
+                 no_llm=True)
+    with open(os.path.join(corpus["feedback"], "summary_rankings.txt"), encoding="utf-8") as f:
+        return f.read().splitlines()[2:]
+
+def test_second_run_keeps_the_rankings_summary(corpus):
+    first = run(corpus)
+    assert len(first) == RESUME_COUNT
+    assert first[0].startswith(os.path.splitext(sorted(corpus["ground_truth"])[0])[0])
+
+    assert run(corpus) == first
+
+def test_summary_ranks_unchanged_resumes_after_a_partial_change(corpus):
+    first = run(corpus)
+    changed = sorted(corpus["ground_truth"])[-1]
+    skill_names = [entry["name"] for entry in load_taxonomy()]
+    lines, _ = make_resume_lines(random.Random(99), skill_names, 40)
+    write_resume_pdf(os.path.join(corpus["pdfs"], changed), lines, "text")
+
+    second = run(corpus)
+    assert len(second) == RESUME_COUNT
+    unchanged = [line for line in first if not line.startswith(os.path.splitext(changed)[0])]
+    assert all(line in second for line in unchanged)
@@ -0,0 +1,210 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import module2_extract_data
+import work_queue
+from llm_stub_server import CANNED_SKILLS, default_completion
+from module2_extract_data import process_all_files
+from work_queue import WorkQueue, PRIORITY_URGENT, PRIORITY_BACKLOG
+
+# Workers on other hosts, whose processes are never probed
+WORKER = "host-a:1"
+OTHER_WORKER = "host-b:1"
+
+# Marks the resume the stub never answers with valid JSON
+POISON_MARKER = "POISON"
+
+RESUME_TEXT = "Jane Doe\nData engineer\nSkills: Python, SQL, communication\n"
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / work_queue.WORK_QUEUE_FILENAME)
+
+@pytest.fixture
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(work_queue, "RETRY_DELAY_SECONDS", 0)
+
+def open_queue(queue_path, worker_id=None, **kwargs):
+    return WorkQueue(queue_path, "test", worker_id or WORKER, **kwargs)
+
+def test_lease_hands_out_highest_priority_first(queue_path):
+    queue = open_queue(queue_path)
+    queue.enqueue({"low.txt": "v1"}, PRIORITY_BACKLOG)
+    queue.enqueue({"normal.txt": "v1"})
+    queue.enqueue({"urgent.txt": "v1"}, PRIORITY_URGENT, payloads={"urgent.txt": {"fingerprint": None}})
+
+    leased = queue.lease(3)
+    assert leased == [("urgent.txt", {"fingerprint": None}), ("normal.txt", None), ("low.txt", None)]
+    assert queue.counts()["leased"] == 3
+    assert queue.lease() == []
+    queue.close()
+
+def test_enqueue_keeps_the_higher_priority_of_a_queued_item(queue_path):
+    queue = open_queue(queue_path)
+    queue.enqueue({"a.txt": "v1", "b.txt": "v1"})
+    queue.enqueue({"b.txt": "v1"}, PRIORITY_URGENT)
+    queue.enqueue({"b.txt": "v1"}, PRIORITY_BACKLOG)
+
+    assert [item for item, payload in queue.lease(2)] == ["b.txt", "a.txt"]
+    queue.close()
+
+def test_completed_item_is_requeued(queue_path):
+    queue = open_queue(queue_path)
+    queue.enqueue({"a.txt": "v1"})
+    queue.lease()
+    queue.complete("a.txt")
+    assert queue.state("a.txt") == "done"
+
+    assert queue.enqueue({"a.txt": "v1"}) == 1
+    assert queue.state("a.txt") == "pending"
+    queue.close()
+
+def test_expired_lease_is_reclaimed_by_another_worker(queue_path):
+    first = open_queue(queue_path, lease_seconds=0.05)
+    second = open_queue(queue_path, OTHER_WORKER)
+    first.enqueue({"a.txt": "v1"})
+    assert first.lease() == [("a.txt", None)]
+    assert second.lease() == []
+
+    time.sleep(0.1)
+    assert second.lease() == [("a.txt", None)]
+
+    # The first worker lost its lease, so its late completion is ignored
+    first.complete("a.txt")
+    assert second.state("a.txt") == "leased"
+    second.complete("a.txt")
+    assert second.state("a.txt") == "done"
+    first.close()
+    second.close()
+
+@pytest.mark.skipif(os.name == "nt", reason="worker processes are not probed on Windows")
+def test_lease_of_exited_worker_is_reclaimed(queue_path):
+    exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"],
+                            capture_output=True, text=True, check=True)
+    dead_worker = f"{work_queue.socket.gethostname()}:{exited.stdout.strip()}"
+    crashed = open_queue(queue_path, dead_worker)
+    crashed.enqueue({"a.txt": "v1"})
+    crashed.lease()
+
+    survivor = open_queue(queue_path, OTHER_WORKER)
+    assert survivor.lease() == [("a.txt", None)]
+    crashed.close()
+    survivor.close()
+
+def test_expired_lease_on_last_attempt_is_dead_lettered(queue_path):
+    queue = open_queue(queue_path, lease_seconds=0.05, max_attempts=1)
+    queue.enqueue({"a.txt": "v1"})
+    queue.lease()
+    time.sleep(0.1)
+
+    assert queue.lease() == []
+    assert queue.state("a.txt") == "dead"
+    [(item, attempts, error)] = queue.dead_letters()
+    assert (item, attempts) == ("a.txt", 1)
+    assert "expired" in error
+    queue.close()
+
+def test_failed_item_is_retried_then_dead_lettered(queue_path, no_retry_delay):
+    queue = open_queue(queue_path, max_attempts=3)
+    queue.enqueue({"a.txt": "v1"})
+
+    for attempt in range(1, 4):
+        assert queue.lease() == [("a.txt", None)]
+        assert queue.fail("a.txt", f"error {attempt}") == (attempt == 3)
+
+    assert queue.state("a.txt") == "dead"
+    assert queue.dead_letters() == [("a.txt", 3, "error 3")]
+    assert queue.lease() == []
+    queue.close()
+
+def test_failed_item_waits_out_the_retry_delay(queue_path):
+    queue = open_queue(queue_path)
+    queue.enqueue({"a.txt": "v1"})
+    queue.lease()
+    queue.fail("a.txt", "boom")
+
+    assert queue.state("a.txt") == "pending"
+    assert queue.lease() == []
+    assert queue.next_available() == pytest.approx(work_queue.RETRY_DELAY_SECONDS, abs=1)
+    queue.close()
+
+def test_dead_item_is_only_requeued_when_its_version_changes(queue_path, no_retry_delay):
+    queue = open_queue(queue_path, max_attempts=1)
+    queue.enqueue({"a.txt": "v1"})
+    queue.lease()
+    queue.fail("a.txt", "boom")
+
+    assert queue.enqueue({"a.txt": "v1"}) == 0
+    assert queue.state("a.txt") == "dead"
+    assert queue.enqueue({"a.txt": "v2"}) == 1
+    assert queue.state("a.txt") == "pending"
+    queue.close()
+
+def test_retry_dead_gives_a_fresh_set_of_attempts(queue_path, no_retry_delay):
+    queue = open_queue(queue_path, max_attempts=1)
+    queue.enqueue({"a.txt": "v1", "b.txt": "v1"})
+    for item, payload in queue.lease(2):
+        queue.fail(item, "boom")
+    assert queue.counts()["dead"] == 2
+
+    assert queue.retry_dead(["b.txt"]) == 1
+    assert queue.lease(2) == [("b.txt", None)]
+    assert queue.retry_dead() == 1
+    assert queue.lease(2) == [("a.txt", None)]
+    queue.close()
+
+def test_defer_and_release_do_not_count_the_attempt(queue_path):
+    queue = open_queue(queue_path, max_attempts=1)
+    queue.enqueue({"a.txt": "v1", "b.txt": "v1"})
+    queue.lease(2)
+    queue.defer("a.txt", delay=0)
+    assert queue.release() == 1
+
+    assert sorted(item for item, payload in queue.lease(2)) == ["a.txt", "b.txt"]
+    queue.close()
+
+def test_heartbeat_keeps_the_lease(queue_path):
+    worker = open_queue(queue_path, lease_seconds=0.3)
+    other = open_queue(queue_path, OTHER_WORKER)
+    worker.enqueue({"a.txt": "v1"})
+    worker.lease()
+
+    with worker.heartbeat("a.txt"):
+        time.sleep(0.8)
+        assert other.lease() == []
+
+    worker.complete("a.txt")
+    assert worker.state("a.txt") == "done"
+    worker.close()
+    other.close()
+
+def test_queue_dead_letters_a_resume_the_api_cannot_answer(stub, tmp_path, no_retry_delay):
+    stub["completion"] = lambda request: ("not json" if any(POISON_MARKER in message["content"]
+                                                            for message in request["messages"])
+                                          else default_completion(request))
+    texts_dir = tmp_path / "texts"
+    jsons_dir = tmp_path / "jsons"
+    texts_dir.mkdir()
+    (texts_dir / "good.txt").write_text(RESUME_TEXT, encoding="utf-8")
+    (texts_dir / "bad.txt").write_text(f"John Roe\n{POISON_MARKER}\nSkills: Java, teamwork\n", encoding="utf-8")
+
+    processed = process_all_files(str(texts_dir), str(jsons_dir), "test-key", endpoint=stub["endpoint"],
+                                  use_cache=False, dedup=False, use_queue=True)
+
+    assert processed == 1
+    with open(jsons_dir / "good.json", encoding="utf-8") as f:
+        assert json.load(f)["skills"] == CANNED_SKILLS
+    assert not os.path.exists(jsons_dir / "bad.json")
+
+    queue = work_queue.WorkQueue(str(jsons_dir / work_queue.WORK_QUEUE_FILENAME), module2_extract_data.MANIFEST_STAGE)
+    try:
+        assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "dead": 1}
+        [(item, attempts, error)] = queue.dead_letters()
+        assert (item, attempts) == ("bad.txt", work_queue.DEFAULT_MAX_ATTEMPTS)
+    finally:
+        queue.close()
@@ -0,0 +1,228 @@
+import re
+import threading
+from collections import Counter
+from llm_client import estimate_tokens
+from instrumentation import inc, observe, TOKEN_BUCKETS
+
+# Page separator written by module1 between pages
+PAGE_BREAK = "\f"
+
+# Input tokens allowed per request: llama3-8b-8192 context minus the prompt and room for the reply
+DEFAULT_CHUNK_TOKENS = 6000
+
+# Lines shorter than this are never treated as OCR duplicates (bullets, single words, dates)
+MIN_DEDUP_LINE_CHARS = 15
+
+# A repeat of an earlier block with at least this many such lines is an OCR copy of the text layer
+MIN_DUPLICATE_BLOCK_LINES = 3
+
+# Running headers/footers are only looked for in documents with at least this many pages;
+# with two, any line shared by both pages would count as one
+MIN_HEADER_FOOTER_PAGES = 3
+
+# How many lines at the top and bottom of a page are checked for running headers/footers
+HEADER_FOOTER_LINES = 2
+
+# Section headings used to split oversized resumes at natural boundaries
+SECTION_HEADERS = [
+    "summary", "profile", "objective", "experience", "work experience", "employment",
+    "professional experience", "education", "skills", "technical skills", "core competencies",
+    "technologies", "projects", "certifications", "publications", "awards", "languages",
+    "interests", "volunteer", "references"
+]
+
+# Preprocessing counters of the current run (see reset_preprocess_stats), updated from worker
+# threads under _stats_lock; they are also exported as preprocess_* metrics
+_stats = dict.fromkeys(("documents", "tokens_before", "tokens_removed", "chunked_documents"), 0)
+_stats_lock = threading.Lock()
+
+_section_header_re = re.compile(
+    r"^\s*(?:%s)\s*:?\s*$" % "|".join(re.escape(header) for header in SECTION_HEADERS), re.IGNORECASE)
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def preprocess_stats():
+    """Return a copy of this run's preprocessing counters"""
+    with _stats_lock:
+        return dict(_stats)
+
+def reset_preprocess_stats():
+    """Start counting a new run, so the counters do not grow across runs in one process"""
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+def _line_key(line):
+    """Comparison key for repeated lines: case-folded with whitespace collapsed"""
+    return " ".join(line.split()).lower()
+
+def _edge_key(line):
+    """Like _line_key, with digits masked so "Page 1 of 3" and "Page 2 of 3" match"""
+    return re.sub(r"\d+", "#", _line_key(line))
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces/tabs, strip lines and keep at most one blank line in a row"""
+    lines = [" ".join(line.split()) for line in text.split("\n")]
+    text = "\n".join(lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def remove_headers_footers(pages):
+    """
+    Drop running headers and footers: lines near the top or bottom of a page that
+    recur on at least half of the pages (and on at least two).
+    """
+    if len(pages) < MIN_HEADER_FOOTER_PAGES:
+        return pages
+
+    edge_counts = Counter()
+    for page in pages:
+        lines = [line for line in page.split("\n") if line.strip()]
+        edges = lines[:HEADER_FOOTER_LINES] + lines[-HEADER_FOOTER_LINES:]
+        edge_counts.update(set(_edge_key(line) for line in edges))
+
+    threshold = max(2, (len(pages) + 1) // 2)
+    repeated = {key for key, count in edge_counts.items() if count >= threshold}
+    if not repeated:
+        return pages
+
+    cleaned = []
+    for page in pages:
+        lines = page.split("\n")
+        non_empty = [i for i, line in enumerate(lines) if line.strip()]
+        edge_indexes = set(non_empty[:HEADER_FOOTER_LINES] + non_empty[-HEADER_FOOTER_LINES:])
+        cleaned.append("\n".join(line for i, line in enumerate(lines)
+                                 if not (i in edge_indexes and _edge_key(line) in repeated)))
+    return cleaned
+
+def _repeated_run(keys, start, position):
+    """
+    Length of the run of lines at position repeating the lines at an earlier start
+    (without overlapping it), and how many of them are long enough to count
+    """
+    length = 0
+    long_lines = 0
+    while (position + length < len(keys) and start + length < position
+           and keys[start + length] == keys[position + length]):
+        if len(keys[position + length]) >= MIN_DEDUP_LINE_CHARS:
+            long_lines += 1
+        length += 1
+    return length, long_lines
+
+def dedupe_page_lines(page):
+    """
+    Remove duplicated lines within a page: a line repeating the line just before it,
+    and blocks repeating an earlier block of at least MIN_DUPLICATE_BLOCK_LINES lines.
+    When a page has both a text layer and an OCR'd image of the same content, the
+    OCR copy repeats the text layer line for line. A single line that recurs on its
+    own, like the same bullet under two jobs, is kept.
+    """
+    lines = page.split("\n")
+    content = [i for i, line in enumerate(lines) if line.strip()]
+    keys = [_line_key(lines[i]) for i in content]
+    positions = {}
+    dropped = set()
+    position = 0
+    while position < len(keys):
+        key = keys[position]
+        if position and len(key) >= MIN_DEDUP_LINE_CHARS and key == keys[position - 1]:
+            dropped.add(content[position])
+            position += 1
+            continue
+
+        run = 0
+        for start in positions.get(key, ()):
+            length, long_lines = _repeated_run(keys, start, position)
+            if long_lines >= MIN_DUPLICATE_BLOCK_LINES:
+                run = max(run, length)
+        if run:
+            dropped.update(content[position:position + run])
+            position += run
+            continue
+
+        positions.setdefault(key, []).append(position)
+        position += 1
+    return "\n".join(line for i, line in enumerate(lines) if i not in dropped)
+
+def preprocess_text(text):
+    """
+    Clean extracted resume text before sending it to the LLM.
+    Returns (clean_text, stats) where stats has tokens_before, tokens_after and tokens_removed.
+    """
+    tokens_before = estimate_tokens(text)
+
+    pages = [page for page in text.split(PAGE_BREAK) if page.strip()]
+    pages = remove_headers_footers(pages)
+    pages = [dedupe_page_lines(page) for page in pages]
+    clean_text = normalize_whitespace("\n\n".join(pages))
+
+    tokens_after = estimate_tokens(clean_text)
+    stats = {"tokens_before": tokens_before, "tokens_after": tokens_after,
+             "tokens_removed": tokens_before - tokens_after}
+
+    _count("documents")
+    _count("tokens_before", tokens_before)
+    _count("tokens_removed", stats["tokens_removed"])
+    inc("preprocess_documents_total")
+    inc("preprocess_tokens_before_total", tokens_before)
+    observe("preprocess_tokens_removed", stats["tokens_removed"], buckets=TOKEN_BUCKETS)
+    return clean_text, stats
+
+def split_sections(text):
+    """Split text into sections, starting a new one at each recognised section heading"""
+    sections = []
+    current = []
+    for line in text.split("\n"):
+        if _section_header_re.match(line) and current:
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return sections
+
+def split_into_chunks(text, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """
+    Split text into chunks of at most max_tokens (estimated), keeping sections
+    together where possible. Sections larger than the budget are split by lines.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    pieces = []
+    for section in split_sections(text):
+        if estimate_tokens(section) <= max_tokens:
+            pieces.append(section)
+        else:
+            pieces.extend(section.split("\n"))
+
+    chunks = []
+    current, used = [], 0
+    for piece in pieces:
+        cost = estimate_tokens(piece)
+        if current and used + cost > max_tokens:
+            chunks.append("\n".join(current))
+            current, used = [], 0
+        current.append(piece)
+        used += cost
+    if current:
+        chunks.append("\n".join(current))
+
+    _count("chunked_documents")
+    inc("preprocess_chunked_documents_total")
+    return chunks
+
+def merge_skill_results(results):
+    """Merge per-chunk {"skills": [...]} results, dropping case-insensitive duplicates"""
+    merged = []
+    seen = set()
+    for result in results:
+        for skill in (result or {}).get("skills", []):
+            if not isinstance(skill, dict):
+                continue
+            key = (str(skill.get("type", "")).lower(), str(skill.get("name", "")).strip().lower())
+            if key not in seen:
+                seen.add(key)
+                merged.append(skill)
+    return {"skills": merged}
@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+from instrumentation import inc
+
+logger = logging.getLogger(__name__)
+
+# Sidecar queue database kept in a stage's output folder, next to the manifest
+WORK_QUEUE_FILENAME = ".work_queue.sqlite"
+
+# Higher priorities are leased first; urgent reqs go ahead of backlog re-processing
+PRIORITY_URGENT = 100
+PRIORITY_NORMAL = 0
+PRIORITY_BACKLOG = -100
+
+# A leased item not completed within this time goes back to the queue (its worker is presumed dead)
+DEFAULT_LEASE_SECONDS = 600
+
+# Leases being worked on are renewed this many times per lease period, so a slow
+# item is never reclaimed from a live worker even if one renewal is late
+RENEWALS_PER_LEASE = 3
+
+# Attempts per item, counting expired leases, before it is moved to the dead-letter list
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Delay before the first retry of a failed item, doubled for each further attempt
+RETRY_DELAY_SECONDS = 30
+
+# Longest a worker sleeps between checks while every pending item is waiting out a retry delay
+MAX_POLL_SECONDS = 30
+
+# How long a connection waits for another worker's transaction before giving up
+BUSY_TIMEOUT_SECONDS = 30
+
+ITEM_STATES = ("pending", "leased", "done", "dead")
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def worker_alive(worker_id):
+    """False only for a default worker ID of this host whose process has exited"""
+    host, _, pid = worker_id.rpartition(":")
+    # os.kill would terminate the process on Windows rather than probe it
+    if host != socket.gethostname() or not pid.isdigit() or os.name == "nt":
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+class WorkQueue:
+    """
+    Durable work queue in SQLite, shared by any number of worker processes.
+
+    Each item (a source file name) is pending, leased to one worker, done, or dead.
+    lease() hands out the highest-priority ready items and takes them for
+    lease_seconds; items whose lease ran out, or whose worker process on this host
+    has exited, are reclaimed by the next lease() call, so the work of a crashed
+    worker is picked up again. Wrap slow work in heartbeat() to keep its lease.
+    A failed item is retried after a growing delay and moved to the dead-letter
+    list after max_attempts.
+    """
+
+    def __init__(self, db_path, name, worker_id=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.name = name
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS)
+        self.conn.isolation_level = None  # Transactions are managed explicitly with BEGIN/COMMIT
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS work_item (
+                                 queue TEXT NOT NULL,
+                                 item TEXT NOT NULL,
+                                 version TEXT NOT NULL,
+                                 payload TEXT NOT NULL,
+                                 priority INTEGER NOT NULL,
+                                 state TEXT NOT NULL,
+                                 attempts INTEGER NOT NULL,
+                                 available_at REAL NOT NULL,
+                                 lease_owner TEXT,
+                                 lease_expires REAL,
+                                 last_error TEXT,
+                                 enqueued_at REAL NOT NULL,
+                                 PRIMARY KEY (queue, item)
+                             )''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_work_item_ready "
+                          "ON work_item(queue, state, priority DESC, enqueued_at)")
+
+    def _transaction(self, work):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work()
+            self.conn.execute("COMMIT")
+            return result
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, items, priority=PRIORITY_NORMAL, payloads=None):
+        """
+        Add items ({item: version}, version being e.g. the source's content hash) with
+        optional payloads ({item: JSON-serializable}). Returns the number queued.
+
+        An item already queued keeps its place and takes the higher priority. A done
+        item is queued again. A dead item stays on the dead-letter list unless its
+        version changed, so a file that keeps failing is not retried on every run.
+        """
+        payloads = payloads or {}
+
+        def work():
+            now = time.time()
+            queued = 0
+            for item, version in items.items():
+                version = version or ""
+                payload = json.dumps(payloads.get(item))
+                row = self.conn.execute("SELECT state, version FROM work_item WHERE queue = ? AND item = ?",
+                                        (self.name, item)).fetchone()
+                if row is None:
+                    self.conn.execute('''INSERT INTO work_item (queue, item, version, payload, priority, state,
+                                                                attempts, available_at, enqueued_at)
+                                         VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?)''',
+                                      (self.name, item, version, payload, priority, now, now))
+                elif row[0] in ("pending", "leased"):
+                    self.conn.execute('''UPDATE work_item SET version = ?, payload = ?, priority = MAX(priority, ?)
+                                         WHERE queue = ? AND item = ?''',
+                                      (version, payload, priority, self.name, item))
+                elif row[0] == "dead" and row[1] == version:
+                    continue
+                else:
+                    self.conn.execute('''UPDATE work_item SET version = ?, payload = ?, priority = ?,
+                                             state = 'pending', attempts = 0, available_at = ?, lease_owner = NULL,
+                                             lease_expires = NULL, last_error = NULL, enqueued_at = ?
+                                         WHERE queue = ? AND item = ?''',
+                                      (version, payload, priority, now, now, self.name, item))
+                queued += 1
+            return queued
+
+        queued = self._transaction(work)
+        inc("work_queue_enqueued_total", queued)
+        return queued
+
+    def _reclaim_expired(self, now):
+        """Return items whose lease ran out to the queue, or dead-letter them if out of attempts"""
+        leased = self.conn.execute('''SELECT item, lease_owner, attempts, lease_expires FROM work_item
+                                      WHERE queue = ? AND state = 'leased' ''', (self.name,)).fetchall()
+        alive = {}
+        expired = []
+        for item, owner, attempts, lease_expires in leased:
+            if owner not in alive:
+                alive[owner] = worker_alive(owner)
+            if lease_expires <= now or not alive[owner]:
+                expired.append((item, owner, attempts))
+
+        for item, owner, attempts in expired:
+            error = f"lease held by {owner} expired" if alive[owner] else f"worker {owner} exited holding the lease"
+            if attempts >= self.max_attempts:
+                self._dead_letter(item, error)
+            else:
+                self.conn.execute('''UPDATE work_item SET state = 'pending', available_at = ?, lease_owner = NULL,
+                                         lease_expires = NULL, last_error = ?
+                                     WHERE queue = ? AND item = ?''', (now, error, self.name, item))
+        if expired:
+            logger.warning("Reclaimed %s expired leases in queue %s", len(expired), self.name)
+
+    def _dead_letter(self, item, error):
+        self.conn.execute('''UPDATE work_item SET state = 'dead', lease_owner = NULL, lease_expires = NULL,
+                                 last_error = ?
+                             WHERE queue = ? AND item = ?''', (error, self.name, item))
+        inc("work_queue_dead_letters_total")
+        logger.error("%s moved to the dead-letter list of queue %s: %s", item, self.name, error)
+
+    def lease(self, count=1):
+        """Lease up to count ready items, highest priority first. Returns [(item, payload)]."""
+        def work():
+            now = time.time()
+            self._reclaim_expired(now)
+            rows = self.conn.execute('''SELECT item, payload FROM work_item
+                                        WHERE queue = ? AND state = 'pending' AND available_at <= ?
+                                        ORDER BY priority DESC, enqueued_at, item
+                                        LIMIT ?''', (self.name, now, count)).fetchall()
+            self.conn.executemany('''UPDATE work_item SET state = 'leased', attempts = attempts + 1,
+                                         lease_owner = ?, lease_expires = ?
+                                     WHERE queue = ? AND item = ?''',
+                                  [(self.worker_id, now + self.lease_seconds, self.name, item) for item, payload in rows])
+            return [(item, json.loads(payload)) for item, payload in rows]
+
+        return self._transaction(work)
+
+    def renew(self, item):
+        """Extend this worker's lease on an item that is taking long. Returns False if the lease was lost."""
+        cursor = self.conn.execute('''UPDATE work_item SET lease_expires = ?
+                                      WHERE queue = ? AND item = ? AND state = 'leased' AND lease_owner = ?''',
+                                   (time.time() + self.lease_seconds, self.name, item, self.worker_id))
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def heartbeat(self, item):
+        """
+        Renew this worker's lease on item from a background thread while the block
+        runs (e.g. a long OCR job or a resume sent in many chunks), so it is not
+        reclaimed and handed to another worker halfway through.
+        """
+        stop = threading.Event()
+
+        def renew_until_stopped():
+            # SQLite connections belong to one thread, so the heartbeat opens its own
+            queue = WorkQueue(self.db_path, self.name, self.worker_id, self.lease_seconds, self.max_attempts)
+            try:
+                while not stop.wait(self.lease_seconds / RENEWALS_PER_LEASE):
+                    if not queue.renew(item):
+                        logger.warning("Lease on %s was lost while it was being worked on", item)
+                        return
+            except sqlite3.Error as e:
+                logger.warning("Could not renew the lease on %s: %s", item, e)
+            finally:
+                queue.close()
+
+        thread = threading.Thread(target=renew_until_stopped, name=f"heartbeat-{item}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def complete(self, item):
+        """Mark a leased item done. An item whose lease expired and passed to another worker is left to it."""
+        cursor = self.conn.execute('''UPDATE work_item SET state = 'done', lease_owner = NULL, lease_expires = NULL,
+                                          last_error = NULL
+                                      WHERE queue = ? AND item = ? AND state = 'leased' AND lease_owner = ?''',
+                                   (self.name, item, self.worker_id))
+        if cursor.rowcount:
+            inc("work_queue_completed_total")
+        else:
+            logger.warning("Lease on %s was lost before it completed", item)
+
+    def fail(self, item, error):
+        """Record a failed attempt: retry later, or dead-letter after max_attempts. Returns True if dead-lettered."""
+        def work():
+            row = self.conn.execute('''SELECT attempts FROM work_item
+                                       WHERE queue = ? AND item = ? AND state = 'leased' AND lease_owner = ?''',
+                                    (self.name, item, self.worker_id)).fetchone()
+            if row is None:
+                logger.warning("Lease on %s was lost before it failed", item)
+                return False
+            if row[0] >= self.max_attempts:
+                self._dead_letter(item, error)
+                return True
+            delay = RETRY_DELAY_SECONDS * 2 ** (row[0] - 1)
+            self.conn.execute('''UPDATE work_item SET state = 'pending', available_at = ?, lease_owner = NULL,
+                                     lease_expires = NULL, last_error = ?
+                                 WHERE queue = ? AND item = ?''', (time.time() + delay, error, self.name, item))
+            logger.warning("%s failed (attempt %s of %s), retrying in %ss: %s",
+                           item, row[0], self.max_attempts, delay, error)
+            return False
+
+        inc("work_queue_failures_total")
+        return self._transaction(work)
+
+    def defer(self, item, delay=RETRY_DELAY_SECONDS):
+        """Put a leased item back without counting the attempt, e.g. while it waits on another item"""
+        self.conn.execute('''UPDATE work_item SET state = 'pending', attempts = attempts - 1, available_at = ?,
+                                 lease_owner = NULL, lease_expires = NULL
+                             WHERE queue = ? AND item = ? AND state = 'leased' AND lease_owner = ?''',
+                          (time.time() + delay, self.name, item, self.worker_id))
+
+    def release(self):
+        """Hand back this worker's leases without counting the attempts, on a clean shutdown"""
+        cursor = self.conn.execute('''UPDATE work_item SET state = 'pending', attempts = attempts - 1,
+                                          lease_owner = NULL, lease_expires = NULL
+                                      WHERE queue = ? AND state = 'leased' AND lease_owner = ?''',
+                                   (self.name, self.worker_id))
+        return cursor.rowcount
+
+    def state(self, item):
+        """The item's state, or None if it was never queued"""
+        row = self.conn.execute("SELECT state FROM work_item WHERE queue = ? AND item = ?",
+                                (self.name, item)).fetchone()
+        return row[0] if row else None
+
+    def next_available(self):
+        """Seconds until the next pending item can be leased (0 if one is ready), or None if none is pending"""
+        row = self.conn.execute("SELECT MIN(available_at) FROM work_item WHERE queue = ? AND state = 'pending'",
+                                (self.name,)).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def counts(self):
+        """Return {state: number of items}"""
+        counts = dict.fromkeys(ITEM_STATES, 0)
+        counts.update(self.conn.execute("SELECT state, COUNT(*) FROM work_item WHERE queue = ? GROUP BY state",
+                                        (self.name,)))
+        return counts
+
+    def dead_letters(self):
+        """Return [(item, attempts, last_error)] for the dead-letter list"""
+        return self.conn.execute('''SELECT item, attempts, last_error FROM work_item
+                                    WHERE queue = ? AND state = 'dead' ORDER BY item''', (self.name,)).fetchall()
+
+    def retry_dead(self, items=None):
+        """Give dead items (all, or the ones listed) a fresh set of attempts. Returns the number requeued."""
+        now = time.time()
+        if items is None:
+            cursor = self.conn.execute('''UPDATE work_item SET state = 'pending', attempts = 0, available_at = ?
+                                          WHERE queue = ? AND state = 'dead' ''', (now, self.name))
+            return cursor.rowcount
+        requeued = 0
+        for item in items:
+            requeued += self.conn.execute('''UPDATE work_item SET state = 'pending', attempts = 0, available_at = ?
+                                             WHERE queue = ? AND item = ? AND state = 'dead' ''',
+                                          (now, self.name, item)).rowcount
+        return requeued
+
+    def iter_leased(self, batch_size=1):
+        """
+        Yield leased (item, payload) until no item is pending; the caller completes,
+        fails or defers each one. While every pending item is waiting out a retry
+        delay, the worker sleeps instead of exiting. Items leased by other live
+        workers are left to them.
+        """
+        while True:
+            leased = self.lease(batch_size)
+            if leased:
+                yield from leased
+                continue
+            wait = self.next_available()
+            if wait is None:
+                return
+            time.sleep(min(max(wait, 0.1), MAX_POLL_SECONDS))
+
+    def log_summary(self):
+        counts = self.counts()
+        logger.info("Queue %s: %s done, %s pending, %s leased, %s dead",
+                    self.name, counts['done'], counts['pending'], counts['leased'], counts['dead'])
+        if counts["dead"]:
+            logger.warning("%s items in the dead-letter list of queue %s "
+                           "(python work_queue.py <queue file> %s --retry-dead to retry them)",
+                           counts['dead'], self.name, self.name)
+
+    def close(self):
+        self.conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a work queue and its dead-letter list")
+    parser.add_argument("queue_file", help=f"queue database, e.g. <output folder>/{WORK_QUEUE_FILENAME}")
+    parser.add_argument("name", help="queue name, e.g. extract_text or extract_skills")
+    parser.add_argument("--retry-dead", action="store_true", help="give dead items a fresh set of attempts")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.queue_file, args.name)
+    if args.retry_dead:
+        print(f"Requeued {queue.retry_dead()} dead items")
+    print(", ".join(f"{state}: {count}" for state, count in queue.counts().items()))
+    for item, attempts, last_error in queue.dead_letters():
+        print(f"  {item} ({attempts} attempts): {last_error}")
+    queue.close()